@@ -0,0 +1,55 @@
+"""
+Banking system library: users, accounts and transactions stored in a
+SQLite database (or another bankBackend) through SQLAlchemy.
+
+Classes are imported from their submodules on first access, so importing
+the package is cheap and does not load SQLAlchemy until it is needed.
+"""
+import importlib
+
+# Public name -> submodule defining it
+_exports = {
+    'ValidationError': 'errors',
+    'AuthenticationError': 'errors',
+    'bankMetrics': 'metrics',
+    'bankTransactionLog': 'logs',
+    'bankBalanceCache': 'cache',
+    'bankDatabase': 'database',
+    'bankSchema': 'database',
+    'bankBackend': 'backends',
+    'bankSqliteBackend': 'backends',
+    'bankMemoryBackend': 'backends',
+    'bankServerBackend': 'backends',
+    'bankIdAllocator': 'ids',
+    'bankUser': 'users',
+    'bankAccounts': 'accounts',
+    'bankTransactions': 'transactions',
+    'postingResult': 'transactions',
+    'bankDataTransfer': 'datatransfer',
+    'bankSnapshots': 'snapshots',
+    'bankInterest': 'interest',
+    'bankReports': 'reports',
+    'bankShardRouter': 'shards',
+    'bankWorkerPool': 'workers',
+    'bankService': 'service',
+    'bankSession': 'sessions',
+    'bankAsyncDatabase': 'aio',
+    'bankAsyncUser': 'aio',
+    'bankAsyncAccounts': 'aio',
+    'bankAsyncTransactions': 'aio',
+    'main': 'menu',
+}
+
+__all__ = sorted(_exports)
+
+
+def __getattr__(name):
+    if name not in _exports:
+        raise AttributeError("module {mod!r} has no attribute {name!r}".format(mod = __name__,name = name))
+    value = getattr(importlib.import_module('.' + _exports[name],__name__),name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_exports))
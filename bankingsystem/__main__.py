@@ -0,0 +1,5 @@
+import sys
+
+from .menu import main
+
+sys.exit(main())
@@ -0,0 +1,264 @@
+from sqlalchemy import select,insert,and_,or_,func
+from datetime import datetime
+
+from .cache import bankBalanceCache
+from .database import bankDatabase,bankSchema,dbUrl
+from .errors import ValidationError
+from .ids import bankIdAllocator
+from .logs import bankTransactionLog
+from .metrics import bankMetrics
+from .sessions import bankSession
+
+class bankAccounts:
+    
+    # Account types each action_choice is restricted to, as in accountQuery
+    actionTypes = {1: ('Checking','Savings'),
+                   4: ('Loan','Credit')}
+    
+    def __init__(self,id_allocator = None,notify = print):
+        self.db =  bankDatabase()
+        self.log = bankTransactionLog()
+        # Receives the messages meant for the user, print for the menu
+        self.notify = notify
+        self.idAllocator = id_allocator or bankIdAllocator.forName('acct_no')
+        self.cache = bankBalanceCache.shared()
+    
+    def accountQuery(self,cust_accounts,u_id,account_no,action_choice):
+        stmt = select([cust_accounts])                        
+        
+        if action_choice == 1:
+            stmt = stmt.where( or_(cust_accounts.columns.acct_type == 'Checking',
+                                   cust_accounts.columns.acct_type == 'Savings'))
+            stmt = stmt.where( 
+                               and_(cust_accounts.columns.user_id == u_id,
+                                   cust_accounts.columns.acct_no == account_no,
+                                   cust_accounts.columns.acct_sts == 'ACTIVE')
+                             ) 
+        elif action_choice in (2,3):                  
+            stmt = stmt.where( 
+                               and_(cust_accounts.columns.user_id == u_id,
+                                   cust_accounts.columns.acct_no == account_no,
+                                   cust_accounts.columns.acct_sts == 'ACTIVE')
+                             )                     
+        elif action_choice == 4:                  
+            stmt = stmt.where( or_(cust_accounts.columns.acct_type == 'Loan',
+                                   cust_accounts.columns.acct_type == 'Credit')
+                             )
+            stmt = stmt.where(and_(cust_accounts.columns.user_id == u_id,
+                                   cust_accounts.columns.acct_no == account_no,
+                                   cust_accounts.columns.acct_sts == 'ACTIVE')
+                             )
+        elif  u_id is None:
+            stmt = stmt.where( 
+                               and_(cust_accounts.columns.acct_no == account_no,
+                                   cust_accounts.columns.acct_sts == 'ACTIVE')
+                             )                     
+        return stmt
+    
+    def checkNewAccount(self,u_id,avail_bal):
+        if len(str(u_id)) <= 0:
+            raise ValidationError("Validation Error: Customer ID is required")
+        elif avail_bal <= 0:
+            raise ValidationError("Validation Error: Balance amount cannot be negative/zero")
+    
+    def customerQuery(self,user,u_id,f_name):
+        stmt = select([user])                    
+        return stmt.where( and_(user.columns.user_id == u_id, 
+                                func.lower(user.columns.first_name) == f_name.lower(),
+                                user.columns.user_type == "C") 
+                         )
+    
+    def newAccountStmt(self,cust_accounts,u_id,account_type,avail_bal,account_no):
+        return insert(cust_accounts).values(user_id = u_id,
+                                            acct_type = account_type,
+                                            available_bal = avail_bal,
+                                            remaining_bal=0,
+                                            acct_no=account_no,
+                                            acct_sts='ACTIVE')
+    
+    def openingEntry(self,ledger,account_no,avail_bal):
+        # Ledger row for the opening balance, so point-in-time queries
+        # find every account in the ledger
+        return insert(ledger).values(acct_no = account_no,txn_type = 'open',amount = avail_bal,
+                                     available_bal = avail_bal,remaining_bal = 0,
+                                     txn_ts = datetime.now().strftime('%Y-%m-%d %H:%M:%S'))
+
+    def customerNotFound(self,u_id,f_name) -> str:
+        return """
+                Error: 
+                    Customer ID: {user_id}, 
+                    First name: {fname}
+                not found.
+                """.format(user_id = u_id,fname = f_name)
+
+    @bankMetrics.timed
+    def validateAccount(self,u_id,account_no,action_choice)->bool:
+        """
+        Validate if the account number provided is valid and 
+        returns if a match is found
+
+        Parameters
+        ----------
+        u_id : int
+            user id
+        account_no : string
+            customer account number
+        action_choice : string
+            user selected action - deposit/withdrawal/view balance/pay balance
+
+        Returns
+        -------
+        bool
+            True if successful, False otherwise
+        """
+        self.log.logTransaction("Open validateAccount")
+
+        try:
+            with self.db.db_connect(dbUrl) as db_engine:
+                acct_cnt = 0
+                cust_accounts = bankSchema.table('cust_accounts', db_engine)
+                stmt = self.accountQuery(cust_accounts,u_id,account_no,action_choice)
+
+                result = db_engine.execute(stmt).fetchall()
+                acct_cnt = len(result)
+                
+            if acct_cnt == 1:
+                self.log.logTransaction("Close validateAccount")                
+                return True
+            else:
+                raise ValidationError("Validation Error: Account not found")
+                
+        except ValidationError as e:
+            self.log.logTransaction("Exception: validateAccount")            
+            self.notify(e.message)
+            return False
+
+    def sessionLookup(self,claims,account_no,action_choice):
+        # validateAccount arguments when the token cannot answer for the
+        # account, None when the token accepts it
+        if claims['typ'] == 'E':
+            # Employees act on any active account, which the transaction
+            # statement itself checks
+            return None
+        
+        acct_type = claims['acc'].get(str(account_no))
+        if acct_type is None:
+            return (claims['uid'],account_no,action_choice)
+        if acct_type not in self.actionTypes.get(action_choice,(acct_type,)):
+            raise ValidationError("Validation Error: Account not found")
+        return None
+
+    @bankMetrics.timed
+    def validateSession(self,token,account_no,action_choice) -> bool:
+        """
+        Same checks as validateAccount for the user of a session token
+        (see bankUser.authenticateUser), answered from the accounts
+        carried in the token without an account query (revocations are
+        checked in memory, see bankSession.verify). Accounts opened after
+        the token was issued fall back to validateAccount.
+
+        Parameters
+        ----------
+        token : string
+            session token
+        account_no : int
+            customer account number
+        action_choice : int
+            user selected action - deposit/withdrawal/view balance/pay balance
+
+        Returns
+        -------
+        bool
+            True if successful, False otherwise
+        """
+        try:
+            return self.validateClaims(bankSession.verify(token),account_no,action_choice)
+        
+        except ValidationError as e:
+            self.log.logTransaction("Exception: validateSession")
+            self.notify(e.message)
+            return False
+
+    @bankMetrics.timed
+    def validateClaims(self,claims,account_no,action_choice) -> bool:
+        """
+        validateSession for claims already returned by bankSession.verify,
+        so that a request checks its token once
+
+        Returns
+        -------
+        bool
+            True if successful, False otherwise
+        """
+        try:
+            lookup = self.sessionLookup(claims,account_no,action_choice)
+            if lookup is not None:
+                return self.validateAccount(*lookup)
+            return True
+        
+        except ValidationError as e:
+            self.log.logTransaction("Exception: validateClaims")
+            self.notify(e.message)
+            return False
+
+    @bankMetrics.timed
+    def addAccount(self,u_id,f_name,account_type,avail_bal) -> int:
+
+        """
+        Creates a new customer account
+        Parameters
+        ----------
+        u_id : int
+            user id
+        f_name: string
+            first name
+        account_type : string
+            account type
+        avail_bal : int
+            initial deposit amount or approved credit/loan amount
+        Returns
+        -------
+        int
+            account number if successful, -1 otherwise
+        """
+        
+        self.log.logTransaction("Open addAccount")
+
+        try:    
+            # Validate input arguments
+            self.checkNewAccount(u_id,avail_bal)
+            
+            # Check if the user id and firstname is valid
+            with self.db.db_connect(dbUrl) as db_engine:
+        
+                # Check if the user id doesn't exist
+                user = bankSchema.table('user', db_engine)
+                result = db_engine.execute(self.customerQuery(user,u_id,f_name)).fetchall()
+                user_cnt = len(result)               
+            
+                if user_cnt == 1:
+                    cust_accounts = bankSchema.table('cust_accounts', db_engine)
+                    ledger = bankSchema.table('transactions', db_engine)
+                
+                    # Insert the account under a unique acct number
+                    def insert_account(account_no):
+                        stmt_acct = self.newAccountStmt(cust_accounts,u_id,account_type,avail_bal,account_no)
+                        with db_engine.begin():
+                            row_cnt = db_engine.execute(stmt_acct).rowcount
+                            db_engine.execute(self.openingEntry(ledger,account_no,avail_bal))
+                        return row_cnt
+                    account_no,row_cnt = self.idAllocator.insertWithId(insert_account)
+                    
+                    if row_cnt == 1:
+                        self.cache.invalidate(account_no)
+                        self.log.logTransaction("Close addAccount")                            
+                        return account_no
+                    else:
+                        raise ValidationError("Account creation failed.")
+                else:                    
+                    raise ValidationError(self.customerNotFound(u_id,f_name))
+    
+        except ValidationError as e:
+            self.log.logTransaction("Exception: addAccount")                
+            self.notify(e.message)
+            return -1
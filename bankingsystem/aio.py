@@ -0,0 +1,638 @@
+"""
+asyncio counterparts of bankUser, bankAccounts and bankTransactions on
+SQLAlchemy's async engine (SQLAlchemy 1.4+ with the aiosqlite driver).
+
+The classes keep the method names, return values, validation and messages
+of the sync API; only the database round trips are awaited.
+"""
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+from contextlib import asynccontextmanager
+from functools import wraps
+import asyncio
+import importlib.util
+import sqlite3
+import threading
+import time
+
+try:
+    from sqlalchemy.ext.asyncio import create_async_engine
+except ImportError:
+    # Optional: only the asyncio classes need SQLAlchemy 1.4+
+    create_async_engine = None
+
+from . import database
+from .accounts import bankAccounts
+from .backends import bankMemoryBackend
+from .database import bankDatabase,bankSchema
+from .errors import ValidationError
+from .metrics import bankMetrics
+from .sessions import bankSession
+from .transactions import bankTransactions
+from .users import bankUser
+
+class bankAsyncDatabase:
+
+    _engine = None
+    _engineLock = threading.Lock()
+
+    @staticmethod
+    def asyncUrl(url) -> str:
+        # Same database as the sync engine, through an asyncio driver
+        if url.startswith('sqlite://'):
+            if importlib.util.find_spec('aiosqlite') is None:
+                raise ImportError("The bankAsync classes need the aiosqlite driver: pip install aiosqlite")
+            return 'sqlite+aiosqlite://' + url[len('sqlite://'):]
+        if url.startswith('postgresql://'):
+            return 'postgresql+asyncpg://' + url[len('postgresql://'):]
+        return url
+
+    @classmethod
+    def getEngine(cls):
+        """
+        Returns the process-wide async engine, creating it on first use
+        Returns
+        -------
+        AsyncEngine
+            engine shared by every bankAsync* instance
+        """
+        if cls._engine is None:
+            with cls._engineLock:
+                if cls._engine is None:
+                    if create_async_engine is None:
+                        raise ImportError("The bankAsync classes need SQLAlchemy 1.4+ and aiosqlite: "
+                                          "pip install 'SQLAlchemy>=1.4,<2.0' aiosqlite")
+                    from sqlalchemy import event
+                    from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+                    backend = bankDatabase.getBackend()
+                    if isinstance(backend,bankMemoryBackend):
+                        raise ValueError("The in-memory backend cannot be shared with an asyncio driver")
+                    
+                    start = time.perf_counter()
+                    connect_args = {}
+                    if backend.tuning:
+                        connect_args['cached_statements'] = bankDatabase.statementCacheSize
+                    engine = create_async_engine(cls.asyncUrl(backend.url),
+                                                 poolclass=AsyncAdaptedQueuePool,
+                                                 connect_args=connect_args,
+                                                 **bankDatabase.poolConfig)
+                    if backend.tuning:
+                        # Same tuning profile as the connections of the sync engine
+                        event.listen(engine.sync_engine,'connect',bankDatabase.applyProfile)
+                    cls._engine = engine
+                    bankMetrics.observe('operation','bankAsyncDatabase.createEngine',
+                                        time.perf_counter() - start)
+        return cls._engine
+
+    @classmethod
+    async def disposeEngine(cls):
+        """
+        Close every pooled connection and drop the process-wide async engine
+        """
+        engine,cls._engine = cls._engine,None
+        if engine is not None:
+            await engine.dispose()
+
+    @staticmethod
+    def loadSchema():
+        # Reflection and migrations run once per process on the sync engine
+        with bankDatabase().db_connect(database.dbUrl) as db_engine:
+            bankSchema.table('user',db_engine)
+
+    async def table(self,name):
+        """
+        Returns the cached table, reflecting the schema on a worker thread
+        the first time so the event loop is not blocked
+        """
+        if bankSchema._tables is None:
+            await asyncio.to_thread(self.loadSchema)
+        return bankSchema.table(name,None)
+
+    @asynccontextmanager
+    async def db_connect(self):
+        start = time.perf_counter()
+        async with self.getEngine().connect() as connection:
+            bankMetrics.observe('operation','bankAsyncDatabase.db_connect',
+                                time.perf_counter() - start)
+            yield connection
+
+    @asynccontextmanager
+    async def transaction(self,db_engine):
+        # Async connections autobegin on the first statement; end any
+        # read so the write runs in a transaction of its own
+        if db_engine.in_transaction():
+            await db_engine.commit()
+        async with db_engine.begin():
+            yield
+
+    async def execute(self,db_engine,stmt):
+        # Run one statement in its own transaction, like the sync autocommit
+        async with self.transaction(db_engine):
+            result = await db_engine.execute(stmt)
+        return result
+
+    async def insertWithId(self,allocator,insert_row) -> tuple:
+        # Async version of bankIdAllocator.insertWithId; block
+        # reservations hit the database, keep them off the loop
+        for attempt in range(allocator.collisionRetries):
+            new_id = await asyncio.to_thread(allocator.allocate)
+            try:
+                return new_id,await insert_row(new_id)
+            except IntegrityError as e:
+                if not allocator.isCollision(e):
+                    raise
+        raise ValidationError("Error: No free ID found for " + allocator.name)
+
+    async def updateReturning(self,db_engine,table,whereclause,values,columns,followup = None,
+                              params = None,cache_key = None):
+        """
+        Async version of bankDatabase.updateReturning
+        Returns
+        -------
+        Row
+            updated row, None if no row matched the where clause
+        """
+        async with self.transaction(db_engine):
+            row = await self.returningRow(db_engine,table,whereclause,values,columns,params,cache_key)
+
+            if row is not None and followup is not None:
+                await db_engine.execute(*followup(row))
+            return row
+
+    async def returningRow(self,db_engine,table,whereclause,values,columns,params = None,cache_key = None):
+        # The UPDATE of updateReturning, run in the caller's transaction
+        dialect = db_engine.dialect.name
+        if dialect == 'sqlite' and sqlite3.sqlite_version_info >= (3,35,0):
+            sql,positions,compiled = bankDatabase.compileReturning(db_engine,table,whereclause,values,
+                                                                   columns,cache_key)
+            bound = compiled.construct_params(params)
+            return (await db_engine.exec_driver_sql(sql,tuple(bound[key] for key in positions))).first()
+        if dialect in bankDatabase.returningDialects:
+            stmt = bankDatabase.returningStatement(db_engine,table,whereclause,values,columns,cache_key)
+            return (await db_engine.execute(stmt,params or {})).first()
+        if (await db_engine.execute(table.update().where(whereclause).values(**values),params or {})).rowcount == 0:
+            return None
+        return (await db_engine.execute(select(columns).where(whereclause).limit(1),params or {})).first()
+
+class bankAsyncUser(bankUser):
+    def __init__(self,id_allocator = None,notify = print):
+        super().__init__(id_allocator,notify)
+        self.adb = bankAsyncDatabase()
+
+    @bankMetrics.timed
+    async def createUser(self,f_name,l_name,u_type,dsgnation = None)->int:
+        """
+        Creates a new user, see bankUser.createUser
+        Returns
+        -------
+        int
+            user id if successful, -1 otherwise
+        """
+        self.log.logTransaction("Open createUser")
+
+        try:
+            self.checkNewUser(f_name,l_name,u_type,dsgnation)
+
+            user = await self.adb.table('user')
+            async with self.adb.db_connect() as db_engine:
+                async def insert_user(u_id):
+                    result = await self.adb.execute(db_engine,self.newUserStmt(user,u_id,f_name,l_name,
+                                                                               u_type,dsgnation))
+                    return result.rowcount
+                u_id,row_cnt = await self.adb.insertWithId(self.idAllocator,insert_user)
+
+            if row_cnt == 1:
+                self.log.logTransaction('Close createUser')
+                return u_id
+            else:
+                raise ValidationError("Account creation Failed")
+
+        except ValidationError as e:
+            self.log.logTransaction('Exception: CreateUser')
+            self.notify(e.message)
+            return -1
+
+    @bankMetrics.timed
+    async def authenticateUser(self,u_id,u_type,f_name):
+        """
+        Authenticates a user id, see bankUser.authenticateUser
+        Returns
+        -------
+        string
+            session token if successful, False otherwise
+        """
+        self.log.logTransaction("Open authenticateUser")
+
+        try:
+            self.checkLogin(u_id,f_name)
+
+            user = await self.adb.table('user')
+            async with self.adb.db_connect() as db_engine:
+                result = (await db_engine.execute(self.authQuery(user,u_id,u_type,f_name))).fetchall()
+
+                if len(result) != 1:
+                    raise ValidationError("Authentication Error: User ID is not valid")
+
+                cust_accounts = await self.adb.table('cust_accounts')
+                accounts = (await db_engine.execute(self.sessionAccountsQuery(cust_accounts,u_id))).fetchall()
+
+            self.log.logTransaction("Close authenticateUser")
+            return self.issueSession(u_id,u_type,accounts)
+
+        except ValidationError as e:
+            self.log.logTransaction("Exception: authenticateUser")
+            self.notify(e.message)
+            return False
+
+    @bankMetrics.timed
+    async def setStatus(self,u_id,status) -> bool:
+        """
+        Changes the status of a user, see bankUser.setStatus
+        Returns
+        -------
+        bool
+            True if successful, False otherwise
+        """
+        self.log.logTransaction("Open setStatus")
+
+        try:
+            user = await self.adb.table('user')
+            revocations = await self.adb.table('session_revocations')
+            stmt = user.update().where(user.columns.user_id == u_id).values(status = status)
+            revoked_at = time.time()
+            async with self.adb.db_connect() as db_engine:
+                async with self.adb.transaction(db_engine):
+                    row_cnt = (await db_engine.execute(stmt)).rowcount
+                    if row_cnt == 1:
+                        for revoke in bankSession.revokeStatements(revocations,int(u_id),revoked_at):
+                            await db_engine.execute(revoke)
+
+            if row_cnt == 1:
+                bankSession.revoke(u_id,revoked_at)
+                self.log.logTransaction("Close setStatus")
+                return True
+            else:
+                raise ValidationError("Error: User ID not found")
+
+        except ValidationError as e:
+            self.log.logTransaction("Exception: setStatus")
+            self.notify(e.message)
+            return False
+
+class bankAsyncAccounts(bankAccounts):
+    def __init__(self,id_allocator = None,notify = print):
+        super().__init__(id_allocator,notify)
+        self.adb = bankAsyncDatabase()
+
+    @bankMetrics.timed
+    async def validateAccount(self,u_id,account_no,action_choice)->bool:
+        """
+        Validates an account for a transaction, see bankAccounts.validateAccount
+        Returns
+        -------
+        bool
+            True if successful, False otherwise
+        """
+        self.log.logTransaction("Open validateAccount")
+
+        try:
+            cust_accounts = await self.adb.table('cust_accounts')
+            stmt = self.accountQuery(cust_accounts,u_id,account_no,action_choice)
+
+            async with self.adb.db_connect() as db_engine:
+                result = (await db_engine.execute(stmt)).fetchall()
+
+            if len(result) == 1:
+                self.log.logTransaction("Close validateAccount")
+                return True
+            else:
+                raise ValidationError("Validation Error: Account not found")
+
+        except ValidationError as e:
+            self.log.logTransaction("Exception: validateAccount")
+            self.notify(e.message)
+            return False
+
+    @bankMetrics.timed
+    async def validateSession(self,token,account_no,action_choice) -> bool:
+        """
+        Validates an account against a session token, see bankAccounts.validateSession
+        Returns
+        -------
+        bool
+            True if successful, False otherwise
+        """
+        try:
+            if bankSession.revocationsStale():
+                await asyncio.to_thread(bankSession.refreshRevocations)
+            lookup = self.sessionLookup(bankSession.verify(token),account_no,action_choice)
+            if lookup is not None:
+                return await self.validateAccount(*lookup)
+            return True
+
+        except ValidationError as e:
+            self.log.logTransaction("Exception: validateSession")
+            self.notify(e.message)
+            return False
+
+    @bankMetrics.timed
+    async def addAccount(self,u_id,f_name,account_type,avail_bal) -> int:
+        """
+        Adds a new account for a customer, see bankAccounts.addAccount
+        Returns
+        -------
+        int
+            account number if successful, -1 otherwise
+        """
+        self.log.logTransaction("Open addAccount")
+
+        try:
+            self.checkNewAccount(u_id,avail_bal)
+
+            user = await self.adb.table('user')
+            cust_accounts = await self.adb.table('cust_accounts')
+            ledger = await self.adb.table('transactions')
+
+            async with self.adb.db_connect() as db_engine:
+                result = (await db_engine.execute(self.customerQuery(user,u_id,f_name))).fetchall()
+
+                if len(result) != 1:
+                    raise ValidationError(self.customerNotFound(u_id,f_name))
+
+                async def insert_account(account_no):
+                    stmt_acct = self.newAccountStmt(cust_accounts,u_id,account_type,avail_bal,account_no)
+                    async with self.adb.transaction(db_engine):
+                        row_cnt = (await db_engine.execute(stmt_acct)).rowcount
+                        await db_engine.execute(self.openingEntry(ledger,account_no,avail_bal))
+                    return row_cnt
+                account_no,row_cnt = await self.adb.insertWithId(self.idAllocator,insert_account)
+
+            if row_cnt == 1:
+                self.cache.invalidate(account_no)
+                self.log.logTransaction("Close addAccount")
+                return account_no
+            else:
+                raise ValidationError("Account creation failed.")
+
+        except ValidationError as e:
+            self.log.logTransaction("Exception: addAccount")
+            self.notify(e.message)
+            return -1
+
+class bankAsyncTransactions(bankTransactions):
+    def __init__(self,notify = print,balance_cache = None):
+        super().__init__(notify,balance_cache)
+        self.adb = bankAsyncDatabase()
+
+    def validateTransaction(func):
+        @wraps(func)
+        async def wrapped(self,u_id,acctno,amt):
+
+            try:
+                self.checkTransaction(u_id,acctno,amt)
+                return await func(self,u_id,acctno,amt)
+
+            except ValidationError as e:
+                self.notify(e.message)
+                return False
+
+        return wrapped
+
+    @bankMetrics.timed
+    @validateTransaction
+    async def depositAmt(self,u_id,acctno,depositAmt) -> bool:
+        """
+        Deposit the amount to the customer account, see bankTransactions.depositAmt
+        Returns
+        -------
+        bool
+            True if successful, False otherwise
+        """
+        self.log.logTransaction("Open depositAmt")
+
+        try:
+            acct_types = self.depositTypes if u_id is not None else None
+            cust_accounts = await self.adb.table('cust_accounts')
+            ledger = await self.adb.table('transactions')
+
+            async with self.adb.db_connect() as db_engine:
+                rslt_amt = await self.adb.updateReturning(db_engine,cust_accounts,
+                                                          *self.postingStatement(cust_accounts,'deposit',u_id is not None),
+                                                          self.balanceColumns(cust_accounts),
+                                                          self.ledgerEntry(ledger,acctno,'deposit',depositAmt),
+                                                          {'acct': acctno,'user': u_id,'amt': depositAmt},
+                                                          ('deposit',u_id is not None))
+
+                if rslt_amt is None:
+                    # Find out why the guarded update was rejected
+                    row = (await db_engine.execute(self.balanceQuery(cust_accounts,acctno))).first()
+                    reason = self.accountRejection(row,u_id,acctno,acct_types)
+                    raise ValidationError(reason or "Error: Deposit transaction failed.")
+
+            self.cache.invalidate(acctno)
+            self.log.logTransaction("Close depositAmt")
+            self.notify(self.depositMessage(acctno,depositAmt,int(rslt_amt.available_bal)))
+            return True
+        except ValidationError as e:
+            self.log.logTransaction("Exception: depositAmt")
+            self.notify(e.message)
+            return False
+
+    @bankMetrics.timed
+    @validateTransaction
+    async def withdrawAmt(self,u_id,acctno,withdrawAmt) -> bool:
+        """
+        Withdraw amount from the customer account, see bankTransactions.withdrawAmt
+        Returns
+        -------
+        bool
+            True if successful, False otherwise
+        """
+        self.log.logTransaction("Open withdrawAmt")
+
+        try:
+            cust_accounts = await self.adb.table('cust_accounts')
+            ledger = await self.adb.table('transactions')
+
+            async with self.adb.db_connect() as db_engine:
+                rslt_amt = await self.adb.updateReturning(db_engine,cust_accounts,
+                                                          *self.postingStatement(cust_accounts,'withdraw',True),
+                                                          self.balanceColumns(cust_accounts),
+                                                          self.ledgerEntry(ledger,acctno,'withdraw',withdrawAmt),
+                                                          {'acct': acctno,'user': u_id,'amt': withdrawAmt},
+                                                          ('withdraw',True))
+
+                if rslt_amt is None:
+                    # Find out why the guarded update was rejected
+                    row = (await db_engine.execute(self.balanceQuery(cust_accounts,acctno))).first()
+                    raise ValidationError(self.withdrawRejection(row,u_id,acctno))
+
+            self.cache.invalidate(acctno)
+            self.notify(self.withdrawMessage(acctno,withdrawAmt,rslt_amt.acct_type,
+                                             int(rslt_amt.available_bal),int(rslt_amt.remaining_bal)))
+            self.log.logTransaction("Close withdrawAmt")
+            return True
+        except ValidationError as e:
+            self.log.logTransaction("Exception: withdrawAmt")
+            self.notify(e.message)
+            return False
+
+    @bankMetrics.timed
+    async def getBalance(self,u_id,acctno) -> dict:
+        """
+        Returns the balances of a customer account, see bankTransactions.getBalance
+        Returns
+        -------
+        dict
+            acct_no, acct_type, available_bal and remaining_bal,
+            None if the account is not found or not active
+        """
+        return self.balanceRow(u_id,acctno,await self.readBalance(acctno))
+
+    @bankMetrics.timed
+    async def getHistory(self,u_id,acctno,limit = None,cursor = None) -> dict:
+        """
+        Returns one page of the ledger of an account, see bankTransactions.getHistory
+        Returns
+        -------
+        dict
+            acct_no, entries and next, None if the account is not found
+        """
+        limit = self.pageSize(limit)
+        position = self.parseCursor(cursor)
+
+        row = await self.readBalance(acctno)
+        if row is None or (u_id is not None and row.user_id != u_id):
+            return None
+
+        ledger = await self.adb.table('transactions')
+        async with self.adb.db_connect() as db_engine:
+            rows = (await db_engine.execute(self.historyQuery(ledger,acctno,limit,position))).fetchall()
+
+        return self.historyPage(acctno,rows,limit)
+
+    async def readBalance(self,acctno):
+        row = self.cache.get(acctno)
+
+        if row is None:
+            generation = self.cache.generation(acctno)
+            cust_accounts = await self.adb.table('cust_accounts')
+            async with self.adb.db_connect() as db_engine:
+                rslt_amt = (await db_engine.execute(self.balanceStatement(cust_accounts),{'acct': acctno})).first()
+            row = self.cacheBalance(acctno,rslt_amt,generation)
+        return row
+
+    @bankMetrics.timed
+    @validateTransaction
+    async def showBalance(self,u_id,acctno,amt = None) -> bool:
+        """
+        Show balance amount in the customer account, see bankTransactions.showBalance
+        Returns
+        -------
+        bool
+            True if successful, False otherwise
+        """
+        self.log.logTransaction("Open showBalance")
+
+        try:
+            row = await self.readBalance(acctno)
+            reason = self.accountRejection(row,u_id,acctno)
+
+            if reason is None:
+                self.notify(self.balanceMessage(acctno,row.acct_type,
+                                                row.available_bal,row.remaining_bal))
+                self.log.logTransaction("Close showBalance")
+                return True
+            else:
+                raise ValidationError(reason)
+        except ValidationError as e:
+            self.log.logTransaction("Exception: showBalance")
+            self.notify(e.message)
+            return False
+
+    @bankMetrics.timed
+    @validateTransaction
+    async def payBalance(self,u_id,acctno,paymentAmt) -> bool:
+        """
+        Pay balance amount in the credit / loan account, see bankTransactions.payBalance
+        Returns
+        -------
+        bool
+            True if successful, False otherwise
+        """
+        self.log.logTransaction("Open: payBalance")
+
+        try:
+            cust_accounts = await self.adb.table('cust_accounts')
+            ledger = await self.adb.table('transactions')
+
+            async with self.adb.db_connect() as db_engine:
+                rslt_amt = await self.adb.updateReturning(db_engine,cust_accounts,
+                                                          *self.postingStatement(cust_accounts,'pay',True),
+                                                          self.balanceColumns(cust_accounts),
+                                                          self.ledgerEntry(ledger,acctno,'pay',paymentAmt),
+                                                          {'acct': acctno,'user': u_id,'amt': paymentAmt},
+                                                          ('pay',True))
+
+                if rslt_amt is None:
+                    # Find out why the guarded update was rejected
+                    row = (await db_engine.execute(self.balanceQuery(cust_accounts,acctno))).first()
+                    reason = self.accountRejection(row,u_id,acctno,self.payTypes,owner_only = True)
+                    raise ValidationError(reason or "Error: payment transaction failed.")
+
+            self.cache.invalidate(acctno)
+            self.notify(self.paymentMessage(acctno,paymentAmt,rslt_amt.acct_type,
+                                            int(rslt_amt.available_bal),int(rslt_amt.remaining_bal)))
+            self.log.logTransaction("Close: payBalance")
+            return True
+        except ValidationError as e:
+            self.log.logTransaction("Exception: payBalance")
+            self.notify(e.message)
+            return False
+
+    @bankMetrics.timed
+    async def transfer(self,src,dst,amount,u_id = None) -> bool:
+        """
+        Move an amount between two accounts in one transaction, see bankTransactions.transfer
+        Returns
+        -------
+        bool
+            True if successful, False otherwise
+        """
+        self.log.logTransaction("Open transfer")
+
+        try:
+            self.checkTransfer(src,dst,amount)
+            cust_accounts = await self.adb.table('cust_accounts')
+            ledger = await self.adb.table('transactions')
+            rows = {}
+
+            async with self.adb.db_connect() as db_engine:
+                rejected = None
+                try:
+                    async with self.adb.transaction(db_engine):
+                        for acctno,txn_type,guard,values in self.transferLegs(cust_accounts,u_id,src,dst,amount):
+                            row = await self.adb.returningRow(db_engine,cust_accounts,guard,values,
+                                                              self.balanceColumns(cust_accounts))
+                            if row is None:
+                                # Roll back the leg already applied
+                                rejected = acctno
+                                raise ValidationError("Error: Transfer transaction failed.")
+                            await db_engine.execute(*self.ledgerEntry(ledger,acctno,txn_type,amount)(row))
+                            rows[acctno] = row
+                except ValidationError:
+                    # Find out why the guarded update was rejected
+                    row = (await db_engine.execute(self.balanceQuery(cust_accounts,rejected))).first()
+                    reason = self.transferRejection(row,u_id,rejected,src)
+                    raise ValidationError(reason or "Error: Transfer transaction failed.")
+
+            self.cache.invalidate(src)
+            self.cache.invalidate(dst)
+            self.notify(self.transferMessage(src,dst,amount,rows[src],rows[dst]))
+            self.log.logTransaction("Close transfer")
+            return True
+        except ValidationError as e:
+            self.log.logTransaction("Exception: transfer")
+            self.notify(e.message)
+            return False
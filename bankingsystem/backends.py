@@ -0,0 +1,198 @@
+from sqlalchemy import create_engine
+from sqlalchemy.engine.url import make_url
+from sqlalchemy.pool import QueuePool
+from sqlalchemy.util import LRUCache
+from contextlib import nullcontext
+import itertools
+import os
+import sqlite3
+import threading
+
+class bankBackend:
+
+    # PRAGMA tuning profiles apply (see bankDatabase.tuningProfiles)
+    tuning = False
+    # Schema kept by the SQLite migrations and PRAGMA user_version, or
+    # created from table definitions and recorded in schema_version
+    versioning = 'table'
+
+    def __init__(self,url):
+        """
+        Storage behind bankDatabase: knows how to open the engine for a
+        database URL. bankUser, bankAccounts and bankTransactions only see
+        the connections, so every backend serves the same classes.
+        Parameters
+        ----------
+        url : string
+            SQLAlchemy database URL
+        """
+        self.url = url
+
+    @staticmethod
+    def fromUrl(url):
+        """
+        Returns the backend for a URL: memory:// (optionally followed by a
+        database file to seed it from) for the in-memory store, sqlite:///
+        for a database file, any other SQLAlchemy URL for a server database
+        """
+        if url.startswith('memory://'):
+            return bankMemoryBackend(url[len('memory://'):] or None)
+        if url.startswith('sqlite:///') and url != 'sqlite:///:memory:':
+            return bankSqliteBackend(url)
+        if url.startswith('sqlite'):
+            return bankMemoryBackend()
+        return bankServerBackend(url)
+
+    @property
+    def path(self) -> str:
+        # Database file, None when there is none to copy or open directly
+        return None
+
+    @property
+    def name(self) -> str:
+        # Stable identity of the database, e.g. to hash accounts to shards
+        return self.url
+
+    def createEngine(self,pool_config,cache_size):
+        """
+        Returns a new engine with a QueuePool built from pool_config and a
+        compiled statement cache of cache_size entries
+        """
+        return create_engine(self.url,poolclass=QueuePool,
+                             connect_args=self.connectArgs(cache_size),
+                             execution_options={'compiled_cache': LRUCache(cache_size)},
+                             **pool_config)
+
+    def connectArgs(self,cache_size) -> dict:
+        return {}
+
+    def serialized(self):
+        """
+        Returns the context bankDatabase.db_connect holds a connection in;
+        nothing for databases that handle concurrent connections
+        """
+        return nullcontext()
+
+    def close(self):
+        pass
+
+    def __repr__(self):
+        return '{cls}({url!r})'.format(cls = type(self).__name__,url = self.url)
+
+class bankSqliteBackend(bankBackend):
+
+    tuning = True
+    versioning = 'pragma'
+
+    @property
+    def path(self) -> str:
+        return make_url(self.url).database
+
+    @property
+    def name(self) -> str:
+        # The file name only, so shards keep their accounts when the
+        # directory holding them moves
+        return os.path.basename(self.path)
+
+    def connectArgs(self,cache_size) -> dict:
+        # Pooled connections move between threads; sqlite3 keeps
+        # cache_size prepared statements per connection
+        return {'check_same_thread': False,'cached_statements': cache_size}
+
+    def sqliteConnect(self):
+        # Plain sqlite3 connection to the database, e.g. for the backup API
+        return sqlite3.connect(self.path)
+
+class bankMemoryBackend(bankSqliteBackend):
+
+    tuning = False
+
+    _names = itertools.count(1)
+
+    def __init__(self,seed = None):
+        """
+        In-memory SQLite database for tests and benchmarks: no file, no
+        journal and no fsync. It lives until close(), across engines, and
+        starts empty or as a copy of the seed database file. One thread
+        at a time holds connections to it: SQLite's shared cache fails
+        on a table lock instead of waiting like a file database does.
+        Parameters
+        ----------
+        seed : string
+            database file copied into memory, None for an empty database
+        """
+        name = 'bank-memory-{pid}-{n}'.format(pid = os.getpid(),n = next(self._names))
+        super().__init__('sqlite://')
+        self.uri = 'file:' + name + '?mode=memory&cache=shared'
+        self.seed = seed
+        self._lock = threading.RLock()
+        # Keeps the database alive while the pool opens and closes connections
+        self._keeper = sqlite3.connect(self.uri,uri=True,check_same_thread=False)
+        if seed is not None:
+            if not os.path.exists(seed):
+                raise ValueError("Seed database not found: " + seed)
+            source = sqlite3.connect(seed)
+            try:
+                source.backup(self._keeper)
+            finally:
+                source.close()
+
+    @property
+    def path(self) -> str:
+        return None
+
+    @property
+    def name(self) -> str:
+        return self.uri
+
+    def sqliteConnect(self):
+        return sqlite3.connect(self.uri,uri=True)
+
+    def createEngine(self,pool_config,cache_size):
+        args = self.connectArgs(cache_size)
+        return create_engine('sqlite://',poolclass=QueuePool,
+                             creator=lambda: sqlite3.connect(self.uri,uri=True,**args),
+                             execution_options={'compiled_cache': LRUCache(cache_size)},
+                             **pool_config)
+
+    def serialized(self):
+        # Re-entrant, a thread may open a second connection while it
+        # holds one (e.g. an id block reserved during addAccount)
+        return self._lock
+
+    def close(self):
+        """
+        Drop the database once every engine on it has been disposed
+        """
+        if self._keeper is not None:
+            self._keeper.close()
+            self._keeper = None
+
+    def __repr__(self):
+        return '{cls}(seed={seed!r})'.format(cls = type(self).__name__,seed = self.seed)
+
+class bankServerBackend(bankBackend):
+
+    def __init__(self,url,connect_args = None):
+        """
+        Client/server database (e.g. postgresql://user@host/bank) with
+        row-level locking, so writers to different accounts do not wait
+        on each other. The schema is created from bankSchema's table
+        definitions rather than the SQLite migrations, and no PRAGMAs are
+        sent. Any SQLAlchemy URL works, including a SQLite file as a local
+        stand-in to exercise this path without a database server.
+        Parameters
+        ----------
+        url : string
+            SQLAlchemy database URL, its driver must be installed
+        connect_args : dict
+            extra arguments for the driver's connect()
+        """
+        super().__init__(url)
+        self.extraArgs = dict(connect_args or {})
+
+    def connectArgs(self,cache_size) -> dict:
+        args = dict(self.extraArgs)
+        if make_url(self.url).get_backend_name() == 'sqlite':
+            args.setdefault('check_same_thread',False)
+        return args
@@ -0,0 +1,128 @@
+from collections import OrderedDict
+import threading
+import time
+
+class bankBalanceCache:
+
+    # Defaults for the process-wide cache
+    maxSize = 10000
+    ttl = 5.0
+
+    _shared = None
+    _sharedLock = threading.Lock()
+
+    def __init__(self,max_size = None,ttl = None):
+        """
+        In-process LRU cache of account balance rows keyed by acct_no.
+        Entries expire after ttl seconds, which bounds how stale a row can
+        be after a write from another process; writes from this process
+        invalidate their account immediately.
+        Parameters
+        ----------
+        max_size : int
+            number of accounts kept, least recently used are evicted
+        ttl : float
+            seconds an entry is served before it is read again
+        """
+        self.maxSize = max_size or self.maxSize
+        self.ttl = self.ttl if ttl is None else ttl
+
+        self._lock = threading.Lock()
+        self._rows = OrderedDict()
+        # Bumped on every invalidation so a read that raced a write does
+        # not put the balance it saw before the write back in the cache
+        self._generation = {}
+        self._epoch = 0
+        self._stats = {'hits': 0, 'misses': 0, 'evictions': 0,
+                       'expirations': 0, 'invalidations': 0}
+
+    @classmethod
+    def shared(cls):
+        """
+        Returns the process-wide cache used by bankTransactions
+        """
+        if cls._shared is None:
+            with cls._sharedLock:
+                if cls._shared is None:
+                    cls._shared = cls()
+        return cls._shared
+
+    def get(self,acctno) -> dict:
+        """
+        Returns the cached row for the account, None on a miss
+        """
+        with self._lock:
+            entry = self._rows.get(acctno)
+            if entry is None:
+                self._stats['misses'] += 1
+                return None
+
+            expires,row = entry
+            if expires <= time.monotonic():
+                del self._rows[acctno]
+                self._stats['expirations'] += 1
+                self._stats['misses'] += 1
+                return None
+
+            self._rows.move_to_end(acctno)
+            self._stats['hits'] += 1
+            return row
+
+    def generation(self,acctno) -> tuple:
+        """
+        Returns the invalidation counter of the account, taken before
+        reading the row from the database and passed to put()
+        """
+        with self._lock:
+            return (self._epoch,self._generation.get(acctno,0))
+
+    def put(self,acctno,row,generation) -> bool:
+        """
+        Cache a row read from the database. The row is dropped if the
+        account was invalidated since generation was taken.
+        Returns
+        -------
+        bool
+            True if the row was cached, False otherwise
+        """
+        with self._lock:
+            if (self._epoch,self._generation.get(acctno,0)) != generation:
+                return False
+
+            self._rows[acctno] = (time.monotonic() + self.ttl,row)
+            self._rows.move_to_end(acctno)
+            while len(self._rows) > self.maxSize:
+                self._rows.popitem(last=False)
+                self._stats['evictions'] += 1
+            return True
+
+    def invalidate(self,acctno):
+        """
+        Drop the account after a write to its row
+        """
+        with self._lock:
+            self._rows.pop(acctno,None)
+            self._generation[acctno] = self._generation.get(acctno,0) + 1
+            self._stats['invalidations'] += 1
+            if len(self._generation) > 2 * self.maxSize:
+                # Keep the counters bounded: a new epoch voids every
+                # generation handed out so far
+                self._generation.clear()
+                self._epoch += 1
+
+    def clear(self):
+        with self._lock:
+            self._rows.clear()
+            self._generation.clear()
+            self._epoch += 1
+
+    def getStats(self) -> dict:
+        """
+        Returns hits, misses, evictions (LRU), expirations (TTL),
+        invalidations (writes) and the current size
+        """
+        with self._lock:
+            stats = dict(self._stats)
+            stats['size'] = len(self._rows)
+        stats['max_size'] = self.maxSize
+        return stats
@@ -0,0 +1,772 @@
+from sqlalchemy import MetaData,Table,Column,Index,PrimaryKeyConstraint,event
+from sqlalchemy import BigInteger,Float,Integer,Text
+from sqlalchemy import select,insert,update,func
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.exc import SAWarning
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.util import LRUCache
+from contextlib import contextmanager
+import contextvars
+import sqlite3
+import threading
+import time
+import warnings
+import weakref
+
+from .backends import bankBackend,bankSqliteBackend
+from .logs import bankTransactionLog
+from .metrics import bankMetrics
+
+class bankDatabase:
+    
+    global dbUrl 
+    
+    dbUrl = "sqlite:///BankingSystem-DB.db"
+    
+    # Storage the engine is opened on, see configureBackend; None is the
+    # SQLite file at dbUrl
+    backend = None
+    
+    # Connection pool settings for the process-wide engine
+    poolConfig = {'pool_size': 5,
+                  'max_overflow': 10,
+                  'pool_timeout': 30,
+                  'pool_pre_ping': True,
+                  'pool_recycle': 3600}
+    
+    # Connection settings applied to every new SQLite connection, picked
+    # with configureProfile. 'driver' keeps what sqlite3 sets up: rollback
+    # journal, synchronous=FULL and its own lock timeout. busy_timeout
+    # comes first so switching the journal mode waits for other connections
+    tuningProfiles = {
+        'driver': {},
+        'safe': {'busy_timeout': 5000,'journal_mode': 'DELETE','synchronous': 'FULL'},
+        'wal': {'busy_timeout': 5000,'journal_mode': 'WAL','synchronous': 'NORMAL'},
+        'tuned': {'busy_timeout': 5000,'journal_mode': 'WAL','synchronous': 'NORMAL',
+                  'cache_size': -65536,'mmap_size': 268435456,'temp_store': 'MEMORY'},
+    }
+    profile = 'tuned'
+    
+    # Prepared statements kept by sqlite3 per connection, and compiled
+    # statements kept by SQLAlchemy per engine and by returningRow
+    statementCacheSize = 500
+    
+    # Server dialects SQLAlchemy renders UPDATE ... RETURNING for; SQLite
+    # gets it through compileReturning
+    returningDialects = ('postgresql','mssql')
+    
+    # When set, every SELECT/UPDATE/DELETE is run through EXPLAIN QUERY
+    # PLAN first and recorded in planLog (see enablePlanCheck)
+    planCheck = False
+    planLog = []
+    
+    _engine = None
+    _defaultBackend = None
+    # Backend of the shard the current thread / task is routed to (see
+    # route) and the engines opened on shards, one pool per shard
+    _routed = contextvars.ContextVar('bankDatabase.routed',default=None)
+    _routedEngines = {}
+    _engineLock = threading.Lock()
+    _statsLock = threading.Lock()
+    _poolStats = {'checkouts': 0, 'misses': 0, 'waits': 0, 'timeouts': 0, 'wait_time': 0.0}
+    _returningCache = LRUCache(statementCacheSize)
+    
+    def __init__(self):
+        self.log = bankTransactionLog()
+        
+    @classmethod
+    def configurePool(cls,**settings):
+        """
+        Update the connection pool settings. The current engine (if any)
+        is disposed so the next connection picks up the new settings.
+        Parameters
+        ----------
+        settings : keyword arguments
+            pool_size, max_overflow, pool_timeout, pool_pre_ping, pool_recycle
+        """
+        unknown = set(settings) - set(cls.poolConfig)
+        if unknown:
+            raise ValueError("Unknown pool setting(s): " + ", ".join(sorted(unknown)))
+        
+        with cls._engineLock:
+            cls.poolConfig.update(settings)
+            cls._dropEngines()
+    
+    @classmethod
+    def configureBackend(cls,backend):
+        """
+        Select the storage every bank* class works on. The current engine
+        (if any) is disposed and the cached tables are dropped, so the
+        next connection opens the new backend and reflects its schema.
+        Parameters
+        ----------
+        backend : bankBackend or string
+            backend object, a URL for bankBackend.fromUrl, or None for
+            the SQLite file at dbUrl
+        """
+        if isinstance(backend,str):
+            backend = bankBackend.fromUrl(backend)
+        
+        with cls._engineLock:
+            cls.backend = backend
+            cls._dropEngines()
+        bankSchema.invalidate()
+    
+    @classmethod
+    def getBackend(cls) -> bankBackend:
+        """
+        Returns the backend connections are opened on: the shard the
+        caller is routed to, otherwise homeBackend()
+        """
+        return cls._routed.get() or cls.homeBackend()
+    
+    @classmethod
+    def homeBackend(cls) -> bankBackend:
+        """
+        Returns the configured backend, the SQLite file at dbUrl by default
+        """
+        if cls.backend is not None:
+            return cls.backend
+        backend = cls._defaultBackend
+        if backend is None or backend.url != dbUrl:
+            backend = cls._defaultBackend = bankSqliteBackend(dbUrl)
+        return backend
+    
+    @classmethod
+    def configureProfile(cls,name):
+        """
+        Select the tuning profile applied to new connections. The current
+        engine (if any) is disposed so every connection gets the profile.
+        Parameters
+        ----------
+        name : string
+            one of tuningProfiles - driver, safe, wal or tuned
+        """
+        if name not in cls.tuningProfiles:
+            raise ValueError("Unknown tuning profile: " + str(name))
+        
+        with cls._engineLock:
+            cls.profile = name
+            cls._dropEngines()
+    
+    @classmethod
+    def applyProfile(cls,dbapi_connection,connection_record = None):
+        """
+        Apply the PRAGMAs of the current tuning profile to a new DBAPI
+        connection; usable as a 'connect' event listener
+        """
+        cursor = dbapi_connection.cursor()
+        try:
+            for pragma,value in cls.tuningProfiles[cls.profile].items():
+                try:
+                    cursor.execute('PRAGMA {p} = {v}'.format(p = pragma,v = value))
+                except sqlite3.OperationalError as e:
+                    # The journal mode cannot change while another
+                    # connection holds the database; keep the current one
+                    if pragma != 'journal_mode':
+                        raise
+                    bankTransactionLog().logTransaction("applyProfile: journal_mode unchanged - " + str(e))
+        finally:
+            cursor.close()
+    
+    @classmethod
+    @contextmanager
+    def route(cls,backend):
+        """
+        Open the connections of the current thread / task on backend, a
+        shard, until the block ends; None routes back to homeBackend()
+        """
+        token = cls._routed.set(backend)
+        try:
+            yield backend
+        finally:
+            cls._routed.reset(token)
+    
+    @classmethod
+    def getEngine(cls):
+        """
+        Returns the process-wide engine, creating it on first use; the
+        engine of the shard when the caller is routed to one
+        Returns
+        -------
+        Engine
+            engine shared by every bankDatabase instance
+        """
+        routed = cls._routed.get()
+        if routed is not None:
+            return cls.routedEngine(routed)
+        
+        if cls._engine is None:
+            with cls._engineLock:
+                if cls._engine is None:
+                    cls._engine = cls.createEngine(cls.getBackend())
+        return cls._engine
+    
+    @classmethod
+    def routedEngine(cls,backend):
+        # Shards are brought to the current schema when first opened,
+        # the cached tables are reflected from whichever database is first
+        engine = cls._routedEngines.get(backend)
+        if engine is None:
+            with cls._engineLock:
+                engine = cls._routedEngines.get(backend)
+                if engine is None:
+                    engine = cls.createEngine(backend)
+                    with engine.connect() as db_engine:
+                        bankSchema.migrate(db_engine)
+                    cls._routedEngines[backend] = engine
+        return engine
+    
+    @classmethod
+    def createEngine(cls,backend):
+        start = time.perf_counter()
+        engine = backend.createEngine(cls.poolConfig,cls.statementCacheSize)
+        event.listen(engine,'connect',cls._onConnect)
+        event.listen(engine,'checkout',cls._onCheckout)
+        if cls.planCheck and engine.dialect.name == 'sqlite':
+            event.listen(engine,'before_cursor_execute',cls._explainStatement)
+        if bankMetrics.enabled:
+            bankMetrics.instrumentEngine(engine)
+        bankMetrics.observe('operation','bankDatabase.createEngine',
+                            time.perf_counter() - start)
+        return engine
+    
+    @classmethod
+    def disposeEngine(cls):
+        """
+        Close every pooled connection and drop the process-wide engine
+        and the engines of the shards
+        """
+        with cls._engineLock:
+            cls._dropEngines()
+    
+    @classmethod
+    def _dropEngines(cls):
+        # Called with _engineLock held
+        if cls._engine is not None:
+            cls._engine.dispose()
+            cls._engine = None
+        for engine in cls._routedEngines.values():
+            engine.dispose()
+        cls._routedEngines = {}
+    
+    @classmethod
+    def enablePlanCheck(cls,enabled = True):
+        """
+        Record the query plan of every statement executed from now on.
+        The engine is recreated so the setting applies to all connections.
+        """
+        cls.planCheck = enabled
+        cls.planLog = []
+        cls.disposeEngine()
+    
+    @classmethod
+    def planScans(cls) -> list:
+        """
+        Returns the recorded (statement, plan step) pairs that scan a
+        whole table or index instead of searching it
+        """
+        scans = []
+        for statement,plan in cls.planLog:
+            for detail in plan:
+                words = detail.split()
+                if words[0] != 'SCAN':
+                    continue
+                # Older SQLite versions report "SCAN TABLE <name>"
+                name = words[2] if words[1] == 'TABLE' else words[1]
+                if not name.startswith('sqlite_'):
+                    scans.append((statement,detail))
+        return scans
+    
+    @classmethod
+    def _explainStatement(cls,conn,cursor,statement,parameters,context,executemany):
+        if executemany or not statement.lstrip().upper().startswith(('SELECT','UPDATE','DELETE')):
+            return
+        plan = cursor.connection.execute('EXPLAIN QUERY PLAN ' + statement,parameters).fetchall()
+        cls.planLog.append((statement,[row[-1] for row in plan]))
+    
+    @classmethod
+    def _onConnect(cls,dbapi_connection,connection_record):
+        # A new database connection had to be opened
+        if cls.getBackend().tuning:
+            cls.applyProfile(dbapi_connection)
+        with cls._statsLock:
+            cls._poolStats['misses'] += 1
+    
+    @classmethod
+    def _onCheckout(cls,dbapi_connection,connection_record,connection_proxy):
+        with cls._statsLock:
+            cls._poolStats['checkouts'] += 1
+    
+    @classmethod
+    def getPoolStats(cls) -> dict:
+        """
+        Returns the connection pool counters
+        Returns
+        -------
+        dict
+            checkouts, hits (reused pooled connections), misses (new
+            connections opened), waits (checkouts that left the pool
+            exhausted, so the next one waits for a connection to be
+            returned), timeouts (checkouts that gave up after
+            pool_timeout) and wait_time, seconds spent in those two
+        """
+        with cls._statsLock:
+            stats = dict(cls._poolStats)
+        stats['hits'] = stats['checkouts'] - stats['misses']
+        
+        if cls._engine is not None:
+            stats['checkedout'] = cls._engine.pool.checkedout()
+            stats['pooled'] = cls._engine.pool.checkedin()
+        return stats
+    
+    @classmethod
+    def resetPoolStats(cls):
+        with cls._statsLock:
+            cls._poolStats.update(checkouts = 0,misses = 0,waits = 0,timeouts = 0,wait_time = 0.0)
+                    
+    def updateReturning(self,db_engine,table,whereclause,values,columns,followup = None,
+                        params = None,cache_key = None):
+        """
+        Run a single conditional UPDATE and return the updated values of
+        the given columns. Uses UPDATE ... RETURNING on SQLite 3.35+ and
+        falls back to UPDATE + SELECT inside one transaction otherwise.
+        Parameters
+        ----------
+        db_engine : Connection
+            open database connection
+        table : Table
+            table to update
+        whereclause : ClauseElement
+            row filter, including any guard conditions
+        values : dict
+            column name to new value or SQL expression
+        columns : list
+            columns whose updated values are returned
+        followup : callable
+            called with the updated row, returns the statement and the
+            parameters executed in the same transaction (e.g. a ledger entry)
+        params : dict
+            values of the bind parameters in whereclause and values
+        cache_key : hashable
+            names a fixed whereclause / values pair so the statement is
+            compiled only on its first use for the table
+        Returns
+        -------
+        RowProxy
+            updated row, None if no row matched the where clause
+        """
+        with db_engine.begin():
+            row = self.returningRow(db_engine,table,whereclause,values,columns,params,cache_key)
+            
+            if row is not None and followup is not None:
+                db_engine.execute(*followup(row))
+            return row
+    
+    def returningRow(self,db_engine,table,whereclause,values,columns,params = None,cache_key = None):
+        # The UPDATE of updateReturning, run in the caller's transaction
+        dialect = db_engine.dialect.name
+        if dialect == 'sqlite' and sqlite3.sqlite_version_info >= (3,35,0):
+            sql,positions,compiled = self.compileReturning(db_engine,table,whereclause,values,
+                                                           columns,cache_key)
+            bound = compiled.construct_params(params)
+            return db_engine.execute(sql,tuple(bound[key] for key in positions)).first()
+        if dialect in self.returningDialects:
+            stmt = self.returningStatement(db_engine,table,whereclause,values,columns,cache_key)
+            return db_engine.execute(stmt,params or {}).first()
+        if db_engine.execute(update(table).where(whereclause).values(**values),params or {}).rowcount == 0:
+            return None
+        return db_engine.execute(select(columns).where(whereclause).limit(1),params or {}).first()
+    
+    @classmethod
+    def compileReturning(cls,db_engine,table,whereclause,values,columns,cache_key = None) -> tuple:
+        """
+        Returns the positional SQL of UPDATE ... RETURNING, the bind
+        parameter names in position order and the compiled UPDATE that
+        binds their values; kept in _returningCache when a cache_key is given
+        """
+        key = (cache_key,table,db_engine.dialect.name) if cache_key is not None else None
+        if key is not None:
+            compiled = cls._returningCache.get(key)
+            if compiled is not None:
+                return compiled
+        
+        # render_postcompile expands IN lists on SQLAlchemy 1.4+
+        stmt = update(table).where(whereclause).values(**values)
+        compiled = stmt.compile(dialect=db_engine.dialect,
+                                compile_kwargs={'render_postcompile': True})
+        compiled = (str(compiled) + " RETURNING " + ", ".join(col.name for col in columns),
+                    compiled.positiontup,compiled)
+        if key is not None:
+            cls._returningCache[key] = compiled
+        return compiled
+    
+    @classmethod
+    def returningStatement(cls,db_engine,table,whereclause,values,columns,cache_key = None):
+        # UPDATE ... RETURNING of the server dialects, kept in _returningCache
+        # so the engine's compiled cache finds the same statement again
+        key = (cache_key,table,db_engine.dialect.name) if cache_key is not None else None
+        stmt = cls._returningCache.get(key) if key is not None else None
+        if stmt is None:
+            stmt = update(table).where(whereclause).values(**values).returning(*columns)
+            if key is not None:
+                cls._returningCache[key] = stmt
+        return stmt
+    
+    @staticmethod
+    def insertIgnore(db_engine,table):
+        """
+        Returns an INSERT into table that skips rows whose key already
+        exists, in the syntax of the connection's database
+        """
+        if db_engine.dialect.name == 'postgresql':
+            return postgresql.insert(table).on_conflict_do_nothing()
+        if db_engine.dialect.name == 'mysql':
+            return insert(table).prefix_with('IGNORE')
+        return insert(table).prefix_with('OR IGNORE')
+                    
+    @contextmanager
+    def db_connect(self,dbURL):
+        engine = self.getEngine()
+        pool = engine.pool
+        
+        with self.getBackend().serialized():
+            self.log.logTransaction('opening connection to database')
+            start = time.perf_counter()
+            try:
+                connection = engine.connect()
+            except PoolTimeoutError:
+                with self._statsLock:
+                    self._poolStats['timeouts'] += 1
+                    self._poolStats['wait_time'] += time.perf_counter() - start
+                raise
+            
+            elapsed = time.perf_counter() - start
+            bankMetrics.observe('operation','bankDatabase.db_connect',elapsed)
+            
+            # Read once the connection is ours: no connection is left idle
+            # and no overflow one may be opened, the next checkout waits
+            if pool.checkedin() == 0 and pool.overflow() >= self.poolConfig['max_overflow']:
+                with self._statsLock:
+                    self._poolStats['waits'] += 1
+                    self._poolStats['wait_time'] += elapsed
+            try:
+                yield connection
+            finally:
+                self.log.logTransaction('closing connection to database')
+                connection.close()
+    
+class bankSchema:
+    
+    # Tables reflected once per process and shared by every bank* class
+    tableNames = ('user','cust_accounts','id_sequence','transactions',
+                  'snapshot_runs','balance_snapshots','session_revocations')
+    
+    # Tables of BankingSystem-DB.db, created before the migrations when
+    # a SQLite backend starts from an empty database
+    baseTables = [
+        """CREATE TABLE IF NOT EXISTS "user" (
+                "user_id" INTEGER,
+                "user_type" TEXT,
+                "user_create_dt" TEXT,
+                "first_name" TEXT,
+                "last_name" TEXT,
+                "designation" TEXT,
+                "status" TEXT,
+                PRIMARY KEY("user_id"))""",
+        """CREATE TABLE IF NOT EXISTS "cust_accounts" (
+                "user_id" INTEGER,
+                "acct_type" TEXT,
+                "available_bal" INTEGER,
+                "remaining_bal" INTEGER,
+                "acct_no" INTEGER,
+                "acct_sts" TEXT,
+                PRIMARY KEY("user_id","acct_no"))""",
+    ]
+    
+    # Schema migrations applied in order, PRAGMA user_version records
+    # how many of them the database has already seen
+    migrations = [
+        # 1: sequence counters for bankIdAllocator
+        ["""CREATE TABLE IF NOT EXISTS id_sequence (
+                name TEXT PRIMARY KEY,
+                next_value INTEGER NOT NULL,
+                feistel_key TEXT NOT NULL)"""],
+        # 2: indexes for the hot-path lookups
+        ["CREATE UNIQUE INDEX IF NOT EXISTS ix_cust_accounts_acct_no ON cust_accounts (acct_no)",
+         "CREATE INDEX IF NOT EXISTS ix_cust_accounts_sts ON cust_accounts (acct_sts, acct_type)",
+         "CREATE INDEX IF NOT EXISTS ix_user_first_name ON user (lower(first_name))",
+         "CREATE INDEX IF NOT EXISTS ix_user_status ON user (status, user_type)"],
+        # 3: append-only ledger of postings, read newest first per account
+        ["""CREATE TABLE IF NOT EXISTS transactions (
+                txn_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                acct_no INTEGER NOT NULL,
+                txn_type TEXT NOT NULL,
+                amount INTEGER NOT NULL,
+                available_bal INTEGER NOT NULL,
+                remaining_bal INTEGER NOT NULL,
+                txn_ts TEXT NOT NULL)""",
+         "CREATE INDEX IF NOT EXISTS ix_transactions_acct_ts ON transactions (acct_no, txn_ts, txn_id)"],
+        # 4: balance checkpoints for point-in-time queries, seeded with the
+        # balances of the accounts that have no postings in the ledger
+        ["""CREATE TABLE IF NOT EXISTS snapshot_runs (
+                run_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                snap_ts TEXT NOT NULL,
+                last_txn_id INTEGER NOT NULL)""",
+         "CREATE INDEX IF NOT EXISTS ix_snapshot_runs_ts ON snapshot_runs (snap_ts)",
+         """CREATE TABLE IF NOT EXISTS balance_snapshots (
+                acct_no INTEGER NOT NULL,
+                run_id INTEGER NOT NULL,
+                snap_ts TEXT NOT NULL,
+                available_bal INTEGER NOT NULL,
+                remaining_bal INTEGER NOT NULL,
+                PRIMARY KEY (acct_no, run_id)) WITHOUT ROWID""",
+         """INSERT INTO snapshot_runs (snap_ts, last_txn_id)
+                VALUES ('0000-00-00 00:00:00', 0)""",
+         """INSERT INTO balance_snapshots (acct_no, run_id, snap_ts, available_bal, remaining_bal)
+                SELECT acct_no, last_insert_rowid(), '0000-00-00 00:00:00',
+                       coalesce(available_bal, 0), coalesce(remaining_bal, 0)
+                FROM cust_accounts
+                WHERE acct_no NOT IN (SELECT acct_no FROM transactions)"""],
+        # 5: interest carried below a whole unit and the last accrual date
+        ["ALTER TABLE cust_accounts ADD COLUMN accrued_int REAL DEFAULT 0",
+         "ALTER TABLE cust_accounts ADD COLUMN accrued_on TEXT"],
+        # 6: last status change per user, session tokens issued before it
+        # are rejected by every process
+        ["""CREATE TABLE IF NOT EXISTS session_revocations (
+                user_id INTEGER PRIMARY KEY,
+                revoked_at REAL NOT NULL)""",
+         "CREATE INDEX IF NOT EXISTS ix_session_revocations_at ON session_revocations (revoked_at)"],
+    ]
+    
+    # Tables and schema version reflected through each engine; a new
+    # engine (another URL, a shard, an engine recreated after
+    # configurePool) reflects again. _tables holds the last ones loaded.
+    _loaded = weakref.WeakKeyDictionary()
+    _tables = None
+    _version = None
+    _lock = threading.Lock()
+    
+    @classmethod
+    def migrate(cls,db_engine) -> int:
+        """
+        Apply the pending schema migrations
+        Parameters
+        ----------
+        db_engine : Connection
+            open database connection
+        Returns
+        -------
+        int
+            number of migrations applied
+        """
+        if bankDatabase.getBackend().versioning != 'pragma':
+            return cls.createTables(db_engine)
+        if db_engine.execute('PRAGMA user_version').scalar() >= len(cls.migrations):
+            return 0
+        
+        # Run on the DBAPI connection: BEGIN IMMEDIATE serialises concurrent
+        # migrators and SQLAlchemy would otherwise autocommit after each DDL
+        cursor = db_engine.connection.cursor()
+        try:
+            cursor.execute('BEGIN IMMEDIATE')
+            current = cursor.execute('PRAGMA user_version').fetchone()[0]
+            if current == 0:
+                for stmt in cls.baseTables:
+                    cursor.execute(stmt)
+            for version in range(current,len(cls.migrations)):
+                for stmt in cls.migrations[version]:
+                    cursor.execute(stmt)
+            cursor.execute('PRAGMA user_version = {v}'.format(v = len(cls.migrations)))
+            cursor.execute('COMMIT')
+        except Exception:
+            cursor.execute('ROLLBACK')
+            raise
+        finally:
+            cursor.close()
+        return max(len(cls.migrations) - current,0)
+    
+    @staticmethod
+    def tableDefinitions() -> MetaData:
+        """
+        Returns the tables of the current migration as SQLAlchemy table
+        definitions, from which server databases are created, plus
+        schema_version recording their version
+        """
+        metadata = MetaData()
+        # 64 bit keys and amounts; SQLite needs INTEGER for autoincrement
+        bigint = BigInteger().with_variant(Integer,'sqlite')
+        
+        user = Table('user',metadata,
+                     Column('user_id',BigInteger,primary_key=True,autoincrement=False),
+                     *[Column(name,Text) for name in ('user_type','user_create_dt','first_name',
+                                                      'last_name','designation','status')])
+        Index('ix_user_first_name',func.lower(user.columns.first_name))
+        Index('ix_user_status',user.columns.status,user.columns.user_type)
+        
+        Table('cust_accounts',metadata,
+              Column('user_id',BigInteger),
+              Column('acct_type',Text),
+              Column('available_bal',BigInteger),
+              Column('remaining_bal',BigInteger),
+              Column('acct_no',BigInteger),
+              Column('acct_sts',Text),
+              Column('accrued_int',Float,server_default='0'),
+              Column('accrued_on',Text),
+              PrimaryKeyConstraint('user_id','acct_no'),
+              Index('ix_cust_accounts_acct_no','acct_no',unique=True),
+              Index('ix_cust_accounts_sts','acct_sts','acct_type'))
+        
+        Table('id_sequence',metadata,
+              Column('name',Text,primary_key=True),
+              Column('next_value',BigInteger,nullable=False),
+              Column('feistel_key',Text,nullable=False))
+        
+        Table('transactions',metadata,
+              Column('txn_id',bigint,primary_key=True,autoincrement=True),
+              Column('acct_no',BigInteger,nullable=False),
+              Column('txn_type',Text,nullable=False),
+              Column('amount',BigInteger,nullable=False),
+              Column('available_bal',BigInteger,nullable=False),
+              Column('remaining_bal',BigInteger,nullable=False),
+              Column('txn_ts',Text,nullable=False),
+              Index('ix_transactions_acct_ts','acct_no','txn_ts','txn_id'))
+        
+        Table('snapshot_runs',metadata,
+              Column('run_id',bigint,primary_key=True,autoincrement=True),
+              Column('snap_ts',Text,nullable=False),
+              Column('last_txn_id',BigInteger,nullable=False),
+              Index('ix_snapshot_runs_ts','snap_ts'))
+        
+        Table('balance_snapshots',metadata,
+              Column('acct_no',BigInteger,nullable=False),
+              Column('run_id',BigInteger,nullable=False),
+              Column('snap_ts',Text,nullable=False),
+              Column('available_bal',BigInteger,nullable=False),
+              Column('remaining_bal',BigInteger,nullable=False),
+              PrimaryKeyConstraint('acct_no','run_id'))
+        
+        Table('session_revocations',metadata,
+              Column('user_id',BigInteger,primary_key=True,autoincrement=False),
+              Column('revoked_at',Float,nullable=False),
+              Index('ix_session_revocations_at','revoked_at'))
+        
+        Table('schema_version',metadata,
+              Column('version',Integer,nullable=False))
+        return metadata
+    
+    @classmethod
+    def createTables(cls,db_engine) -> int:
+        """
+        Bring a server database up to the current migration: create the
+        missing tables from tableDefinitions and record the version in
+        schema_version. The migrations themselves are SQLite DDL.
+        Parameters
+        ----------
+        db_engine : Connection
+            open database connection
+        Returns
+        -------
+        int
+            number of migrations the database was behind
+        """
+        metadata = cls.tableDefinitions()
+        versions = metadata.tables['schema_version']
+        current = 0
+        if db_engine.dialect.has_table(db_engine,'schema_version'):
+            current = db_engine.execute(select([func.max(versions.columns.version)])).scalar() or 0
+            if current >= len(cls.migrations):
+                return 0
+        
+        with db_engine.begin():
+            metadata.create_all(db_engine)
+            if current == 0:
+                # Same starting run as migration 4, no accounts to seed yet
+                db_engine.execute(insert(metadata.tables['snapshot_runs']),
+                                  {'snap_ts': '0000-00-00 00:00:00','last_txn_id': 0})
+            db_engine.execute(insert(versions),{'version': len(cls.migrations)})
+        return len(cls.migrations) - current
+    
+    @classmethod
+    def load(cls,db_engine):
+        """
+        Apply pending migrations, then reflect the banking tables and
+        record the schema version
+        Parameters
+        ----------
+        db_engine : Connection
+            open database connection
+        """
+        with cls._lock:
+            start = time.perf_counter()
+            cls.migrate(db_engine)
+            metadata = MetaData()
+            with warnings.catch_warnings():
+                # SQLAlchemy cannot reflect the lower(first_name) index
+                warnings.filterwarnings('ignore','.*expression-based index',SAWarning)
+                tables = {name: Table(name, metadata, autoload_with=db_engine)
+                          for name in cls.tableNames}
+            cls._version = cls.schemaVersion(db_engine)
+            cls._tables = tables
+            cls._loaded[db_engine.engine] = (tables,cls._version)
+            bankMetrics.observe('operation','bankSchema.load',time.perf_counter() - start)
+    
+    @classmethod
+    def table(cls,name,db_engine) -> Table:
+        """
+        Returns the cached table, reflecting the schema on first use of
+        the engine of db_engine
+        Parameters
+        ----------
+        name : string
+            table name - user or cust_accounts
+        db_engine : Connection
+            open database connection, None for the tables last loaded
+        Returns
+        -------
+        Table
+            reflected table
+        """
+        if db_engine is None:
+            return cls._tables[name]
+        loaded = cls._loaded.get(db_engine.engine)
+        if loaded is None:
+            cls.load(db_engine)
+            loaded = cls._loaded[db_engine.engine]
+        return loaded[0][name]
+    
+    @staticmethod
+    def schemaVersion(db_engine) -> int:
+        if bankDatabase.getBackend().versioning != 'pragma':
+            return db_engine.execute('SELECT max(version) FROM schema_version').scalar()
+        return db_engine.execute('PRAGMA schema_version').scalar()
+    
+    @classmethod
+    def invalidate(cls):
+        """
+        Drop the cached tables so the next table() call reflects again
+        """
+        with cls._lock:
+            cls._loaded.clear()
+            cls._tables = None
+            cls._version = None
+    
+    @classmethod
+    def refreshIfChanged(cls,db_engine) -> bool:
+        """
+        Reload the cached tables if the database schema version changed
+        since they were reflected
+        Parameters
+        ----------
+        db_engine : Connection
+            open database connection
+        Returns
+        -------
+        bool
+            True if the tables were reloaded, False otherwise
+        """
+        loaded = cls._loaded.get(db_engine.engine)
+        if loaded is not None and cls.schemaVersion(db_engine) == loaded[1]:
+            return False
+        cls.load(db_engine)
+        return True
@@ -0,0 +1,317 @@
+from sqlalchemy import Integer,and_,exists,func,insert,literal,select
+from contextlib import nullcontext
+from datetime import datetime
+from itertools import islice
+import argparse
+import csv
+import json
+import os
+
+from .database import bankDatabase,bankSchema,dbUrl
+from .errors import ValidationError
+from .logs import bankTransactionLog
+
+class bankDataTransfer:
+    
+    # Tables that can be imported / exported
+    tableNames = ('user','cust_accounts','transactions')
+    
+    # File formats recognised by extension
+    formats = {'.csv': 'csv', '.jsonl': 'jsonl', '.json': 'jsonl'}
+    
+    # Unique column an imported row conflicts on, per table
+    keyColumns = {'user': 'user_id', 'cust_accounts': 'acct_no', 'transactions': 'txn_id'}
+    
+    def __init__(self):
+        self.db =  bankDatabase()
+        self.log = bankTransactionLog()
+    
+    def fileFormat(self,path,fmt = None) -> str:
+        if fmt is None:
+            fmt = self.formats.get(os.path.splitext(path)[1].lower())
+        if fmt not in ('csv','jsonl'):
+            raise ValidationError("Validation Error: Unknown file format for " + path)
+        return fmt
+    
+    def readRecords(self,path,fmt):
+        """
+        Yields one dict per record of a CSV or JSONL file
+        """
+        with open(path,newline='') as f:
+            if fmt == 'csv':
+                for record in csv.DictReader(f):
+                    yield record
+            else:
+                for line in f:
+                    if line.strip():
+                        yield json.loads(line)
+    
+    def convertRecord(self,table,record,line) -> dict:
+        # Keep only the table columns and convert them to the column type
+        row = {}
+        for column in table.columns:
+            value = record.get(column.name)
+            if value == '':
+                value = None
+            if value is not None and isinstance(column.type,Integer):
+                try:
+                    value = int(value)
+                except (TypeError,ValueError):
+                    raise ValidationError("Validation Error: line {line}, {col} is not a number"
+                                          .format(line = line,col = column.name))
+            row[column.name] = value
+        
+        for column in table.primary_key.columns:
+            if row[column.name] is None:
+                raise ValidationError("Validation Error: line {line}, {col} is required"
+                                      .format(line = line,col = column.name))
+        return row
+    
+    def readCheckpoint(self,checkpoint,path,table_name) -> dict:
+        state = {'rows': 0, 'imported': 0, 'skipped': []}
+        if not os.path.exists(checkpoint):
+            return state
+        with open(checkpoint) as f:
+            saved = json.load(f)
+        if saved['source'] != os.path.abspath(path) or saved['table'] != table_name:
+            raise ValidationError("Validation Error: checkpoint {cp} belongs to another import"
+                                  .format(cp = checkpoint))
+        state.update((key,saved[key]) for key in state if key in saved)
+        return state
+    
+    def writeCheckpoint(self,checkpoint,path,table_name,state):
+        # Write then rename so a crash never leaves a half written checkpoint
+        tmp = checkpoint + '.tmp'
+        with open(tmp,'w') as f:
+            json.dump(dict(state,source = os.path.abspath(path),table = table_name),f)
+        os.replace(tmp,checkpoint)
+    
+    def importTable(self,table_name,path,fmt = None,chunk_size = 1000,checkpoint = None,router = None) -> dict:
+        """
+        Stream a CSV or JSONL file into the user, cust_accounts or transactions table.
+        Rows are inserted in chunks, one transaction per chunk, and a
+        checkpoint is saved after every chunk so a failed import resumes
+        after the last committed chunk. Rows whose key (user_id, acct_no
+        or txn_id) is already in the table or earlier in the file are
+        skipped and their lines reported, which makes replaying a chunk
+        after a crash harmless. Imported accounts get the 'open' ledger
+        entry addAccount writes, holding their balances at import time,
+        so point-in-time queries find them.
+        Parameters
+        ----------
+        table_name : string
+            user, cust_accounts or transactions
+        path : string
+            source file
+        fmt : string
+            csv or jsonl, taken from the file extension if not given
+        chunk_size : int
+            rows per transaction
+        checkpoint : string
+            checkpoint file, defaults to <path>.checkpoint
+        router : bankShardRouter
+            puts accounts and ledger entries in the shard of their acct_no;
+            users stay in the home database
+        Returns
+        -------
+        dict
+            rows - rows read from the file, including resumed ones
+            imported - rows inserted
+            skipped - line numbers of the rows skipped
+        """
+        
+        self.log.logTransaction("Open importTable")
+        
+        if table_name not in self.tableNames:
+            raise ValidationError("Validation Error: Unknown table " + table_name)
+        fmt = self.fileFormat(path,fmt)
+        if checkpoint is None:
+            checkpoint = path + '.checkpoint'
+        
+        state = self.readCheckpoint(checkpoint,path,table_name)
+        records = islice(enumerate(self.readRecords(path,fmt),1),state['rows'],None)
+        if table_name == 'user':
+            router = None
+        
+        with self.db.db_connect(dbUrl) as db_engine:
+            table = bankSchema.table(table_name, db_engine)
+        
+        while True:
+            chunk = [(line,self.convertRecord(table,record,line))
+                     for line,record in islice(records,chunk_size)]
+            if not chunk:
+                break
+            
+            # Shards commit separately; replaying a chunk skips the rows a
+            # shard already committed
+            shards = {}
+            for line,row in chunk:
+                shard = router.shardOf(row['acct_no']) if router is not None else None
+                shards.setdefault(shard,[]).append((line,row))
+            for shard,rows in shards.items():
+                with self.db.route(shard) if router is not None else nullcontext(), \
+                     self.db.db_connect(dbUrl) as db_engine:
+                    imported,skipped = self.importChunk(db_engine,table_name,rows)
+                state['imported'] += imported
+                state['skipped'] += skipped
+            
+            state['rows'] += len(chunk)
+            state['skipped'].sort()
+            self.writeCheckpoint(checkpoint,path,table_name,state)
+            self.log.logTransaction("importTable {tbl}: {rows} rows committed, {cnt} skipped".format(
+                                    tbl = table_name,rows = state['rows'],cnt = len(state['skipped'])))
+        
+        if os.path.exists(checkpoint):
+            os.remove(checkpoint)
+        
+        if state['skipped']:
+            self.log.logTransaction("importTable {tbl}: skipped lines {lines}".format(
+                                    tbl = table_name,lines = ','.join(map(str,state['skipped']))))
+        self.log.logTransaction("Close importTable")
+        return state
+    
+    def importChunk(self,db_engine,table_name,chunk) -> tuple:
+        """
+        Insert a chunk of (line, row) pairs in one transaction
+        Returns
+        -------
+        tuple
+            rows inserted and the lines skipped because their key is taken
+        """
+        table = bankSchema.table(table_name, db_engine)
+        key = table.columns[self.keyColumns[table_name]]
+        
+        with db_engine.begin():
+            # Pieces of 500 stay below SQLite's bound parameter limit
+            keys = [row[key.name] for line,row in chunk]
+            taken = set()
+            for start in range(0,len(keys),500):
+                stmt = select([key]).where(key.in_(keys[start:start + 500]))
+                taken.update(row[0] for row in db_engine.execute(stmt))
+            
+            rows,skipped = [],[]
+            for line,row in chunk:
+                if row[key.name] in taken:
+                    skipped.append(line)
+                else:
+                    taken.add(row[key.name])
+                    rows.append(row)
+            if not rows:
+                return 0,skipped
+            
+            # Still ignoring conflicts, a concurrent writer may have taken
+            # a key since; rowcount counts only the rows inserted
+            imported = db_engine.execute(self.db.insertIgnore(db_engine,table),rows).rowcount
+            if table_name == 'cust_accounts':
+                self.openingEntries(db_engine,table,[row['acct_no'] for row in rows])
+        return imported,skipped
+    
+    def openingEntries(self,db_engine,cust_accounts,acct_nos):
+        # 'open' ledger rows for the accounts of acct_nos that have no
+        # ledger row yet; replayed chunks and accounts with history are
+        # left alone. Pieces of 500 stay below SQLite's bound parameter limit.
+        ledger = bankSchema.table('transactions', db_engine)
+        txn_ts = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        for start in range(0,len(acct_nos),500):
+            accounts = select([cust_accounts.c.acct_no,
+                               literal('open'),
+                               func.coalesce(cust_accounts.c.available_bal,0),
+                               func.coalesce(cust_accounts.c.available_bal,0),
+                               func.coalesce(cust_accounts.c.remaining_bal,0),
+                               literal(txn_ts)]) \
+                .where(and_(cust_accounts.c.acct_no.in_(acct_nos[start:start + 500]),
+                            ~exists().where(ledger.c.acct_no == cust_accounts.c.acct_no)))
+            db_engine.execute(insert(ledger).from_select(['acct_no','txn_type','amount','available_bal',
+                                                          'remaining_bal','txn_ts'],accounts))
+    
+    def exportTable(self,table_name,path,fmt = None,chunk_size = 1000) -> int:
+        """
+        Stream the user, cust_accounts or transactions table to a CSV or JSONL file
+        Parameters
+        ----------
+        table_name : string
+            user, cust_accounts or transactions
+        path : string
+            target file
+        fmt : string
+            csv or jsonl, taken from the file extension if not given
+        chunk_size : int
+            rows fetched from the database at a time
+        Returns
+        -------
+        int
+            number of rows written
+        """
+        
+        self.log.logTransaction("Open exportTable")
+        
+        if table_name not in self.tableNames:
+            raise ValidationError("Validation Error: Unknown table " + table_name)
+        fmt = self.fileFormat(path,fmt)
+        rows = 0
+        
+        with self.db.db_connect(dbUrl) as db_engine, open(path,'w',newline='') as f:
+            table = bankSchema.table(table_name, db_engine)
+            columns = [column.name for column in table.columns]
+            
+            if fmt == 'csv':
+                writer = csv.writer(f)
+                writer.writerow(columns)
+            
+            result = db_engine.execute(select([table]))
+            while True:
+                chunk = result.fetchmany(chunk_size)
+                if not chunk:
+                    break
+                for row in chunk:
+                    if fmt == 'csv':
+                        writer.writerow(list(row))
+                    else:
+                        f.write(json.dumps(dict(zip(columns,row))) + '\n')
+                rows += len(chunk)
+        
+        self.log.logTransaction("Close exportTable")
+        return rows
+    
+    @classmethod
+    def main(cls,argv) -> int:
+        """
+        Command line entry point for bulk import / export
+        """
+        parser = argparse.ArgumentParser(prog='BankingSystem-Python-OOP.py',
+                                         description='Bulk import / export of users and accounts')
+        parser.add_argument('mode',choices=('import','export'))
+        parser.add_argument('table',choices=cls.tableNames)
+        parser.add_argument('path')
+        parser.add_argument('--format',choices=('csv','jsonl'))
+        parser.add_argument('--chunk-size',type=int,default=1000)
+        parser.add_argument('--checkpoint',help='import checkpoint file, default <path>.checkpoint')
+        parser.add_argument('--shard',action='append',dest='shards',metavar='SHARD',
+                            help='import accounts and ledger entries into their shard, once per shard')
+        args = parser.parse_args(argv)
+        
+        transfer = cls()
+        try:
+            if args.mode == 'import':
+                router = None
+                if args.shards:
+                    from .shards import bankShardRouter
+                    router = bankShardRouter(args.shards)
+                try:
+                    summary = transfer.importTable(args.table,args.path,args.format,
+                                                   args.chunk_size,args.checkpoint,router)
+                finally:
+                    if router is not None:
+                        router.close()
+                print("{imported} of {rows} rows imported into {tbl}".format(tbl = args.table,**summary))
+                if summary['skipped']:
+                    print("{cnt} rows skipped, their key already exists: lines {lines}".format(
+                          cnt = len(summary['skipped']),lines = ', '.join(map(str,summary['skipped']))))
+            else:
+                rows = transfer.exportTable(args.table,args.path,args.format,args.chunk_size)
+                print("{rows} rows exported from {tbl}".format(rows = rows,tbl = args.table))
+        except ValidationError as e:
+            transfer.log.logTransaction("Exception: bulk " + args.mode)
+            print(e.message)
+            return 1
+        return 0
@@ -0,0 +1,9 @@
+class ValidationError(Exception):
+    def __init__(self, message):
+        self.message = message
+    def __repr__(self):
+        return self.message
+
+class AuthenticationError(ValidationError):
+    # Missing, invalid, expired or revoked session token
+    pass
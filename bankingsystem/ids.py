@@ -0,0 +1,162 @@
+from sqlalchemy.exc import IntegrityError
+import hashlib
+import re
+import secrets
+import threading
+
+from .database import bankDatabase,bankSchema,dbUrl
+from .errors import ValidationError
+
+class bankIdAllocator:
+    
+    # ID ranges owned by the allocator, above the ranges used by the
+    # original randint based IDs so the two never collide
+    idRanges = {'user': (1000000,999999999),
+                'acct_no': (1000000000,99999999999)}
+    # Column holding the IDs, whose unique violations insertWithId retries
+    idColumns = {'user': 'user_id',
+                 'acct_no': 'acct_no'}
+    
+    blockSize = 100
+    rounds = 4
+    # IDs tried by insertWithId before giving up
+    collisionRetries = 10
+    
+    _allocators = {}
+    _registryLock = threading.Lock()
+    
+    def __init__(self,name,low,high,block_size = None,column = None):
+        """
+        Hands out unique, non sequential IDs in [low, high]. A counter is
+        reserved from the id_sequence table in blocks and every counter
+        value is mapped through a keyed Feistel permutation of the range,
+        so allocation needs no lookup of existing rows. IDs handed out are
+        unique among themselves only: rows imported or written without
+        the allocator can hold IDs of the range, insertWithId skips those.
+        Parameters
+        ----------
+        name : string
+            sequence name in id_sequence
+        low, high : int
+            inclusive ID range
+        block_size : int
+            counters reserved per database round trip
+        column : string
+            column the IDs are inserted into, idColumns[name] or name
+        """
+        self.db = bankDatabase()
+        self.name = name
+        self.column = column or self.idColumns.get(name,name)
+        self.low = low
+        self.size = high - low + 1
+        self.blockSize = block_size or self.blockSize
+        # Balanced Feistel network over the smallest even bit width
+        # covering the range, values outside it are cycle-walked
+        self.halfBits = ((self.size - 1).bit_length() + 1) // 2
+        self.halfMask = (1 << self.halfBits) - 1
+        
+        self._lock = threading.Lock()
+        self._key = None
+        self._next = 0
+        self._end = 0
+        # Backend the block was reserved from, a new one starts a new block
+        self._backend = None
+    
+    @classmethod
+    def forName(cls,name):
+        """
+        Returns the process-wide allocator for user or acct_no
+        """
+        with cls._registryLock:
+            if name not in cls._allocators:
+                low,high = cls.idRanges[name]
+                cls._allocators[name] = cls(name,low,high)
+            return cls._allocators[name]
+    
+    def _reserveBlock(self):
+        # Sequences live in the home database, also when the caller is
+        # routed to a shard (see bankShardRouter)
+        self._backend = self.db.homeBackend()
+        with self.db.route(None),self.db.db_connect(dbUrl) as db_engine:
+            id_sequence = bankSchema.table('id_sequence', db_engine)
+            
+            with db_engine.begin():
+                db_engine.execute(self.db.insertIgnore(db_engine,id_sequence),
+                                  name = self.name,next_value = 0,
+                                  feistel_key = secrets.token_hex(16))
+            
+            row = self.db.updateReturning(db_engine,id_sequence,
+                                          id_sequence.columns.name == self.name,
+                                          {'next_value': id_sequence.columns.next_value + self.blockSize},
+                                          [id_sequence.columns.next_value,
+                                           id_sequence.columns.feistel_key])
+        
+        self._key = bytes.fromhex(row.feistel_key)
+        self._end = min(int(row.next_value),self.size)
+        self._next = int(row.next_value) - self.blockSize
+    
+    def _round(self,value,rnd) -> int:
+        digest = hashlib.blake2b(value.to_bytes(8,'big') + bytes([rnd]),
+                                 key=self._key,digest_size=8).digest()
+        return int.from_bytes(digest,'big') & self.halfMask
+    
+    def permute(self,counter) -> int:
+        """
+        Maps a counter in [0, size) to a unique ID in [low, high]
+        """
+        value = counter
+        while True:
+            left,right = value >> self.halfBits,value & self.halfMask
+            for rnd in range(self.rounds):
+                left,right = right,left ^ self._round(right,rnd)
+            value = (left << self.halfBits) | right
+            if value < self.size:
+                return self.low + value
+    
+    def isCollision(self,error) -> bool:
+        """
+        Whether an IntegrityError is a unique or primary key violation on
+        the ID column, as reported by sqlite3, PostgreSQL (SQLSTATE 23505)
+        or MySQL (error 1062, which names the key rather than the column)
+        """
+        orig = error.orig
+        message = str(orig)
+        names_column = re.search(r'\b' + re.escape(self.column) + r'\b',message) is not None
+        if getattr(orig,'pgcode',None) is not None:
+            return orig.pgcode == '23505' and names_column
+        if orig.args and orig.args[0] == 1062:
+            return names_column or "'PRIMARY'" in message
+        return message.startswith('UNIQUE constraint failed') and names_column
+    
+    def insertWithId(self,insert_row) -> tuple:
+        """
+        Allocate an ID and insert its row with insert_row(id); when the
+        insert violates a unique constraint on the ID column the ID is
+        taken by a row from outside the allocator, so another one is
+        allocated. Any other IntegrityError is raised.
+        Returns
+        -------
+        tuple
+            the ID inserted and the return value of insert_row
+        """
+        for attempt in range(self.collisionRetries):
+            new_id = self.allocate()
+            try:
+                return new_id,insert_row(new_id)
+            except IntegrityError as e:
+                if not self.isCollision(e):
+                    raise
+        raise ValidationError("Error: No free ID found for " + self.name)
+    
+    def allocate(self) -> int:
+        """
+        Returns a new unique ID
+        """
+        with self._lock:
+            if self._next >= self._end or self._backend is not self.db.homeBackend():
+                self._reserveBlock()
+                if self._next >= self._end:
+                    raise ValidationError("Error: ID space exhausted for " + self.name)
+            counter = self._next
+            self._next += 1
+        return self.permute(counter)
@@ -0,0 +1,271 @@
+from sqlalchemy import select,insert,update,and_,or_,literal,bindparam
+from sqlalchemy.exc import SQLAlchemyError
+from datetime import date,datetime
+from itertools import repeat
+import argparse
+import time
+
+try:
+    import numpy as np
+except ImportError:
+    # Optional: only the interest job needs it
+    np = None
+
+from .cache import bankBalanceCache
+from .database import bankDatabase,bankSchema,dbUrl
+from .errors import ValidationError
+from .logs import bankTransactionLog
+from .metrics import bankMetrics
+
+class bankInterest:
+
+    # Annual interest rates, compounded daily: paid on the available
+    # balance of Savings, charged on the remaining balance of Loan / Credit
+    annualRates = {'Savings': 0.02, 'Loan': 0.065, 'Credit': 0.18}
+    debtTypes = ('Loan','Credit')
+
+    # Monthly maintenance fee of Checking accounts below minimumBalance,
+    # charged once for every month end the accrual period crosses
+    maintenanceFee = 5
+    minimumBalance = 100
+
+    def __init__(self,annual_rates = None,balance_cache = None):
+        """
+        Daily interest accrual and fee batch job over cust_accounts.
+        Accounts are read in acct_no order in chunks, the accruals of a
+        chunk are computed on NumPy arrays and written back with one
+        executemany UPDATE in one transaction per chunk. Interest below a
+        whole unit is carried in accrued_int until it adds up; accrued_on
+        records the last accrual date, so a day is never accrued twice and
+        missed days are caught up on the next run.
+        Parameters
+        ----------
+        annual_rates : dict
+            account type -> annual rate, defaults to annualRates
+        balance_cache : bankBalanceCache
+            cache cleared after each chunk, the shared cache by default
+        """
+        if np is None:
+            raise ImportError("bankInterest needs NumPy: pip install numpy")
+
+        self.db = bankDatabase()
+        self.log = bankTransactionLog()
+        self.annualRates = dict(annual_rates or self.annualRates)
+        self.cache = balance_cache or bankBalanceCache.shared()
+
+    @staticmethod
+    def parseDate(run_date) -> str:
+        if run_date is None:
+            return date.today().isoformat()
+        try:
+            return datetime.strptime(str(run_date),'%Y-%m-%d').date().isoformat()
+        except ValueError:
+            raise ValidationError("Validation Error: Invalid date " + str(run_date))
+
+    def chunkQuery(self,cust_accounts,run_date,chunk_size):
+        # Raw columns of the next chunk of accounts not yet accrued up to
+        # run_date; everything derived from them is computed on arrays
+        columns = cust_accounts.columns
+        types = list(self.annualRates) + (['Checking'] if self.maintenanceFee else [])
+        stmt = select([columns.acct_no,columns.acct_type,columns.available_bal,columns.remaining_bal,
+                       columns.accrued_int,columns.accrued_on])
+        # acct_sts || '' keeps the planner off ix_cust_accounts_sts, which
+        # would sort every remaining account for each chunk, so chunks walk
+        # the acct_no index from the last account of the previous one
+        stmt = stmt.where(and_(columns.acct_no > bindparam('last'),
+                               columns.acct_sts.concat('') == 'ACTIVE',
+                               columns.acct_type.in_(types),
+                               or_(columns.accrued_on == None,columns.accrued_on < run_date)))
+        return stmt.order_by(columns.acct_no).limit(chunk_size)
+
+    def accrue(self,rows,run_date) -> dict:
+        """
+        Compute the postings of a chunk of rows from chunkQuery
+        Returns
+        -------
+        dict
+            NumPy arrays acct_no, interest (whole units posted), fee,
+            available (change of available_bal), remaining (change of
+            remaining_bal) and accrued (fraction carried)
+        """
+        acct_no,acct_type,available,remaining,accrued,accrued_on = zip(*rows)
+        acct_type = np.asarray(acct_type)
+        available = np.nan_to_num(np.asarray(available,dtype=np.float64))
+        remaining = np.nan_to_num(np.asarray(remaining,dtype=np.float64))
+        accrued = np.nan_to_num(np.asarray(accrued,dtype=np.float64))
+
+        is_debt = np.isin(acct_type,self.debtTypes)
+        rate = np.zeros(len(rows))
+        for rated_type,annual_rate in self.annualRates.items():
+            rate[acct_type == rated_type] = annual_rate
+
+        # Days since the last accrual, one for accounts never accrued
+        run_day = np.datetime64(run_date,'D')
+        previous = np.asarray(accrued_on,dtype='datetime64[D]')
+        previous[np.isnat(previous)] = run_day - 1
+        days = np.maximum((run_day - previous).astype(np.float64),0)
+
+        base = np.maximum(np.where(is_debt,remaining,available),0)
+        accrued = accrued + base * np.expm1(days * np.log1p(rate / 365))
+        interest = np.floor(accrued)
+        accrued -= interest
+
+        # Month ends in (previous, run_date]: the months between the days
+        # after each; one fee per month end, no more than the balance
+        month_ends = (run_day + 1).astype('datetime64[M]') - (previous + 1).astype('datetime64[M]')
+        month_ends = month_ends.astype(np.int64)
+        fee_due = (acct_type == 'Checking') & (month_ends > 0) & (available < self.minimumBalance)
+        fee = np.where(fee_due,np.clip(available,0,month_ends * self.maintenanceFee),0).astype(np.int64)
+        interest = interest.astype(np.int64)
+
+        return {'acct_no': np.asarray(acct_no,dtype=np.int64),
+                'interest': interest,
+                'fee': fee,
+                'available': np.where(is_debt,0,interest) - fee,
+                'remaining': np.where(is_debt,interest,0),
+                'accrued': accrued}
+
+    def accrualStatements(self,cust_accounts,ledger):
+        columns = cust_accounts.columns
+        # Guarded on accrued_on so an account is accrued once per date
+        # even if two runs overlap
+        stmt = update(cust_accounts).where(and_(columns.acct_no == bindparam('acct'),
+                                                or_(columns.accrued_on == None,
+                                                    columns.accrued_on < bindparam('run'))))
+        stmt = stmt.values(available_bal = columns.available_bal + bindparam('avail'),
+                           remaining_bal = columns.remaining_bal + bindparam('remain'),
+                           accrued_int = bindparam('acc'),
+                           accrued_on = bindparam('run'))
+
+        entry = select([columns.acct_no,bindparam('op'),bindparam('amt'),
+                        columns.available_bal,columns.remaining_bal,bindparam('ts')])
+        entry = entry.where(columns.acct_no == bindparam('acct'))
+        entry = insert(ledger).from_select(['acct_no','txn_type','amount','available_bal',
+                                            'remaining_bal','txn_ts'],entry)
+        return stmt,entry
+
+    @staticmethod
+    def compileMany(db_engine,stmt):
+        # Compile once to the SQL of the driver so executemany takes plain
+        # tuples (dicts for drivers with named parameters, such as
+        # psycopg2) instead of SQLAlchemy processing every account
+        compiled = stmt.compile(dialect=db_engine.dialect)
+        if compiled.positional:
+            return str(compiled),compiled.positiontup,True
+        return str(compiled),tuple(compiled.params),False
+
+    @staticmethod
+    def bindRows(compiled,values) -> list:
+        # Parameters of the compiled statement, from columns of values
+        sql,keys,positional = compiled
+        rows = zip(*[values[key] for key in keys])
+        if positional:
+            return list(rows)
+        return [dict(zip(keys,row)) for row in rows]
+
+    @bankMetrics.timed
+    def runAccrual(self,run_date = None,chunk_size = 10000) -> dict:
+        """
+        Accrue interest and charge fees on every active account up to
+        run_date
+        Parameters
+        ----------
+        run_date : string
+            YYYY-MM-DD, today by default
+        chunk_size : int
+            accounts read, computed and committed at a time
+        Returns
+        -------
+        dict
+            accounts - accounts accrued
+            interest, fees - whole units posted
+            chunks - transactions committed
+            elapsed - seconds spent
+            accounts_per_sec - throughput of the run
+        """
+        self.log.logTransaction("Open runAccrual")
+
+        if chunk_size <= 0:
+            raise ValueError("chunk_size must be positive")
+        run_date = self.parseDate(run_date)
+        summary = {'accounts': 0,'interest': 0,'fees': 0,'chunks': 0}
+        start = time.perf_counter()
+        last = -1
+
+        with self.db.db_connect(dbUrl) as db_engine:
+            cust_accounts = bankSchema.table('cust_accounts', db_engine)
+            ledger = bankSchema.table('transactions', db_engine)
+            query = self.chunkQuery(cust_accounts,literal(run_date),chunk_size)
+            stmt,entry = [self.compileMany(db_engine,sql)
+                          for sql in self.accrualStatements(cust_accounts,ledger)]
+
+            while True:
+                rows = db_engine.execute(query,last = last).fetchall()
+                if not rows:
+                    break
+
+                chunk = self.accrue(rows,run_date)
+                params = self.bindRows(stmt,{'acct': chunk['acct_no'].tolist(),
+                                             'avail': chunk['available'].tolist(),
+                                             'remain': chunk['remaining'].tolist(),
+                                             'acc': chunk['accrued'].tolist(),
+                                             'run': repeat(run_date)})
+                ts = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+                entries = []
+                for op,amounts in (('interest',chunk['interest']),('fee',chunk['fee'])):
+                    posted = amounts > 0
+                    entries += self.bindRows(entry,{'acct': chunk['acct_no'][posted].tolist(),
+                                                    'amt': amounts[posted].tolist(),
+                                                    'op': repeat(op),'ts': repeat(ts)})
+
+                try:
+                    with db_engine.begin():
+                        if db_engine.execute(stmt[0],params).rowcount != len(params):
+                            # Another run accrued part of the chunk since it
+                            # was read; roll back and read it again
+                            raise ValidationError("Accrual chunk changed concurrently")
+                        if entries:
+                            db_engine.execute(entry[0],entries)
+                except ValidationError as e:
+                    self.log.logTransaction("runAccrual: " + e.message + ", retrying")
+                    continue
+                except SQLAlchemyError as e:
+                    self.log.logTransaction("Exception: runAccrual chunk rolled back - " + str(e))
+                    raise
+
+                self.cache.clear()
+                last = rows[-1][0]
+                summary['accounts'] += len(params)
+                summary['interest'] += int(chunk['interest'].sum())
+                summary['fees'] += int(chunk['fee'].sum())
+                summary['chunks'] += 1
+
+        summary['elapsed'] = time.perf_counter() - start
+        summary['accounts_per_sec'] = (summary['accounts'] / summary['elapsed']
+                                       if summary['elapsed'] > 0 else 0.0)
+        self.log.logTransaction("Close runAccrual: {cnt} accounts, {rate:.0f} accounts/sec".format(
+                                cnt = summary['accounts'],rate = summary['accounts_per_sec']))
+        return summary
+
+    @classmethod
+    def main(cls,argv) -> int:
+        """
+        Command line entry point for the interest and fee job
+        """
+        parser = argparse.ArgumentParser(prog='BankingSystem-Python-OOP.py interest',
+                                         description='Accrue daily interest and charge fees')
+        parser.add_argument('--date',help='accrue up to YYYY-MM-DD, today by default')
+        parser.add_argument('--chunk-size',type=int,default=10000)
+        args = parser.parse_args(argv)
+
+        try:
+            summary = cls().runAccrual(args.date,args.chunk_size)
+        except ImportError as e:
+            print(e)
+            return 1
+        except ValidationError as e:
+            print(e.message)
+            return 1
+        print("{accounts} accounts accrued: {interest} interest, {fees} fees posted "
+              "in {elapsed:.2f}s ({accounts_per_sec:.0f} accounts/sec)".format(**summary))
+        return 0
@@ -0,0 +1,180 @@
+import atexit
+import logging
+import logging.handlers
+import os
+import queue
+import threading
+import time
+
+from .metrics import bankMetrics
+
+class bankLogQueueHandler(logging.handlers.QueueHandler):
+    
+    def __init__(self):
+        logging.handlers.QueueHandler.__init__(self,None)
+    
+    def enqueue(self,record):
+        bankTransactionLog.enqueueRecord(record)
+
+class bankRotatingFileHandler(logging.handlers.RotatingFileHandler):
+    
+    def __init__(self,filename,maxBytes,backupCount,interval):
+        """
+        Numbered backups like RotatingFileHandler, rotated when the file
+        reaches maxBytes or when interval seconds have passed since the
+        file was started, whichever comes first
+        """
+        logging.handlers.RotatingFileHandler.__init__(self,filename,maxBytes=maxBytes,
+                                                      backupCount=backupCount)
+        self.interval = interval
+        started = os.stat(filename).st_mtime if os.path.exists(filename) else time.time()
+        self.rolloverAt = started + interval
+    
+    def needsRollover(self) -> bool:
+        if self.interval and time.time() >= self.rolloverAt:
+            return True
+        return self.maxBytes > 0 and self.stream is not None and self.stream.tell() >= self.maxBytes
+    
+    def doRollover(self):
+        logging.handlers.RotatingFileHandler.doRollover(self)
+        self.rolloverAt = time.time() + self.interval
+
+class bankTransactionLog:
+    
+    # Settings for the background log writer
+    logFile = 'bank_transaction_log.log'
+    logMaxBytes = 10 * 1024 * 1024
+    logBackupCount = 5
+    logRotateInterval = 24 * 60 * 60
+    queueSize = 10000
+    batchSize = 500
+    # block: wait for room in a full queue
+    # drop-info: drop DEBUG and INFO records when the queue is full,
+    #            which is every routine transaction line; WARNING and
+    #            above still wait for room
+    overflowPolicy = 'block'
+    
+    _queue = None
+    _writer = None
+    _writerLock = threading.Lock()
+    _atexitRegistered = False
+    _queueHandler = None
+    _stats = {'written': 0, 'dropped': 0, 'batches': 0}
+    _statsLock = threading.Lock()
+    
+    def __init__(self):
+        self.logger = self.setupLogger()
+    
+    @classmethod
+    def setupLogger(cls):
+        """
+        Attach the queue handler to the 'dev' logger once per process,
+        however many bankTransactionLog objects are created
+        """
+        logger = logging.getLogger('dev')
+        with cls._writerLock:
+            if cls._queueHandler is None:
+                cls._queueHandler = bankLogQueueHandler()
+                cls._queueHandler.setLevel(logging.INFO)
+            if cls._queueHandler not in logger.handlers:
+                logger.setLevel(logging.INFO)
+                logger.addHandler(cls._queueHandler)
+        return logger
+        
+    @bankMetrics.timed
+    def logTransaction(self,info):
+        self.logger.info(info)
+    
+    @classmethod
+    def startWriter(cls):
+        """
+        Start the background writer thread if it is not running
+        """
+        with cls._writerLock:
+            if cls._writer is not None:
+                return
+            if cls.overflowPolicy not in ('block','drop-info'):
+                raise ValueError("Unknown log overflow policy " + str(cls.overflowPolicy))
+            
+            fileHandler = bankRotatingFileHandler(cls.logFile,cls.logMaxBytes,
+                                                  cls.logBackupCount,cls.logRotateInterval)
+            fileHandler.setFormatter(logging.Formatter('%(asctime)s  %(name)s  %(levelname)s: %(message)s'))
+            
+            cls._queue = queue.Queue(maxsize=cls.queueSize)
+            cls._writer = threading.Thread(target=cls._writeLoop,args=(cls._queue,fileHandler),
+                                           name='bankTransactionLog-writer',daemon=True)
+            cls._writer.start()
+            
+            if not cls._atexitRegistered:
+                atexit.register(cls.shutdown)
+                cls._atexitRegistered = True
+    
+    @classmethod
+    def enqueueRecord(cls,record):
+        if cls._writer is None:
+            cls.startWriter()
+        
+        if cls.overflowPolicy == 'drop-info' and record.levelno <= logging.INFO:
+            try:
+                cls._queue.put_nowait(record)
+            except queue.Full:
+                with cls._statsLock:
+                    cls._stats['dropped'] += 1
+        else:
+            cls._queue.put(record)
+    
+    @classmethod
+    def _writeLoop(cls,log_queue,fileHandler):
+        running = True
+        while running:
+            batch = [log_queue.get()]
+            while len(batch) < cls.batchSize:
+                try:
+                    batch.append(log_queue.get_nowait())
+                except queue.Empty:
+                    break
+            
+            # Write the whole batch, then flush and check rotation once
+            for record in batch:
+                if record is None:
+                    running = False
+                    continue
+                try:
+                    fileHandler.stream.write(fileHandler.format(record) + fileHandler.terminator)
+                except Exception:
+                    fileHandler.handleError(record)
+            fileHandler.flush()
+            if fileHandler.needsRollover():
+                fileHandler.doRollover()
+            
+            with cls._statsLock:
+                cls._stats['written'] += len(batch) - (0 if running else 1)
+                cls._stats['batches'] += 1
+        fileHandler.close()
+    
+    @classmethod
+    def shutdown(cls,timeout = None):
+        """
+        Drain the queued records to the log file and stop the writer
+        Parameters
+        ----------
+        timeout : float
+            seconds to wait for the writer, None to wait until drained
+        """
+        with cls._writerLock:
+            writer,cls._writer = cls._writer,None
+            if writer is None:
+                return
+            cls._queue.put(None)
+        writer.join(timeout)
+    
+    @classmethod
+    def getStats(cls) -> dict:
+        """
+        Returns records written and dropped, batches flushed and the
+        current queue depth
+        """
+        with cls._statsLock:
+            stats = dict(cls._stats)
+        stats['queued'] = cls._queue.qsize() if cls._queue is not None else 0
+        return stats
@@ -0,0 +1,271 @@
+import os
+import sys
+
+from .accounts import bankAccounts
+from .database import bankDatabase
+from .datatransfer import bankDataTransfer
+from .metrics import bankMetrics
+from .transactions import bankTransactions
+from .users import bankUser
+
+def main(argv = None) -> int:
+    """
+    Program entry point: the HTTP service for 'serve', balance
+    snapshots and reports for 'snapshot', the interest and fee job
+    for 'interest', read-only reports for 'report', shard
+    maintenance for 'shards', bulk import / export for other command
+    line arguments, the interactive menu otherwise
+    Parameters
+    ----------
+    argv : list
+        command line arguments, defaults to sys.argv[1:]
+    Returns
+    -------
+    int
+        process exit code
+    """
+    if argv is None:
+        argv = sys.argv[1:]
+    
+    if os.environ.get('BANK_METRICS_PORT'):
+        bankMetrics.serve(int(os.environ['BANK_METRICS_PORT']))
+    if os.environ.get('BANK_DB_URL'):
+        bankDatabase.configureBackend(os.environ['BANK_DB_URL'])
+    if os.environ.get('BANK_DB_PROFILE'):
+        bankDatabase.configureProfile(os.environ['BANK_DB_PROFILE'])
+    
+    if argv and argv[0] == 'serve':
+        from .service import main as serviceMain
+        return serviceMain(argv[1:])
+    if argv and argv[0] == 'snapshot':
+        from .snapshots import bankSnapshots
+        return bankSnapshots.main(argv[1:])
+    if argv and argv[0] == 'interest':
+        from .interest import bankInterest
+        return bankInterest.main(argv[1:])
+    if argv and argv[0] == 'report':
+        from .reports import bankReports
+        return bankReports.main(argv[1:])
+    if argv and argv[0] == 'shards':
+        from .shards import bankShardRouter
+        return bankShardRouter.main(argv[1:])
+    if argv:
+        return bankDataTransfer.main(argv)
+
+    try:
+        print()
+        print("""Enter 
+                    1 for Employee
+                    2 for Customer
+            """)
+        userchoice = int(input())
+
+        while True:
+        
+            if userchoice == 1:
+                print()
+                print(""" Enter 
+                        1 for create new employee user
+                        2 for employee login
+                        3 to exit
+                    """)
+                empchoice = int(input())
+                bankusr = bankUser()
+
+                if empchoice == 1:
+                    print()
+                    print("Enter First name")
+                    fname = input()
+                    print("Enter Last name")
+                    lname = input()
+                    print("Enter Designation")
+                    desig = input()
+                    user_type = "E"
+                   
+                    u_id = bankusr.createUser(fname,lname,user_type,desig)
+                
+                    if u_id != -1:
+                        print("Employee User ID successfully created: " + str(u_id))
+
+                elif empchoice == 2:
+                    print()
+                    print("Enter user id")
+                    user_id = input()
+                    print("Enter first name")
+                    fname = input()
+                    user_type = "E"
+                    authresult = bankusr.authenticateUser(user_id,user_type,fname)
+                
+                    if authresult:
+                        print()
+                        print("""
+                                Enter 
+                                    1 for create new customer
+                                    2 for add account to existing customer
+                                    3 for customer accounts
+                            """)
+                        custchoice = int(input())
+                    
+                        if custchoice == 1:
+                            print()
+                            print("Enter first name")
+                            fname = input()
+                            print("Enter last name")
+                            lname = input()
+                            desig = None
+                            user_type = "C"
+                    
+                            u_id = bankusr.createUser(fname,lname,user_type,desig)
+                
+                            if u_id != -1:
+                                print("Customer User ID successfully created: " + str(u_id))
+                    
+                        elif custchoice == 2:
+                        
+                            print()
+                            print("Enter customer user id")
+                            u_id = int(input())
+                            print("Enter customer first name")
+                            f_name = input()                    
+                            print("""
+                                    Enter 1 for Loan
+                                        2 for Credit
+                                        3 for checking
+                                        4 for Savings
+                                """)                            
+                            acct_type = int(input())
+                            acct1 = bankAccounts()
+                        
+                            if acct_type in (1,2,3,4):
+                                print()
+                                print("Enter available balance/initial deposit amount")
+                                avail_bal = int(input())
+                            
+                                if acct_type == 1:
+                                    acct = "Loan"
+                                
+                                elif acct_type == 2:
+                                    acct = "Credit"
+                                elif acct_type == 3:
+                                    acct = "Checking"                           
+                                elif acct_type == 4:
+                                    acct = "Savings" 
+
+                                acct_no = acct1.addAccount(u_id,f_name,acct,avail_bal)
+                            
+                                if acct_no != -1:
+                                    msg = """
+                                            Customer ID: {user_id}, 
+                                            First name: {fname},
+                                            Account Type: {acct_type}
+                                            Account no: {account_num}
+                                        successfully created.
+                                        """.format(user_id = u_id,fname = f_name,
+                                                acct_type=acct,account_num = acct_no)    
+                                    print(msg)
+                        elif custchoice == 3:
+                            print("""
+                                    Enter 1 for Deposit amount
+                                          2 for View Balance
+                                """)                            
+                            emp_custchoice = int(input())
+                            acct2 = bankAccounts()
+
+                            print()
+                            print("Enter customer account no")
+                            acct_no = int(input())
+
+                            if emp_custchoice == 1:
+                                print("Enter deposit amount")
+                                deposit_amt = int(input())
+                        
+                            authresult = acct2.validateSession(authresult,acct_no,None)
+                        
+                            trans = bankTransactions()
+
+                            if authresult:
+                                if emp_custchoice == 1:                        
+                                    result = trans.depositAmt(None,acct_no,deposit_amt)                            
+                                else:
+                                    result = trans.showBalance(None,acct_no,None) 
+                        else:
+                            print("Error: Invalid choice selected.")
+                else:
+                    break
+                
+            elif userchoice == 2:
+                print()
+                print("Enter 1 to login")
+                print("Enter 2 to exit")
+                cust_choice = int(input())
+            
+                bankusr2 = bankUser()
+
+                if cust_choice == 1:
+                    print()
+                    print("Enter user id")
+                    u_id = int(input())
+                    print("Enter first name")
+                    f_name = input() 
+                    user_type = "C"
+                
+                    authresult = bankusr2.authenticateUser(u_id,user_type,f_name)
+                
+                    if authresult:
+                        print()
+                        print("""
+                        Enter 1 for Deposit amount
+                            2 for Withdraw amount 
+                            3 for View balance 
+                            4 for Pay balance
+                            5 for Transfer amount
+                            """)
+                        action_choice = int(input())                
+                    
+                        if action_choice in (1,2,4,5):
+                            print()
+                            print("""
+                            Enter deposit / withdraw / payment / transfer amount
+                                """)
+                            trans_amt = int(input())  
+                        
+                        print()
+                        print("Enter account no")
+                        account_no = int(input())
+                        
+                        if action_choice == 5:
+                            print("Enter destination account no")
+                            dest_no = int(input())
+                    
+                        acct2 = bankAccounts()
+
+                        # The source of a transfer is checked like a withdrawal
+                        authresult = acct2.validateSession(authresult,account_no,
+                                                           2 if action_choice == 5 else action_choice)
+                                        
+                        if authresult:
+                            trans2 = bankTransactions()
+
+                            if action_choice == 1:                        
+                                result = trans2.depositAmt(u_id,account_no,trans_amt)
+                            if action_choice == 2:
+                                result = trans2.withdrawAmt(u_id,account_no,trans_amt)
+                            if action_choice == 3:
+                                result = trans2.showBalance(u_id,account_no,None)                        
+                            elif action_choice == 4:
+                                result = trans2.payBalance(u_id,account_no,trans_amt)
+                            elif action_choice == 5:
+                                result = trans2.transfer(account_no,dest_no,trans_amt,u_id)
+                            else:
+                                result = "Error: Invalid choice selected"
+                        
+                else:
+                    break
+            
+            else:
+                break
+    except ValueError as e1:
+        print("Entered input is not a number.")
+    except Exception as e2:
+        print("unhandled exception occurred")
+    return 0
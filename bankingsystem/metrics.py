@@ -0,0 +1,217 @@
+from functools import wraps
+import hashlib
+import inspect
+import threading
+import time
+
+class bankMetrics:
+    
+    # Histogram bucket upper bounds in seconds
+    buckets = (0.00005,0.0001,0.00025,0.0005,0.001,0.0025,0.005,0.01,
+               0.025,0.05,0.1,0.25,0.5,1.0,2.5,5.0,10.0)
+    enabled = True
+    
+    _histograms = {}
+    _statementLabels = {}
+    _lock = threading.Lock()
+    
+    @classmethod
+    def observe(cls,kind,name,seconds):
+        """
+        Record one latency sample
+        Parameters
+        ----------
+        kind : string
+            operation or sql
+        name : string
+            operation name or statement label
+        seconds : float
+            elapsed time
+        """
+        with cls._lock:
+            hist = cls._histograms.get((kind,name))
+            if hist is None:
+                hist = cls._histograms[(kind,name)] = {'counts': [0] * (len(cls.buckets) + 1),
+                                                       'sum': 0.0,'count': 0}
+            index = 0
+            while index < len(cls.buckets) and seconds > cls.buckets[index]:
+                index += 1
+            hist['counts'][index] += 1
+            hist['sum'] += seconds
+            hist['count'] += 1
+    
+    @staticmethod
+    def timed(func):
+        """
+        Decorator recording the latency of a method under its qualified name
+        """
+        name = func.__qualname__
+        
+        if inspect.iscoroutinefunction(func):
+            @wraps(func)
+            async def awaited(*args,**kwargs):
+                if not bankMetrics.enabled:
+                    return await func(*args,**kwargs)
+                start = time.perf_counter()
+                try:
+                    return await func(*args,**kwargs)
+                finally:
+                    bankMetrics.observe('operation',name,time.perf_counter() - start)
+            return awaited
+        
+        @wraps(func)
+        def wrapped(*args,**kwargs):
+            if not bankMetrics.enabled:
+                return func(*args,**kwargs)
+            start = time.perf_counter()
+            try:
+                return func(*args,**kwargs)
+            finally:
+                bankMetrics.observe('operation',name,time.perf_counter() - start)
+        return wrapped
+    
+    @classmethod
+    def statementLabel(cls,statement) -> str:
+        # Short stable label for a SQL statement: verb, table and a hash
+        label = cls._statementLabels.get(statement)
+        if label is None:
+            words = statement.split()
+            upper = [word.upper() for word in words]
+            verb = upper[0] if words else ''
+            table = ''
+            if verb == 'PRAGMA' and len(words) > 1:
+                table = words[1].split('(')[0]
+            for keyword in ('FROM','INTO','UPDATE'):
+                if not table and keyword in upper and upper.index(keyword) + 1 < len(words):
+                    table = words[upper.index(keyword) + 1]
+            digest = hashlib.sha1(' '.join(words).encode()).hexdigest()[:8]
+            label = ' '.join(part for part in (verb,table.strip('"'),digest) if part)
+            if len(cls._statementLabels) < 1000:
+                cls._statementLabels[statement] = label
+        return label
+    
+    @classmethod
+    def _beforeExecute(cls,conn,cursor,statement,parameters,context,executemany):
+        conn.info.setdefault('query_start',[]).append(time.perf_counter())
+    
+    @classmethod
+    def _afterExecute(cls,conn,cursor,statement,parameters,context,executemany):
+        starts = conn.info.get('query_start')
+        if starts:
+            cls.observe('sql',cls.statementLabel(statement),time.perf_counter() - starts.pop())
+    
+    @classmethod
+    def instrumentEngine(cls,engine):
+        """
+        Time every SQL statement executed through the engine
+        """
+        from sqlalchemy import event
+        
+        event.listen(engine,'before_cursor_execute',cls._beforeExecute)
+        event.listen(engine,'after_cursor_execute',cls._afterExecute)
+    
+    @classmethod
+    def percentile(cls,hist,q) -> float:
+        # Estimate by linear interpolation inside the bucket holding the rank
+        rank = q * hist['count']
+        cumulative = 0
+        lower = 0.0
+        for index,count in enumerate(hist['counts']):
+            upper = cls.buckets[index] if index < len(cls.buckets) else cls.buckets[-1]
+            if count and cumulative + count >= rank:
+                return lower + (upper - lower) * (rank - cumulative) / count
+            cumulative += count
+            lower = upper
+        return lower
+    
+    @classmethod
+    def summary(cls) -> dict:
+        """
+        Returns {(kind, name): {count, sum, p50, p95, p99}} in seconds
+        """
+        with cls._lock:
+            histograms = {key: {'counts': list(hist['counts']),'sum': hist['sum'],'count': hist['count']}
+                          for key,hist in cls._histograms.items()}
+        return {key: {'count': hist['count'],
+                      'sum': hist['sum'],
+                      'p50': cls.percentile(hist,0.50),
+                      'p95': cls.percentile(hist,0.95),
+                      'p99': cls.percentile(hist,0.99)}
+                for key,hist in histograms.items()}
+    
+    @classmethod
+    def reset(cls):
+        with cls._lock:
+            cls._histograms = {}
+    
+    @classmethod
+    def prometheusText(cls) -> str:
+        """
+        Returns the histograms and p50/p95/p99 estimates in the Prometheus
+        text exposition format
+        """
+        with cls._lock:
+            histograms = sorted((key,{'counts': list(hist['counts']),'sum': hist['sum'],
+                                      'count': hist['count']})
+                                for key,hist in cls._histograms.items())
+        
+        metric = {'operation': ('bank_operation_seconds','operation','Latency of banking operations'),
+                  'sql': ('bank_sql_seconds','statement','Latency of SQL statements')}
+        lines = []
+        for kind in ('operation','sql'):
+            name,label,help_text = metric[kind]
+            lines.append('# HELP {n} {h}'.format(n = name,h = help_text))
+            lines.append('# TYPE {n} histogram'.format(n = name))
+            for (hist_kind,hist_name),hist in histograms:
+                if hist_kind != kind:
+                    continue
+                escaped = hist_name.replace('\\','\\\\').replace('"','\\"')
+                cumulative = 0
+                for index,count in enumerate(hist['counts']):
+                    cumulative += count
+                    bound = repr(cls.buckets[index]) if index < len(cls.buckets) else '+Inf'
+                    lines.append('{n}_bucket{{{l}="{v}",le="{b}"}} {c}'.format(
+                                 n = name,l = label,v = escaped,b = bound,c = cumulative))
+                lines.append('{n}_sum{{{l}="{v}"}} {s!r}'.format(n = name,l = label,v = escaped,s = hist['sum']))
+                lines.append('{n}_count{{{l}="{v}"}} {c}'.format(n = name,l = label,v = escaped,c = hist['count']))
+            
+            lines.append('# TYPE {n}_quantile gauge'.format(n = name))
+            for (hist_kind,hist_name),hist in histograms:
+                if hist_kind != kind:
+                    continue
+                escaped = hist_name.replace('\\','\\\\').replace('"','\\"')
+                for q in (0.5,0.95,0.99):
+                    lines.append('{n}_quantile{{{l}="{v}",quantile="{q}"}} {p!r}'.format(
+                                 n = name,l = label,v = escaped,q = q,p = cls.percentile(hist,q)))
+        return '\n'.join(lines) + '\n'
+    
+    @classmethod
+    def serve(cls,port = 9108,host = '127.0.0.1'):
+        """
+        Serve prometheusText() on http://host:port/metrics from a
+        background thread
+        Returns
+        -------
+        ThreadingHTTPServer
+            the running server, call shutdown() to stop it
+        """
+        from http.server import BaseHTTPRequestHandler,ThreadingHTTPServer
+        
+        class metricsHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path != '/metrics':
+                    self.send_error(404)
+                    return
+                body = cls.prometheusText().encode()
+                self.send_response(200)
+                self.send_header('Content-Type','text/plain; version=0.0.4')
+                self.send_header('Content-Length',str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+            
+            def log_message(self,format,*args):
+                pass
+        
+        server = ThreadingHTTPServer((host,port),metricsHandler)
+        threading.Thread(target=server.serve_forever,name='bankMetrics-http',daemon=True).start()
+        return server
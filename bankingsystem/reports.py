@@ -0,0 +1,368 @@
+from sqlalchemy import create_engine,MetaData,Table,select,and_,case,func,literal
+from sqlalchemy.exc import NoSuchTableError,SAWarning
+from sqlalchemy.engine.url import make_url
+from sqlalchemy.pool import NullPool
+from datetime import datetime,timedelta
+import argparse
+import csv
+import os
+import shutil
+import sqlite3
+import tempfile
+import warnings
+
+from . import database
+from .backends import bankSqliteBackend
+from .database import bankSchema
+from .errors import ValidationError
+from .logs import bankTransactionLog
+from .metrics import bankMetrics
+
+class bankReports:
+
+    # Report name -> (column, type) of its rows, the types are used for
+    # columnar output
+    reportColumns = {
+        'totals': [('acct_type','str'),('acct_sts','str'),('accounts','int'),
+                   ('available_bal','int'),('remaining_bal','int'),
+                   ('avg_available','float'),('available_share','float')],
+        'distribution': [('acct_type','str'),('bucket','str'),('accounts','int'),
+                         ('available_bal','int'),('cumulative_accounts','int'),
+                         ('cumulative_pct','float')],
+        'dormant': [('acct_no','int'),('user_id','int'),('acct_type','str'),
+                    ('available_bal','int'),('remaining_bal','int'),
+                    ('last_activity','str'),('days_inactive','int')],
+        'exposure': [('user_id','int'),('first_name','str'),('last_name','str'),
+                     ('accounts','int'),('outstanding','int'),('unused_credit','int'),
+                     ('utilization','float'),('share','float'),('cumulative_share','float')],
+    }
+
+    # Lower bounds of the available balance buckets of the distribution
+    balanceBuckets = (0,100,1000,10000,100000)
+    # Days without a posting after which an active account is dormant
+    dormantDays = 365
+    # Postings made by the customer, interest and fees do not count as activity
+    activityTypes = ('open','deposit','withdraw','pay','transfer_out','transfer_in')
+    debtTypes = ('Loan','Credit')
+
+    def __init__(self,source = None):
+        """
+        Read-only reports over the accounts data. Queries run against a
+        database opened read-only, so reporting never takes a lock the
+        transaction path waits on.
+        Parameters
+        ----------
+        source : string
+            database file to report on; by default a snapshot copy of the
+            live database is taken and removed again by close()
+        """
+        self.log = bankTransactionLog()
+        self._workdir = None
+
+        if source is None:
+            self._workdir = tempfile.mkdtemp()
+            source = self.snapshotCopy(os.path.join(self._workdir,'report.db'))
+        elif not os.path.exists(source):
+            raise ValidationError("Validation Error: Database " + source + " not found")
+        self.source = source
+
+        uri = 'file:' + os.path.abspath(source) + '?mode=ro'
+        self.engine = create_engine('sqlite://',poolclass=NullPool,
+                                    creator=lambda: sqlite3.connect(uri,uri=True,check_same_thread=False))
+        self._tables = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self,*exc):
+        self.close()
+
+    def close(self):
+        self.engine.dispose()
+        if self._workdir is not None:
+            shutil.rmtree(self._workdir,ignore_errors=True)
+            self._workdir = None
+
+    @classmethod
+    def snapshotCopy(cls,target,pages = 1024) -> str:
+        """
+        Copy the live database to target with the SQLite backup API,
+        which holds the read lock only while each batch of pages is
+        copied, and bring the copy to the current schema version
+        Returns
+        -------
+        string
+            target
+        """
+        backend = database.bankDatabase.getBackend()
+        if not isinstance(backend,bankSqliteBackend):
+            # The reports open a database file read-only through sqlite3
+            raise ValidationError("Validation Error: Reports need a SQLite backend, the configured one is {name}; "
+                                  "pass a SQLite database file as source".format(
+                                  name = make_url(backend.url).get_backend_name()))
+        live = backend.sqliteConnect()
+        copy = sqlite3.connect(target)
+        try:
+            live.backup(copy,pages=pages)
+        finally:
+            copy.close()
+            live.close()
+
+        engine = create_engine('sqlite:///' + target,poolclass=NullPool)
+        try:
+            with engine.connect() as db_engine:
+                bankSchema.migrate(db_engine)
+        finally:
+            engine.dispose()
+        return target
+
+    def table(self,name,db_engine) -> Table:
+        if name not in self._tables:
+            try:
+                with warnings.catch_warnings():
+                    # SQLAlchemy cannot reflect the lower(first_name) index
+                    warnings.filterwarnings('ignore','.*expression-based index',SAWarning)
+                    self._tables[name] = Table(name,MetaData(),autoload_with=db_engine)
+            except NoSuchTableError:
+                raise ValidationError("Validation Error: {src} has no {tbl} table".format(
+                                      src = self.source,tbl = name))
+        return self._tables[name]
+
+    def totals(self):
+        """
+        Yields account count and balances by account type and status,
+        with the share of all available balances
+        """
+        with self.engine.connect() as db_engine:
+            cust_accounts = self.table('cust_accounts', db_engine)
+            columns = cust_accounts.columns
+            stmt = select([columns.acct_type,columns.acct_sts,func.count(),
+                           func.coalesce(func.sum(columns.available_bal),0),
+                           func.coalesce(func.sum(columns.remaining_bal),0)])
+            stmt = stmt.group_by(columns.acct_type,columns.acct_sts)
+            groups = db_engine.execute(stmt.order_by(columns.acct_type,columns.acct_sts)).fetchall()
+
+        total = sum(group[3] for group in groups)
+        for acct_type,acct_sts,accounts,available,remaining in groups:
+            yield {'acct_type': acct_type,'acct_sts': acct_sts,'accounts': accounts,
+                   'available_bal': available,'remaining_bal': remaining,
+                   'avg_available': available / accounts,
+                   'available_share': available / total if total else 0.0}
+
+    def bucketLabels(self) -> list:
+        bounds = self.balanceBuckets
+        labels = ['< {low}'.format(low = bounds[0])]
+        labels += ['{low}-{high}'.format(low = low,high = high - 1) for low,high in zip(bounds,bounds[1:])]
+        return labels + ['{low}+'.format(low = bounds[-1])]
+
+    def distribution(self):
+        """
+        Yields the number of active accounts and their balances per
+        available balance bucket of each account type, with running
+        totals within the type
+        """
+        labels = self.bucketLabels()
+
+        with self.engine.connect() as db_engine:
+            cust_accounts = self.table('cust_accounts', db_engine)
+            columns = cust_accounts.columns
+            balance = func.coalesce(columns.available_bal,0)
+            # Bucket index: 0 below the first bound, i + 1 from bound i on
+            bucket = case([(balance >= low,literal(index + 1))
+                           for index,low in reversed(list(enumerate(self.balanceBuckets)))],
+                          else_=literal(0))
+            bucket = bucket.label('bucket')
+            stmt = select([columns.acct_type,bucket,func.count(),func.sum(balance)])
+            stmt = stmt.where(columns.acct_sts == 'ACTIVE').group_by(columns.acct_type,bucket)
+            groups = db_engine.execute(stmt.order_by(columns.acct_type,bucket)).fetchall()
+
+        type_accounts = {}
+        for acct_type,_,accounts,_ in groups:
+            type_accounts[acct_type] = type_accounts.get(acct_type,0) + accounts
+
+        current,cumulative = None,0
+        for acct_type,index,accounts,available in groups:
+            if acct_type != current:
+                current,cumulative = acct_type,0
+            cumulative += accounts
+            yield {'acct_type': acct_type,'bucket': labels[index],'accounts': accounts,
+                   'available_bal': available,'cumulative_accounts': cumulative,
+                   'cumulative_pct': 100.0 * cumulative / type_accounts[acct_type]}
+
+    def dormant(self,as_of = None,days = None,chunk_size = 1000):
+        """
+        Yields the active accounts without a customer posting in the
+        days before as_of, oldest activity first. Accounts with no
+        posting in the ledger at all come first, without last_activity.
+        Parameters
+        ----------
+        as_of : string
+            YYYY-MM-DD, today by default
+        days : int
+            inactivity threshold, dormantDays by default
+        """
+        days = self.dormantDays if days is None else days
+        try:
+            as_of = datetime.strptime(as_of,'%Y-%m-%d') if as_of else datetime.now()
+        except ValueError:
+            raise ValidationError("Validation Error: Invalid date " + as_of)
+        as_of = as_of.replace(hour = 23,minute = 59,second = 59,microsecond = 0)
+        cutoff = (as_of - timedelta(days = days)).strftime('%Y-%m-%d %H:%M:%S')
+
+        with self.engine.connect() as db_engine:
+            cust_accounts = self.table('cust_accounts', db_engine)
+            ledger = self.table('transactions', db_engine)
+
+            activity = select([ledger.columns.acct_no,func.max(ledger.columns.txn_ts).label('last_activity')])
+            activity = activity.where(and_(ledger.columns.txn_type.in_(self.activityTypes),
+                                           ledger.columns.txn_ts <= as_of.strftime('%Y-%m-%d %H:%M:%S')))
+            activity = activity.group_by(ledger.columns.acct_no).alias('activity')
+
+            columns = cust_accounts.columns
+            stmt = select([columns.acct_no,columns.user_id,columns.acct_type,columns.available_bal,
+                           columns.remaining_bal,activity.columns.last_activity])
+            stmt = stmt.select_from(cust_accounts.outerjoin(activity,activity.columns.acct_no == columns.acct_no))
+            stmt = stmt.where(and_(columns.acct_sts == 'ACTIVE',
+                                   func.coalesce(activity.columns.last_activity,'') < cutoff))
+            result = db_engine.execute(stmt.order_by(func.coalesce(activity.columns.last_activity,''),
+                                                     columns.acct_no))
+
+            while True:
+                chunk = result.fetchmany(chunk_size)
+                if not chunk:
+                    break
+                for acct_no,user_id,acct_type,available,remaining,last_activity in chunk:
+                    inactive = None
+                    if last_activity is not None:
+                        inactive = (as_of - datetime.strptime(last_activity,'%Y-%m-%d %H:%M:%S')).days
+                    yield {'acct_no': acct_no,'user_id': user_id,'acct_type': acct_type,
+                           'available_bal': available,'remaining_bal': remaining,
+                           'last_activity': last_activity,'days_inactive': inactive}
+
+    def exposure(self,chunk_size = 1000):
+        """
+        Yields the Loan / Credit exposure of each customer, largest
+        outstanding balance first, with its share of the total and the
+        running share
+        """
+        with self.engine.connect() as db_engine:
+            cust_accounts = self.table('cust_accounts', db_engine)
+            user = self.table('user', db_engine)
+            columns = cust_accounts.columns
+            debt = and_(columns.acct_type.in_(self.debtTypes),columns.acct_sts == 'ACTIVE')
+
+            total = db_engine.execute(select([func.coalesce(func.sum(columns.remaining_bal),0)])
+                                      .where(debt)).scalar()
+
+            outstanding = func.coalesce(func.sum(columns.remaining_bal),0)
+            stmt = select([columns.user_id,user.columns.first_name,user.columns.last_name,func.count(),
+                           outstanding.label('outstanding'),func.coalesce(func.sum(columns.available_bal),0)])
+            stmt = stmt.select_from(cust_accounts.outerjoin(user,user.columns.user_id == columns.user_id))
+            stmt = stmt.where(debt).group_by(columns.user_id)
+            result = db_engine.execute(stmt.order_by(outstanding.desc(),columns.user_id))
+
+            cumulative = 0
+            while True:
+                chunk = result.fetchmany(chunk_size)
+                if not chunk:
+                    break
+                for user_id,first_name,last_name,accounts,owed,unused in chunk:
+                    cumulative += owed
+                    limit = owed + unused
+                    yield {'user_id': user_id,'first_name': first_name,'last_name': last_name,
+                           'accounts': accounts,'outstanding': owed,'unused_credit': unused,
+                           'utilization': owed / limit if limit else 0.0,
+                           'share': owed / total if total else 0.0,
+                           'cumulative_share': cumulative / total if total else 0.0}
+
+    @bankMetrics.timed
+    def writeReport(self,name,path,fmt = 'csv',chunk_size = 10000,**options) -> int:
+        """
+        Stream a report to a CSV file or to a Parquet file written one
+        row group per chunk (needs pyarrow)
+        Parameters
+        ----------
+        name : string
+            totals, distribution, dormant or exposure
+        path : string
+            target file
+        fmt : string
+            csv or parquet
+        chunk_size : int
+            rows per Parquet row group
+        options : keyword arguments
+            passed to the report, e.g. as_of and days for dormant
+        Returns
+        -------
+        int
+            number of rows written
+        """
+        if name not in self.reportColumns:
+            raise ValidationError("Validation Error: Unknown report " + name)
+        self.log.logTransaction("Open writeReport " + name)
+
+        columns = self.reportColumns[name]
+        rows = getattr(self,name)(**options)
+        if fmt == 'parquet':
+            count = self.writeParquet(rows,columns,path,chunk_size)
+        else:
+            count = 0
+            with open(path,'w',newline='') as f:
+                writer = csv.writer(f)
+                writer.writerow([column for column,_ in columns])
+                for row in rows:
+                    writer.writerow([row[column] for column,_ in columns])
+                    count += 1
+
+        self.log.logTransaction("Close writeReport {name}: {rows} rows".format(name = name,rows = count))
+        return count
+
+    @staticmethod
+    def writeParquet(rows,columns,path,chunk_size) -> int:
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise ImportError("Parquet output needs pyarrow: pip install pyarrow")
+
+        types = {'int': pa.int64(),'float': pa.float64(),'str': pa.string()}
+        schema = pa.schema([(column,types[kind]) for column,kind in columns])
+        count = 0
+
+        with pq.ParquetWriter(path,schema) as writer:
+            while True:
+                chunk = [row for _,row in zip(range(chunk_size),rows)]
+                if not chunk:
+                    break
+                writer.write_table(pa.table({column: [row[column] for row in chunk]
+                                             for column,_ in columns},schema=schema))
+                count += len(chunk)
+        return count
+
+    @classmethod
+    def main(cls,argv) -> int:
+        """
+        Command line entry point for the read-only reports
+        """
+        parser = argparse.ArgumentParser(prog='BankingSystem-Python-OOP.py report',
+                                         description='Read-only reports over the accounts data')
+        parser.add_argument('name',choices=sorted(cls.reportColumns))
+        parser.add_argument('path')
+        parser.add_argument('--format',choices=('csv','parquet'),default='csv')
+        parser.add_argument('--source',help='database file to read, a snapshot copy of the live database by default')
+        parser.add_argument('--as-of',help='dormant: YYYY-MM-DD, today by default')
+        parser.add_argument('--days',type=int,help='dormant: days without activity')
+        args = parser.parse_args(argv)
+
+        options = {}
+        if args.name == 'dormant':
+            options = {'as_of': args.as_of,'days': args.days}
+
+        try:
+            with cls(args.source) as reports:
+                rows = reports.writeReport(args.name,args.path,args.format,**options)
+        except (ValidationError,ImportError) as e:
+            print(getattr(e,'message',e))
+            return 1
+        print("{rows} rows written to {path}".format(rows = rows,path = args.path))
+        return 0
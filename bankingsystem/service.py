@@ -0,0 +1,302 @@
+from http.server import BaseHTTPRequestHandler,ThreadingHTTPServer
+from urllib.parse import urlsplit,parse_qs
+import argparse
+import json
+import threading
+
+from .accounts import bankAccounts
+from .database import bankDatabase
+from .errors import AuthenticationError,ValidationError
+from .logs import bankTransactionLog
+from .sessions import bankSession
+from .transactions import bankTransactions
+from .users import bankUser
+
+class bankServiceHandler(BaseHTTPRequestHandler):
+
+    # Keep-alive so clients can reuse their connection
+    protocol_version = 'HTTP/1.1'
+    # Buffer the response so headers and body go out in one send; separate
+    # small writes stall on Nagle / delayed ACK with keep-alive clients
+    wbufsize = -1
+
+    def do_GET(self):
+        self.dispatch('GET')
+
+    def do_POST(self):
+        self.dispatch('POST')
+
+    def dispatch(self,method):
+        url = urlsplit(self.path)
+        try:
+            if method == 'POST':
+                params = self.readBody()
+            else:
+                params = {key: values[-1] for key,values in parse_qs(url.query).items()}
+            auth = self.headers.get('Authorization','')
+            if auth.startswith('Bearer '):
+                params['token'] = auth[len('Bearer '):]
+            status,body = self.server.service.handle(method,url.path,params)
+        except AuthenticationError as e:
+            status,body = 401,{'ok': False,'messages': [e.message]}
+        except ValidationError as e:
+            status,body = 400,{'ok': False,'messages': [e.message]}
+        except Exception as e:
+            # Answer instead of dropping the connection, details go to the log
+            self.server.service.log.logTransaction("Exception: {m} {p} - {e!r}".format(
+                                                   m = method,p = url.path,e = e))
+            status,body = 500,{'ok': False,'messages': ["Error: Internal server error"]}
+
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header('Content-Type','application/json')
+        self.send_header('Content-Length',str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def readBody(self) -> dict:
+        try:
+            length = int(self.headers.get('Content-Length') or 0)
+        except ValueError:
+            # The body cannot be skipped, so the connection cannot be reused
+            self.close_connection = True
+            raise ValidationError("Error: Content-Length is not a number")
+        try:
+            params = json.loads(self.rfile.read(length) or b'{}')
+        except ValueError:
+            raise ValidationError("Error: Request body is not valid JSON")
+        if not isinstance(params,dict):
+            raise ValidationError("Error: Request body must be a JSON object")
+        return params
+
+    def log_message(self,format,*args):
+        pass
+
+class bankService:
+
+    # Largest value SQLite stores as an INTEGER
+    maxInt = 2 ** 63 - 1
+
+    def __init__(self,host = '127.0.0.1',port = 8080):
+        """
+        HTTP/JSON front-end for the banking operations. Every request is
+        handled on its own thread; all of them share the process-wide
+        connection pool of bankDatabase.
+
+        POST /users     first_name, last_name, user_type, designation
+        POST /login     user_id, user_type, first_name - returns a session token
+        POST /accounts  first_name, acct_type, amount
+        POST /deposit   acct_no, amount
+        POST /withdraw  acct_no, amount
+        POST /pay       acct_no, amount
+        POST /transfer  src, dst, amount
+        GET  /balance   acct_no
+        GET  /history   acct_no, limit, cursor (next of the previous page)
+
+        Every endpoint but /users and /login needs the session token from
+        /login (token parameter or Authorization: Bearer header), missing
+        or invalid tokens get a 401. /users creates customers without a
+        token; employee users need the token of an employee. A customer acts as the user of the
+        token, on the accounts the token carries. An employee acts on any
+        account by number and passes the customer's user_id where the
+        operation needs the owner: /accounts, /withdraw and /pay.
+        """
+        self.log = bankTransactionLog()
+        self.server = ThreadingHTTPServer((host,port),bankServiceHandler)
+        self.server.daemon_threads = True
+        self.server.service = self
+        self.routes = {('POST','/users'): self.createUser,
+                       ('POST','/login'): self.authenticateUser,
+                       ('POST','/accounts'): self.addAccount,
+                       ('POST','/deposit'): self.depositAmt,
+                       ('POST','/withdraw'): self.withdrawAmt,
+                       ('POST','/pay'): self.payBalance,
+                       ('POST','/transfer'): self.transfer,
+                       ('GET','/balance'): self.showBalance,
+                       ('GET','/history'): self.getHistory}
+
+    @property
+    def address(self):
+        return self.server.server_address
+
+    def start(self) -> threading.Thread:
+        """
+        Serve requests from a background thread
+        """
+        thread = threading.Thread(target=self.server.serve_forever,name='bankService',daemon=True)
+        thread.start()
+        return thread
+
+    def shutdown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def handle(self,method,path,params) -> tuple:
+        """
+        Run one request
+        Returns
+        -------
+        tuple
+            HTTP status and JSON response body
+        """
+        route = self.routes.get((method,path))
+        if route is None:
+            return 404,{'ok': False,'messages': ["Error: Unknown endpoint {m} {p}".format(m = method,p = path)]}
+
+        messages = []
+        result = route(params,lambda msg: messages.append(' '.join(str(msg).split())))
+        result.setdefault('messages',messages)
+        return (200 if result['ok'] else 400),result
+
+    def intParam(self,params,name,required = True):
+        value = params.get(name)
+        if value is None or value == '':
+            if required:
+                raise ValidationError("Error: {name} is required".format(name = name))
+            return None
+        # int() would cut the decimals off 12.9, and True is an int
+        if isinstance(value,(bool,float)):
+            raise ValidationError("Error: {name} must be a whole number".format(name = name))
+        try:
+            value = int(value)
+        except (TypeError,ValueError):
+            raise ValidationError("Error: {name} must be a whole number".format(name = name))
+        if abs(value) > self.maxInt:
+            raise ValidationError("Error: {name} is out of range".format(name = name))
+        return value
+
+    def amountParam(self,params,name = 'amount'):
+        value = self.intParam(params,name)
+        if value <= 0:
+            raise ValidationError("Error: {name} must be positive".format(name = name))
+        return value
+
+    def strParam(self,params,name,required = True):
+        value = params.get(name)
+        if value is None and required:
+            raise ValidationError("Error: {name} is required".format(name = name))
+        return None if value is None else str(value)
+
+    def createUser(self,params,notify) -> dict:
+        # Anyone may sign up as a customer, only employees add employees
+        user_type = self.strParam(params,'user_type')
+        if user_type != 'C' and self.session(params)['typ'] != 'E':
+            raise AuthenticationError("Authentication Error: Only employees can create employee users")
+        u_id = bankUser(notify=notify).createUser(self.strParam(params,'first_name'),
+                                                  self.strParam(params,'last_name'),
+                                                  user_type,
+                                                  self.strParam(params,'designation',False))
+        return {'ok': u_id != -1,'user_id': u_id if u_id != -1 else None}
+
+    def authenticateUser(self,params,notify) -> dict:
+        token = bankUser(notify=notify).authenticateUser(self.intParam(params,'user_id'),
+                                                         self.strParam(params,'user_type'),
+                                                         self.strParam(params,'first_name'))
+        return {'ok': bool(token),'token': token or None}
+
+    def addAccount(self,params,notify) -> dict:
+        acct_no = bankAccounts(notify=notify).addAccount(self.actingUser(params,self.session(params),True),
+                                                         self.strParam(params,'first_name'),
+                                                         self.strParam(params,'acct_type'),
+                                                         self.amountParam(params))
+        return {'ok': acct_no != -1,'acct_no': acct_no if acct_no != -1 else None}
+
+    def session(self,params) -> dict:
+        # Claims of the session token every endpoint but /users and
+        # /login requires
+        token = params.get('token')
+        if token is None:
+            raise AuthenticationError("Authentication Error: Session token is required")
+        return bankSession.verify(token)
+
+    def actingUser(self,params,claims,owner_required = False):
+        # Customers act as the user of their token, employees on behalf of
+        # the customer given as user_id, if any
+        if claims['typ'] == 'C':
+            return claims['uid']
+        return self.intParam(params,'user_id',owner_required)
+
+    def checkAccount(self,params,notify,acct_no,action_choice,owner_required = False):
+        # Account type, status and ownership are checked by the statement
+        # of the transaction; the token is checked once, up front
+        claims = self.session(params)
+        u_id = self.actingUser(params,claims,owner_required)
+        return u_id,bankAccounts(notify=notify).validateClaims(claims,acct_no,action_choice)
+
+    def postTransaction(self,params,notify,action_choice,operation) -> dict:
+        acct_no = self.intParam(params,'acct_no')
+        amount = self.amountParam(params)
+
+        # Employees deposit by account number only
+        u_id,valid = self.checkAccount(params,notify,acct_no,action_choice,operation != 'depositAmt')
+        if not valid:
+            return {'ok': False}
+        trans = bankTransactions(notify=notify)
+        return {'ok': getattr(trans,operation)(u_id,acct_no,amount)}
+
+    def depositAmt(self,params,notify) -> dict:
+        return self.postTransaction(params,notify,1,'depositAmt')
+
+    def withdrawAmt(self,params,notify) -> dict:
+        return self.postTransaction(params,notify,2,'withdrawAmt')
+
+    def payBalance(self,params,notify) -> dict:
+        return self.postTransaction(params,notify,4,'payBalance')
+
+    def transfer(self,params,notify) -> dict:
+        # Both accounts must belong to the customer; an employee token
+        # transfers between any two accounts
+        claims = self.session(params)
+        u_id = claims['uid'] if claims['typ'] == 'C' else None
+        trans = bankTransactions(notify=notify)
+        return {'ok': trans.transfer(self.intParam(params,'src'),self.intParam(params,'dst'),
+                                     self.amountParam(params),u_id)}
+
+    def showBalance(self,params,notify) -> dict:
+        acct_no = self.intParam(params,'acct_no')
+
+        u_id,valid = self.checkAccount(params,notify,acct_no,3)
+        if not valid:
+            return {'ok': False}
+        trans = bankTransactions(notify=notify)
+        row = trans.readBalance(acct_no)
+        reason = trans.accountRejection(row,u_id,acct_no)
+        if reason is not None:
+            return {'ok': False,'messages': [reason]}
+        return dict(trans.balanceRow(u_id,acct_no,row),ok=True)
+
+    def getHistory(self,params,notify) -> dict:
+        acct_no = self.intParam(params,'acct_no')
+        limit = self.intParam(params,'limit',False)
+
+        u_id,valid = self.checkAccount(params,notify,acct_no,3)
+        if not valid:
+            return {'ok': False}
+        page = bankTransactions(notify=notify).getHistory(u_id,acct_no,limit,params.get('cursor'))
+        if page is None:
+            return {'ok': False,'messages': ["Validation Error: Account not found"]}
+        return dict(page,ok=True)
+
+def main(argv) -> int:
+    """
+    Command line entry point: serve the HTTP/JSON API until interrupted
+    """
+    parser = argparse.ArgumentParser(prog='BankingSystem-Python-OOP.py serve',
+                                     description='HTTP/JSON banking service')
+    parser.add_argument('--host',default='127.0.0.1')
+    parser.add_argument('--port',type=int,default=8080)
+    parser.add_argument('--pool-size',type=int,default=bankDatabase.poolConfig['pool_size'],
+                        help='pooled database connections')
+    args = parser.parse_args(argv)
+
+    bankDatabase.configurePool(pool_size=args.pool_size)
+    service = bankService(args.host,args.port)
+    service.log.logTransaction("Service listening on {h}:{p}".format(h = args.host,p = args.port))
+    print("Listening on http://{h}:{p}".format(h = args.host,p = args.port))
+    try:
+        service.server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        service.server.server_close()
+    return 0
@@ -0,0 +1,171 @@
+import base64
+import hashlib
+import hmac
+import json
+import os
+import secrets
+import threading
+import time
+
+from sqlalchemy import select,insert,delete
+
+from .database import bankDatabase,bankSchema,dbUrl
+from .errors import AuthenticationError
+
+class bankSession:
+
+    # Seconds a session token stays valid
+    ttl = 900
+
+    # Seconds the revocations read from session_revocations are trusted;
+    # status changes made in this process apply at once, those made by
+    # other processes within this delay
+    revocationRefresh = 5.0
+
+    # Signing key, BANK_SESSION_SECRET lets several processes accept each
+    # other's tokens; a random per-process key is used otherwise
+    _secret = None
+    _lock = threading.Lock()
+    # user id -> time of the last status change, tokens issued before
+    # it are rejected; read again once _revokedUntil (monotonic) passes
+    _revoked = {}
+    _revokedUntil = 0.0
+    _refreshLock = threading.Lock()
+
+    @classmethod
+    def secret(cls) -> bytes:
+        if cls._secret is None:
+            with cls._lock:
+                if cls._secret is None:
+                    env = os.environ.get('BANK_SESSION_SECRET')
+                    cls._secret = env.encode() if env else secrets.token_bytes(32)
+        return cls._secret
+
+    @staticmethod
+    def _encode(data) -> str:
+        return base64.urlsafe_b64encode(data).rstrip(b'=').decode()
+
+    @staticmethod
+    def _decode(text) -> bytes:
+        return base64.urlsafe_b64decode(text + '=' * (-len(text) % 4))
+
+    @classmethod
+    def _sign(cls,payload) -> str:
+        return cls._encode(hmac.new(cls.secret(),payload.encode(),hashlib.sha256).digest())
+
+    @classmethod
+    def issue(cls,u_id,u_type,accounts) -> str:
+        """
+        Returns a signed session token
+        Parameters
+        ----------
+        u_id : int
+            user id
+        u_type : string
+            user type - E for employee and C for customer
+        accounts : dict
+            active account number -> account type owned by the user
+        Returns
+        -------
+        string
+            token accepted by verify() for ttl seconds
+        """
+        now = time.time()
+        claims = {'uid': u_id,'typ': u_type,
+                  'acc': {str(acctno): acct_type for acctno,acct_type in accounts.items()},
+                  'iat': now,'exp': now + cls.ttl}
+        payload = cls._encode(json.dumps(claims,separators=(',',':')).encode())
+        return payload + '.' + cls._sign(payload)
+
+    @classmethod
+    def decode(cls,token) -> dict:
+        """
+        Check the signature and expiry of a session token
+        Returns
+        -------
+        dict
+            uid, typ, acc (account number -> type), iat and exp
+        """
+        try:
+            payload,signature = str(token).split('.')
+            valid = hmac.compare_digest(signature,cls._sign(payload))
+            claims = json.loads(cls._decode(payload)) if valid else None
+        except ValueError:
+            claims = None
+
+        if claims is None or claims['exp'] <= time.time():
+            raise AuthenticationError("Authentication Error: Session is invalid or expired")
+        return claims
+
+    @staticmethod
+    def revocationsQuery(revocations,since):
+        return select([revocations.columns.user_id,revocations.columns.revoked_at]) \
+            .where(revocations.columns.revoked_at > since)
+
+    @staticmethod
+    def revokeStatements(revocations,u_id,revoked_at) -> list:
+        # Replaces the revocation time of the user, run in the
+        # transaction of the status change
+        return [delete(revocations).where(revocations.columns.user_id == u_id),
+                insert(revocations).values(user_id = u_id,revoked_at = revoked_at)]
+
+    @classmethod
+    def revoke(cls,u_id,revoked_at):
+        """
+        Reject in this process the tokens issued to the user up to
+        revoked_at, once the status change is committed
+        """
+        cls.loadRevocations([(int(u_id),revoked_at)])
+
+    @classmethod
+    def loadRevocations(cls,rows,fresh = False):
+        # Merged, so a read that started before a local status change
+        # does not drop it; changes older than ttl only concern expired
+        # tokens and are forgotten
+        since = time.time() - cls.ttl
+        with cls._lock:
+            revoked = {u_id: at for u_id,at in cls._revoked.items() if at > since}
+            for u_id,at in rows:
+                revoked[u_id] = max(at,revoked.get(u_id,at))
+            cls._revoked = revoked
+            if fresh:
+                cls._revokedUntil = time.monotonic() + cls.revocationRefresh
+
+    @classmethod
+    def revocationsStale(cls) -> bool:
+        return time.monotonic() >= cls._revokedUntil
+
+    @classmethod
+    def refreshRevocations(cls):
+        """
+        Read the status changes of the last ttl seconds from the home
+        database, where the users are
+        """
+        with cls._refreshLock:
+            if not cls.revocationsStale():
+                # Another thread has just read them
+                return
+            db = bankDatabase()
+            with db.route(None),db.db_connect(dbUrl) as db_engine:
+                revocations = bankSchema.table('session_revocations', db_engine)
+                rows = db_engine.execute(cls.revocationsQuery(revocations,time.time() - cls.ttl)).fetchall()
+            cls.loadRevocations([(row.user_id,row.revoked_at) for row in rows],fresh = True)
+
+    @classmethod
+    def verify(cls,token) -> dict:
+        """
+        Check the signature, expiry and revocation of a session token in
+        memory. Revocations are kept in the session_revocations table so
+        that every process sees them, and read from it at most once per
+        revocationRefresh seconds.
+        Returns
+        -------
+        dict
+            uid, typ, acc (account number -> type), iat and exp
+        """
+        claims = cls.decode(token)
+        if cls.revocationsStale():
+            cls.refreshRevocations()
+        if claims['iat'] <= cls._revoked.get(claims['uid'],0):
+            raise AuthenticationError("Authentication Error: Session has been revoked")
+        return claims
@@ -0,0 +1,430 @@
+from sqlalchemy import select,insert,delete,func,bindparam
+from sqlalchemy.exc import SQLAlchemyError
+from concurrent.futures import ThreadPoolExecutor
+import argparse
+import hashlib
+import threading
+import time
+
+from .accounts import bankAccounts
+from .backends import bankBackend
+from .database import bankDatabase,bankSchema,dbUrl
+from .errors import ValidationError
+from .logs import bankTransactionLog
+from .metrics import bankMetrics
+from .transactions import bankTransactions
+from .users import bankUser
+
+class bankShardRouter:
+
+    def __init__(self,shards,notify = print,balance_cache = None):
+        """
+        Partitions the accounts across several databases by acct_no, so
+        writes to accounts of different shards do not wait on the same
+        SQLite file. Each account, with its ledger entries, lives in the
+        shard shardOf picks; every shard has its own engine and pool (see
+        bankDatabase.route). Users and the ID sequences stay in the home
+        database, bankDatabase.dbUrl or the configured backend.
+
+        Single-account operations go to the account's shard, per-customer
+        queries are scattered to all shards in parallel and gathered.
+        Transfers between accounts of different shards are refused.
+        Parameters
+        ----------
+        shards : list
+            bankBackend objects, database URLs or SQLite file paths, with
+            distinct names; created and migrated on first use
+        notify : callable
+            receives the messages meant for the user, print for the menu
+        balance_cache : bankBalanceCache
+            balance cache of the transactions, the shared cache by default
+        """
+        self.db = bankDatabase()
+        self.log = bankTransactionLog()
+        self.notify = notify
+        self.shards = [self.shardBackend(shard) for shard in shards]
+        if not self.shards:
+            raise ValueError("At least one shard is required")
+
+        names = [shard.name for shard in self.shards]
+        if len(set(names)) != len(names):
+            raise ValueError("Shard names must be distinct: " + ', '.join(names))
+        self._names = [name.encode() + b'\0' for name in names]
+
+        self.transactions = bankTransactions(notify=notify,balance_cache=balance_cache)
+        self.accounts = bankAccounts(notify=notify)
+        self.users = bankUser(notify=notify)
+        self._executor = None
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def shardBackend(shard) -> bankBackend:
+        if isinstance(shard,bankBackend):
+            return shard
+        if '://' not in shard:
+            shard = 'sqlite:///' + shard
+        return bankBackend.fromUrl(shard)
+
+    def shardOf(self,acctno) -> bankBackend:
+        """
+        Returns the shard of an account: the highest hash of shard name
+        and acct_no wins, so adding a shard only moves the accounts the
+        new shard wins. Values that are not account numbers go to the
+        first shard, where the operation rejects them.
+        """
+        try:
+            key = int(acctno).to_bytes(8,'big',signed=True)
+        except (TypeError,ValueError,OverflowError):
+            return self.shards[0]
+
+        best,best_score = None,b''
+        for shard,name in zip(self.shards,self._names):
+            score = hashlib.blake2b(name + key,digest_size=8).digest()
+            if score > best_score:
+                best,best_score = shard,score
+        return best
+
+    def routed(self,acctno):
+        """
+        Returns the context that routes bankDatabase connections to the
+        shard of acctno
+        """
+        return self.db.route(self.shardOf(acctno))
+
+    def executor(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=len(self.shards),
+                                                    thread_name_prefix='bank-shard')
+            return self._executor
+
+    def scatter(self,query) -> list:
+        """
+        Run query(db_engine) on every shard in parallel
+        Returns
+        -------
+        list
+            the result of each shard, in the order of shards
+        """
+        def run(shard):
+            with self.db.route(shard),self.db.db_connect(dbUrl) as db_engine:
+                return query(db_engine)
+        return list(self.executor().map(run,self.shards))
+
+    def close(self):
+        """
+        Stop the scatter threads and dispose the engines, the ones of
+        the shards included
+        """
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown()
+                self._executor = None
+        self.db.disposeEngine()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self,*exc):
+        self.close()
+
+    # Single-account operations, run on the account's shard
+
+    def depositAmt(self,u_id,acctno,depositAmt) -> bool:
+        with self.routed(acctno):
+            return self.transactions.depositAmt(u_id,acctno,depositAmt)
+
+    def withdrawAmt(self,u_id,acctno,withdrawAmt) -> bool:
+        with self.routed(acctno):
+            return self.transactions.withdrawAmt(u_id,acctno,withdrawAmt)
+
+    def payBalance(self,u_id,acctno,paymentAmt) -> bool:
+        with self.routed(acctno):
+            return self.transactions.payBalance(u_id,acctno,paymentAmt)
+
+    def showBalance(self,u_id,acctno,amt = None) -> bool:
+        with self.routed(acctno):
+            return self.transactions.showBalance(u_id,acctno,amt)
+
+    def getBalance(self,u_id,acctno) -> dict:
+        with self.routed(acctno):
+            return self.transactions.getBalance(u_id,acctno)
+
+    def getHistory(self,u_id,acctno,limit = None,cursor = None) -> dict:
+        with self.routed(acctno):
+            return self.transactions.getHistory(u_id,acctno,limit,cursor)
+
+    def validateAccount(self,u_id,account_no,action_choice) -> bool:
+        with self.routed(account_no):
+            return self.accounts.validateAccount(u_id,account_no,action_choice)
+
+    def validateSession(self,token,account_no,action_choice) -> bool:
+        with self.routed(account_no):
+            return self.accounts.validateSession(token,account_no,action_choice)
+
+    def transfer(self,src,dst,amount,u_id = None) -> bool:
+        """
+        Transfer between two accounts of the same shard, see
+        bankTransactions.transfer
+        """
+        shard = self.shardOf(src)
+        if shard is not self.shardOf(dst):
+            self.log.logTransaction("Exception: transfer across shards")
+            self.notify("Validation Error: Accounts {src} and {dst} are in different shards".format(
+                        src = src,dst = dst))
+            return False
+        with self.db.route(shard):
+            return self.transactions.transfer(src,dst,amount,u_id)
+
+    @bankMetrics.timed
+    def addAccount(self,u_id,f_name,account_type,avail_bal) -> int:
+        """
+        Creates a new customer account in the shard of its account
+        number, see bankAccounts.addAccount
+        Returns
+        -------
+        int
+            account number if successful, -1 otherwise
+        """
+        self.log.logTransaction("Open addAccount")
+        accounts = self.accounts
+
+        try:
+            accounts.checkNewAccount(u_id,avail_bal)
+
+            with self.db.route(None),self.db.db_connect(dbUrl) as db_engine:
+                user = bankSchema.table('user', db_engine)
+                result = db_engine.execute(accounts.customerQuery(user,u_id,f_name)).fetchall()
+            if len(result) != 1:
+                raise ValidationError(accounts.customerNotFound(u_id,f_name))
+
+            # Each acct number tried may belong to another shard
+            def insert_account(account_no):
+                with self.routed(account_no),self.db.db_connect(dbUrl) as db_engine:
+                    cust_accounts = bankSchema.table('cust_accounts', db_engine)
+                    ledger = bankSchema.table('transactions', db_engine)
+
+                    stmt_acct = accounts.newAccountStmt(cust_accounts,u_id,account_type,avail_bal,account_no)
+                    with db_engine.begin():
+                        row_cnt = db_engine.execute(stmt_acct).rowcount
+                        db_engine.execute(accounts.openingEntry(ledger,account_no,avail_bal))
+                return row_cnt
+            account_no,row_cnt = accounts.idAllocator.insertWithId(insert_account)
+
+            if row_cnt != 1:
+                raise ValidationError("Account creation failed.")
+            self.transactions.cache.invalidate(account_no)
+            self.log.logTransaction("Close addAccount")
+            return account_no
+
+        except ValidationError as e:
+            self.log.logTransaction("Exception: addAccount")
+            self.notify(e.message)
+            return -1
+
+    # Per-customer queries, scattered to every shard
+
+    def customerQuery(self,cust_accounts,u_id):
+        columns = cust_accounts.columns
+        stmt = select([columns.acct_no,columns.acct_type,columns.available_bal,
+                       columns.remaining_bal,columns.acct_sts])
+        return stmt.where(columns.user_id == u_id)
+
+    def customerAccounts(self,u_id) -> list:
+        """
+        Returns the accounts of a customer across all shards, in acct_no
+        order
+        """
+        def query(db_engine):
+            cust_accounts = bankSchema.table('cust_accounts', db_engine)
+            return db_engine.execute(self.customerQuery(cust_accounts,u_id)).fetchall()
+
+        rows = [row for rows in self.scatter(query) for row in rows]
+        return sorted(rows,key=lambda row: row.acct_no)
+
+    @bankMetrics.timed
+    def authenticateUser(self,u_id,u_type,f_name):
+        """
+        Authenticates the user against the home database and issues a
+        session token carrying the accounts of every shard, see
+        bankUser.authenticateUser
+        """
+        self.log.logTransaction("Open authenticateUser")
+        users = self.users
+
+        try:
+            users.checkLogin(u_id,f_name)
+
+            with self.db.route(None),self.db.db_connect(dbUrl) as db_engine:
+                user = bankSchema.table('user', db_engine)
+                result = db_engine.execute(users.authQuery(user,u_id,u_type,f_name)).fetchall()
+            if len(result) != 1:
+                raise ValidationError("Authentication Error: User ID is not valid")
+
+            def query(db_engine):
+                cust_accounts = bankSchema.table('cust_accounts', db_engine)
+                return db_engine.execute(users.sessionAccountsQuery(cust_accounts,u_id)).fetchall()
+
+            accounts = [row for rows in self.scatter(query) for row in rows]
+            self.log.logTransaction("Close authenticateUser")
+            return users.issueSession(u_id,u_type,accounts)
+
+        except ValidationError as e:
+            self.log.logTransaction("Exception: authenticateUser")
+            self.notify(e.message)
+            return False
+
+    # Placement of the accounts
+
+    def shardStats(self) -> list:
+        """
+        Returns a dict per shard: shard name, accounts and ledger entries
+        """
+        def query(db_engine):
+            cust_accounts = bankSchema.table('cust_accounts', db_engine)
+            ledger = bankSchema.table('transactions', db_engine)
+            return (db_engine.execute(select([func.count()]).select_from(cust_accounts)).scalar(),
+                    db_engine.execute(select([func.count()]).select_from(ledger)).scalar())
+
+        return [{'shard': shard.name,'accounts': accounts,'entries': entries}
+                for shard,(accounts,entries) in zip(self.shards,self.scatter(query))]
+
+    def copyAccounts(self,target,accounts,entries):
+        # Copies left in the target by an interrupted run are replaced,
+        # the ledger entries get new txn_ids in their original order
+        acct_nos = [account['acct_no'] for account in accounts]
+        with self.db.route(target),self.db.db_connect(dbUrl) as db_engine:
+            cust_accounts = bankSchema.table('cust_accounts', db_engine)
+            ledger = bankSchema.table('transactions', db_engine)
+            with db_engine.begin():
+                db_engine.execute(delete(ledger).where(ledger.columns.acct_no.in_(acct_nos)))
+                db_engine.execute(delete(cust_accounts).where(cust_accounts.columns.acct_no.in_(acct_nos)))
+                db_engine.execute(insert(cust_accounts),accounts)
+                if entries:
+                    db_engine.execute(insert(ledger),entries)
+
+    def drain(self,source,chunk_size) -> dict:
+        # Moves the accounts of source that belong to another shard
+        moved = {'accounts': 0,'entries': 0}
+        last = -1
+
+        with self.db.route(source),self.db.db_connect(dbUrl) as db_engine:
+            cust_accounts = bankSchema.table('cust_accounts', db_engine)
+            ledger = bankSchema.table('transactions', db_engine)
+            account_columns = list(cust_accounts.columns)
+            entry_columns = [column for column in ledger.columns if column.name != 'txn_id']
+            query = select(account_columns).where(cust_accounts.columns.acct_no > bindparam('last'))
+            query = query.order_by(cust_accounts.columns.acct_no).limit(chunk_size)
+
+            while True:
+                rows = db_engine.execute(query,last = last).fetchall()
+                if not rows:
+                    break
+                last = rows[-1].acct_no
+
+                targets = {}
+                for row in rows:
+                    target = self.shardOf(row.acct_no)
+                    if target is not source:
+                        targets.setdefault(target,[]).append(
+                            {column.name: value for column,value in zip(account_columns,row)})
+
+                for target,accounts in targets.items():
+                    acct_nos = [account['acct_no'] for account in accounts]
+                    entries = db_engine.execute(select(entry_columns)
+                                                .where(ledger.columns.acct_no.in_(acct_nos))
+                                                .order_by(ledger.columns.txn_id)).fetchall()
+                    entries = [{column.name: value for column,value in zip(entry_columns,entry)}
+                               for entry in entries]
+
+                    self.copyAccounts(target,accounts,entries)
+                    with db_engine.begin():
+                        db_engine.execute(delete(ledger).where(ledger.columns.acct_no.in_(acct_nos)))
+                        db_engine.execute(delete(cust_accounts)
+                                          .where(cust_accounts.columns.acct_no.in_(acct_nos)))
+
+                    moved['accounts'] += len(accounts)
+                    moved['entries'] += len(entries)
+        return moved
+
+    @bankMetrics.timed
+    def rebalance(self,sources = (),chunk_size = 500) -> dict:
+        """
+        Move every account, with its ledger entries, to the shard shardOf
+        picks for it: from the source databases (e.g. the single database
+        the shards replace) and from shards holding accounts that another
+        shard now wins, after shards were added or removed.
+
+        Run it while no router is serving the shards. Each chunk is
+        copied to its shard in one transaction and deleted from its
+        source in another, so an interrupted run is completed by running
+        it again. Balance snapshots are not moved: take a new snapshot of
+        each shard afterwards.
+        Parameters
+        ----------
+        sources : list
+            bankBackend objects, database URLs or SQLite file paths to
+            move all accounts out of
+        chunk_size : int
+            accounts read from a source at a time
+        Returns
+        -------
+        dict
+            accounts, entries - accounts and ledger entries moved
+            elapsed - seconds spent
+        """
+        self.log.logTransaction("Open rebalance")
+
+        if chunk_size <= 0:
+            raise ValueError("chunk_size must be positive")
+        shards = {shard.name: shard for shard in self.shards}
+        sources = [self.shardBackend(source) for source in sources]
+        sources = [source for source in sources if source.name not in shards] + self.shards
+
+        summary = {'accounts': 0,'entries': 0}
+        start = time.perf_counter()
+        try:
+            for source in sources:
+                moved = self.drain(source,chunk_size)
+                summary['accounts'] += moved['accounts']
+                summary['entries'] += moved['entries']
+        except SQLAlchemyError as e:
+            self.log.logTransaction("Exception: rebalance stopped - " + str(e))
+            raise
+        finally:
+            self.transactions.cache.clear()
+
+        summary['elapsed'] = time.perf_counter() - start
+        self.log.logTransaction("Close rebalance: {cnt} accounts moved".format(cnt = summary['accounts']))
+        return summary
+
+    @classmethod
+    def main(cls,argv) -> int:
+        """
+        Command line entry point for the shard maintenance commands
+        """
+        parser = argparse.ArgumentParser(prog='BankingSystem-Python-OOP.py shards',
+                                         description='Inspect and rebalance account shards')
+        commands = parser.add_subparsers(dest='command')
+        commands.required = True
+        status = commands.add_parser('status',help='accounts and ledger entries per shard')
+        status.add_argument('shards',nargs='+',metavar='SHARD')
+        rebalance = commands.add_parser('rebalance',help='move accounts to their shards')
+        rebalance.add_argument('shards',nargs='+',metavar='SHARD')
+        rebalance.add_argument('--from',dest='sources',nargs='+',default=[],metavar='DB',
+                               help='databases to move every account out of')
+        rebalance.add_argument('--chunk-size',type=int,default=500)
+        args = parser.parse_args(argv)
+
+        try:
+            with cls(args.shards) as router:
+                if args.command == 'rebalance':
+                    summary = router.rebalance(args.sources,args.chunk_size)
+                    print("{accounts} accounts and {entries} ledger entries moved "
+                          "in {elapsed:.2f}s".format(**summary))
+                for stats in router.shardStats():
+                    print("{shard}: {accounts} accounts, {entries} ledger entries".format(**stats))
+        except ValueError as e:
+            print(e)
+            return 1
+        return 0
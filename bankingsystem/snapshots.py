@@ -0,0 +1,281 @@
+from sqlalchemy import select,insert,and_,func,literal
+from datetime import datetime
+import argparse
+import calendar
+import csv
+import json
+
+from .database import bankDatabase,bankSchema,dbUrl
+from .errors import ValidationError
+from .logs import bankTransactionLog
+from .metrics import bankMetrics
+
+class bankSnapshots:
+
+    # Columns of a balance report row
+    reportColumns = ('acct_no','user_id','acct_type','available_bal','remaining_bal')
+
+    def __init__(self):
+        """
+        Balance checkpoints for point-in-time queries. Every ledger row
+        already carries the balances after its posting, so the balance
+        as of a date is the last entry before it; snapshots add the
+        balances no ledger entry holds (accounts older than the ledger)
+        and let a report over all accounts start from the last snapshot
+        run and read only the postings made since.
+        """
+        self.db = bankDatabase()
+        self.log = bankTransactionLog()
+
+    @staticmethod
+    def parseDate(as_of) -> str:
+        """
+        Returns the timestamp for YYYY-MM (end of month), YYYY-MM-DD
+        (end of day) or a full YYYY-MM-DD HH:MM:SS timestamp
+        """
+        as_of = str(as_of).strip()
+        try:
+            if len(as_of) == 7:
+                year,month = int(as_of[:4]),int(as_of[5:])
+                last_day = calendar.monthrange(year,month)[1]
+                return '{y:04d}-{m:02d}-{d:02d} 23:59:59'.format(y = year,m = month,d = last_day)
+            if len(as_of) == 10:
+                return datetime.strptime(as_of,'%Y-%m-%d').strftime('%Y-%m-%d 23:59:59')
+            return datetime.strptime(as_of,'%Y-%m-%d %H:%M:%S').strftime('%Y-%m-%d %H:%M:%S')
+        except ValueError:
+            raise ValidationError("Validation Error: Invalid date " + as_of)
+
+    @bankMetrics.timed
+    def takeSnapshot(self) -> dict:
+        """
+        Record a snapshot run: the latest balances of every account with
+        postings since the previous run. Cost is proportional to the
+        postings since that run, not to the size of the ledger.
+        Returns
+        -------
+        dict
+            run_id, snap_ts, last_txn_id and accounts (rows written)
+        """
+        self.log.logTransaction("Open takeSnapshot")
+        snap_ts = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+
+        with self.db.db_connect(dbUrl) as db_engine:
+            runs = bankSchema.table('snapshot_runs', db_engine)
+            snapshots = bankSchema.table('balance_snapshots', db_engine)
+            ledger = bankSchema.table('transactions', db_engine)
+
+            with db_engine.begin():
+                # Writing the run first takes the write lock, so the ledger
+                # cannot move while the run is recorded
+                last_txn = select([literal(snap_ts),func.coalesce(func.max(ledger.columns.txn_id),0)])
+                new_run = insert(runs).from_select(['snap_ts','last_txn_id'],last_txn)
+                if db_engine.dialect.name in bankDatabase.returningDialects:
+                    run_id = db_engine.execute(new_run.returning(runs.columns.run_id)).scalar()
+                else:
+                    # sqlite3 and the MySQL drivers report the generated key
+                    run_id = db_engine.execute(new_run).lastrowid
+
+                recent = select([runs]).where(runs.columns.run_id <= run_id)
+                recent = recent.order_by(runs.columns.run_id.desc()).limit(2)
+                current,previous = (db_engine.execute(recent).fetchall() + [None])[:2]
+                prev_txn = previous.last_txn_id if previous is not None else 0
+
+                changed = select([func.max(ledger.columns.txn_id)])
+                changed = changed.where(and_(ledger.columns.txn_id > prev_txn,
+                                             ledger.columns.txn_id <= current.last_txn_id))
+                changed = changed.group_by(ledger.columns.acct_no)
+
+                rows = select([ledger.columns.acct_no,literal(current.run_id),literal(snap_ts),
+                               ledger.columns.available_bal,ledger.columns.remaining_bal])
+                rows = rows.where(ledger.columns.txn_id.in_(changed))
+                accounts = db_engine.execute(insert(snapshots).from_select(
+                                             ['acct_no','run_id','snap_ts','available_bal','remaining_bal'],
+                                             rows)).rowcount
+
+        self.log.logTransaction("Close takeSnapshot: run {run}, {cnt} accounts".format(
+                                run = current.run_id,cnt = accounts))
+        return {'run_id': current.run_id,'snap_ts': current.snap_ts,
+                'last_txn_id': current.last_txn_id,'accounts': accounts}
+
+    def lastRun(self,db_engine,as_of):
+        # Latest snapshot run taken at or before as_of, None if there is none
+        runs = bankSchema.table('snapshot_runs', db_engine)
+        stmt = select([runs]).where(runs.columns.snap_ts <= as_of)
+        return db_engine.execute(stmt.order_by(runs.columns.snap_ts.desc(),runs.columns.run_id.desc()).limit(1)).first()
+
+    @bankMetrics.timed
+    def balanceAsOf(self,acctno,as_of) -> dict:
+        """
+        Returns the balances of an account at a point in time: the last
+        ledger entry at or before as_of, or the last snapshot when the
+        account has no ledger entry that old
+        Parameters
+        ----------
+        acctno : int
+            account number
+        as_of : string
+            YYYY-MM, YYYY-MM-DD or YYYY-MM-DD HH:MM:SS
+        Returns
+        -------
+        dict
+            acct_no, as_of, available_bal and remaining_bal, None if
+            no balance is known for the account at that time
+        """
+        as_of = self.parseDate(as_of)
+
+        with self.db.db_connect(dbUrl) as db_engine:
+            ledger = bankSchema.table('transactions', db_engine)
+            entry = select([ledger.columns.available_bal,ledger.columns.remaining_bal])
+            entry = entry.where(and_(ledger.columns.acct_no == acctno,ledger.columns.txn_ts <= as_of))
+            entry = entry.order_by(ledger.columns.txn_ts.desc(),ledger.columns.txn_id.desc()).limit(1)
+            row = db_engine.execute(entry).first()
+
+            if row is None:
+                run = self.lastRun(db_engine,as_of)
+                if run is not None:
+                    snapshots = bankSchema.table('balance_snapshots', db_engine)
+                    snap = select([snapshots.columns.available_bal,snapshots.columns.remaining_bal])
+                    snap = snap.where(and_(snapshots.columns.acct_no == acctno,
+                                           snapshots.columns.run_id <= run.run_id))
+                    snap = snap.order_by(snapshots.columns.run_id.desc()).limit(1)
+                    row = db_engine.execute(snap).first()
+
+        if row is None:
+            return None
+        return {'acct_no': acctno,'as_of': as_of,
+                'available_bal': row.available_bal,'remaining_bal': row.remaining_bal}
+
+    def balancesAsOf(self,as_of,chunk_size = 1000):
+        """
+        Yields the balances of every account at a point in time, in
+        acct_no order, in one streaming pass: cust_accounts and the
+        latest snapshot row per account are read side by side in
+        account order, and the postings since the last snapshot run
+        before as_of are applied on top.
+        Parameters
+        ----------
+        as_of : string
+            YYYY-MM, YYYY-MM-DD or YYYY-MM-DD HH:MM:SS
+        chunk_size : int
+            rows fetched from the database at a time
+        Yields
+        ------
+        dict
+            acct_no, user_id, acct_type, available_bal, remaining_bal;
+            accounts with no balance known at as_of are skipped
+        """
+        as_of = self.parseDate(as_of)
+
+        with self.db.db_connect(dbUrl) as db_engine:
+            cust_accounts = bankSchema.table('cust_accounts', db_engine)
+            snapshots = bankSchema.table('balance_snapshots', db_engine)
+            ledger = bankSchema.table('transactions', db_engine)
+            run = self.lastRun(db_engine,as_of)
+
+            # Postings after the run, the short delta kept in memory
+            delta = {}
+            since = ledger.columns.txn_id > (run.last_txn_id if run is not None else 0)
+            recent = select([ledger.columns.acct_no,ledger.columns.available_bal,ledger.columns.remaining_bal])
+            recent = recent.where(and_(since,ledger.columns.txn_ts <= as_of)).order_by(ledger.columns.txn_id)
+            for row in db_engine.execute(recent):
+                delta[row.acct_no] = (row.available_bal,row.remaining_bal)
+
+            # Row of the newest run of each account, joined back on the
+            # primary key
+            newest = select([snapshots.columns.acct_no,func.max(snapshots.columns.run_id).label('run_id')])
+            newest = newest.where(snapshots.columns.run_id <= (run.run_id if run is not None else 0))
+            newest = newest.group_by(snapshots.columns.acct_no).alias('newest')
+            latest = select([snapshots.columns.acct_no,snapshots.columns.available_bal,
+                             snapshots.columns.remaining_bal])
+            latest = latest.select_from(snapshots.join(newest,and_(snapshots.columns.acct_no == newest.columns.acct_no,
+                                                                   snapshots.columns.run_id == newest.columns.run_id)))
+            latest = latest.order_by(snapshots.columns.acct_no)
+            snap_rows = self.fetchRows(db_engine.execute(latest),chunk_size)
+            snap = next(snap_rows,None)
+
+            accounts = select([cust_accounts.columns.acct_no,cust_accounts.columns.user_id,
+                               cust_accounts.columns.acct_type]).order_by(cust_accounts.columns.acct_no)
+            for acct in self.fetchRows(db_engine.execute(accounts),chunk_size):
+                while snap is not None and snap.acct_no < acct.acct_no:
+                    snap = next(snap_rows,None)
+
+                balances = delta.get(acct.acct_no)
+                if balances is None and snap is not None and snap.acct_no == acct.acct_no:
+                    balances = (snap.available_bal,snap.remaining_bal)
+                if balances is None:
+                    continue
+                yield {'acct_no': acct.acct_no,'user_id': acct.user_id,'acct_type': acct.acct_type,
+                       'available_bal': balances[0],'remaining_bal': balances[1]}
+
+    @staticmethod
+    def fetchRows(result,chunk_size):
+        while True:
+            chunk = result.fetchmany(chunk_size)
+            if not chunk:
+                return
+            for row in chunk:
+                yield row
+
+    @bankMetrics.timed
+    def writeReport(self,as_of,path,fmt = 'csv') -> int:
+        """
+        Stream the balances of every account at as_of to a CSV or JSONL file
+        Returns
+        -------
+        int
+            number of accounts written
+        """
+        self.log.logTransaction("Open writeReport")
+        rows = 0
+
+        with open(path,'w',newline='') as f:
+            if fmt == 'csv':
+                writer = csv.writer(f)
+                writer.writerow(self.reportColumns)
+            for balance in self.balancesAsOf(as_of):
+                if fmt == 'csv':
+                    writer.writerow([balance[column] for column in self.reportColumns])
+                else:
+                    f.write(json.dumps(balance) + '\n')
+                rows += 1
+
+        self.log.logTransaction("Close writeReport: {rows} accounts".format(rows = rows))
+        return rows
+
+    @classmethod
+    def main(cls,argv) -> int:
+        """
+        Command line entry point for snapshot runs and balance reports
+        """
+        parser = argparse.ArgumentParser(prog='BankingSystem-Python-OOP.py snapshot',
+                                         description='Balance snapshots and point-in-time reports')
+        commands = parser.add_subparsers(dest='command',required=True)
+        commands.add_parser('take',help='record a snapshot run')
+        report = commands.add_parser('report',help='balances of all accounts at a date')
+        report.add_argument('as_of',help='YYYY-MM (month end), YYYY-MM-DD or YYYY-MM-DD HH:MM:SS')
+        report.add_argument('path')
+        report.add_argument('--format',choices=('csv','jsonl'),default='csv')
+        balance = commands.add_parser('balance',help='balance of one account at a date')
+        balance.add_argument('acct_no',type=int)
+        balance.add_argument('as_of')
+        args = parser.parse_args(argv)
+
+        snapshots = cls()
+        try:
+            if args.command == 'take':
+                run = snapshots.takeSnapshot()
+                print("Snapshot run {run_id} at {snap_ts}: {accounts} accounts".format(**run))
+            elif args.command == 'report':
+                rows = snapshots.writeReport(args.as_of,args.path,args.format)
+                print("{rows} account balances written to {path}".format(rows = rows,path = args.path))
+            else:
+                result = snapshots.balanceAsOf(args.acct_no,args.as_of)
+                if result is None:
+                    print("No balance known for account {acct} at {as_of}".format(acct = args.acct_no,
+                                                                                   as_of = args.as_of))
+                    return 1
+                print(json.dumps(result))
+        except ValidationError as e:
+            print(e.message)
+            return 1
+        return 0
@@ -0,0 +1,941 @@
+from sqlalchemy import select,insert,update,and_,or_,case,bindparam
+from sqlalchemy.exc import SQLAlchemyError
+from collections import namedtuple
+from datetime import datetime
+from functools import wraps
+from itertools import islice
+import time
+
+from .cache import bankBalanceCache
+from .database import bankDatabase,bankSchema,dbUrl
+from .errors import ValidationError
+from .logs import bankTransactionLog
+from .metrics import bankMetrics
+
+# Outcome of one record posted through bankTransactions.postBatch
+postingResult = namedtuple('postingResult','line acct_no op amount success message')
+
+# Account row as read for balances and rejection reasons, kept in the balance cache
+accountRow = namedtuple('accountRow','user_id acct_type available_bal remaining_bal acct_sts')
+
+class bankTransactions:
+    
+    # Operations accepted by postBatch
+    batchOps = ('deposit','withdraw','pay')
+    
+    # Account types customers may deposit into / pay, checked inside the
+    # statement of the transaction
+    depositTypes = ('Checking','Savings')
+    payTypes = ('Loan','Credit')
+    
+    # Entries returned per getHistory page unless asked otherwise
+    historyPageSize = 50
+    
+    # Fixed statements of the single-account operations, built once per
+    # reflected table and bound per call (see fixedStatement)
+    _statements = {}
+    
+    def __init__(self,notify = print,balance_cache = None):
+        self.db =  bankDatabase()  
+        self.log = bankTransactionLog()
+        # Receives the messages meant for the user, print for the menu
+        self.notify = notify           
+        # Balance rows served by getBalance, invalidated by every write
+        self.cache = balance_cache or bankBalanceCache.shared()
+
+    def checkTransaction(self,u_id,acctno,amt):
+        # Every check applies whoever acts: a negative withdrawal would
+        # raise the balance
+        if u_id is not None and len(str(u_id)) <= 0:
+            raise ValidationError("Error: User ID cannot be blank")
+        if len(str(acctno)) <= 0 or acctno == 0:
+            raise ValidationError("Error: Account no cannot be blank or zero")
+        if amt is not None and amt <= 0:
+            raise ValidationError("Error: Transaction amount cannot be negative/zero")
+
+    def validateTransaction(func):
+        @wraps(func)
+        def wrapped(self,u_id,acctno,amt):
+            
+            try:
+                self.checkTransaction(u_id,acctno,amt)
+                return func(self,u_id,acctno,amt)
+            
+            except ValidationError as e:
+                self.notify(e.message)
+                return False
+                
+        return wrapped
+    
+    # Statement parts and messages shared with the asyncio classes
+    
+    def accountFilter(self,cust_accounts,u_id,acctno):
+        if u_id is not None:
+            return and_(cust_accounts.columns.user_id==u_id,
+                        cust_accounts.columns.acct_no==acctno)
+        return cust_accounts.columns.acct_no==acctno
+    
+    def accountGuard(self,cust_accounts,acct_filter,acct_types = None):
+        # Checks validateAccount used to run as a separate query, folded
+        # into the statement of the transaction
+        guard = and_(acct_filter,cust_accounts.columns.acct_sts == 'ACTIVE')
+        if acct_types:
+            guard = and_(guard,or_(*[cust_accounts.columns.acct_type == acct_type
+                                     for acct_type in acct_types]))
+        return guard
+    
+    def ownerFilter(self,cust_accounts,u_id,acctno):
+        # Withdrawals and payments always need the owning user
+        return and_(cust_accounts.columns.user_id==u_id,
+                    cust_accounts.columns.acct_no==acctno)
+    
+    def balanceColumns(self,cust_accounts) -> list:
+        return [cust_accounts.columns.available_bal,
+                cust_accounts.columns.acct_type,
+                cust_accounts.columns.remaining_bal]
+    
+    def balanceQuery(self,cust_accounts,acctno):
+        # Looked up by account number only so the row can be cached for
+        # every caller, the user and status checks are done on the row
+        current_bal = select(self.balanceColumns(cust_accounts) + [cust_accounts.columns.user_id,
+                                                                   cust_accounts.columns.acct_sts])
+        return current_bal.where(cust_accounts.columns.acct_no==acctno).limit(1)
+    
+    def fixedStatement(self,name,table,build):
+        # The statement objects are reused so SQLAlchemy compiles each
+        # once and sqlite3 finds the same SQL text in its statement cache
+        key = (name,table)
+        stmt = self._statements.get(key)
+        if stmt is None:
+            stmt = self._statements[key] = build()
+        return stmt
+    
+    def balanceStatement(self,cust_accounts):
+        # balanceQuery with the account number bound as acct
+        return self.fixedStatement('balance',cust_accounts,
+                                   lambda: self.balanceQuery(cust_accounts,bindparam('acct')))
+    
+    def postingStatement(self,cust_accounts,op,owner):
+        """
+        Returns the (whereclause, values) of a deposit, withdraw or pay
+        update with the bind parameters acct, amt and, when owner is set,
+        user; the guards are the ones of accountGuard / withdrawGuard
+        """
+        def build():
+            acct,amt = bindparam('acct'),bindparam('amt')
+            user = bindparam('user') if owner else None
+            if op == 'deposit':
+                acct_filter = self.accountFilter(cust_accounts,user,acct)
+                return (self.accountGuard(cust_accounts,acct_filter,self.depositTypes if owner else None),
+                        self.depositValues(cust_accounts,amt))
+            acct_filter = self.ownerFilter(cust_accounts,user,acct)
+            if op == 'withdraw':
+                return (self.withdrawGuard(cust_accounts,self.accountGuard(cust_accounts,acct_filter),amt),
+                        self.withdrawValues(cust_accounts,amt))
+            return (self.accountGuard(cust_accounts,acct_filter,self.payTypes),
+                    self.payValues(cust_accounts,amt))
+        return self.fixedStatement((op,owner),cust_accounts,build)
+    
+    def cacheBalance(self,acctno,rslt_amt,generation) -> accountRow:
+        if rslt_amt is None:
+            return None
+        row = accountRow(rslt_amt.user_id,rslt_amt.acct_type,int(rslt_amt.available_bal),
+                         int(rslt_amt.remaining_bal),rslt_amt.acct_sts)
+        self.cache.put(acctno,row,generation)
+        return row
+    
+    def accountRejection(self,row,u_id,acctno,acct_types = None,owner_only = False) -> str:
+        # Reason a guarded statement matched no row, given the account row
+        # read by number; None if the account passes the checks
+        if row is None or (row.user_id != u_id and (u_id is not None or owner_only)):
+            return "Validation Error: Account not found"
+        if row.acct_sts != 'ACTIVE':
+            return "Validation Error: Account {acct} is not active".format(acct = acctno)
+        if acct_types and row.acct_type not in acct_types:
+            return "Validation Error: {acct_type} account {acct} does not accept this transaction, only {types} accounts do".format(
+                   acct_type = row.acct_type,acct = acctno,types = ' or '.join(acct_types))
+        return None
+    
+    def ledgerEntry(self,ledger,acctno,txn_type,amount):
+        # Ledger row written in the transaction of the balance update,
+        # with the balances the update returned
+        txn_ts = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        entry = self.fixedStatement('ledger',ledger,lambda: insert(ledger))
+        
+        def params(row):
+            return entry,{'acct_no': acctno,'txn_type': txn_type,'amount': amount,
+                          'available_bal': row.available_bal,
+                          'remaining_bal': row.remaining_bal,
+                          'txn_ts': txn_ts}
+        return params
+    
+    def depositValues(self,cust_accounts,depositAmt) -> dict:
+        # Add the amount server-side so concurrent deposits are not lost
+        return {'available_bal': cust_accounts.columns.available_bal + depositAmt}
+    
+    def withdrawGuard(self,cust_accounts,acct_filter,withdrawAmt):
+        # The overdraft guard is part of the UPDATE so the check and
+        # the debit cannot interleave with another withdrawal
+        return and_(acct_filter,
+                    cust_accounts.columns.available_bal > 0,
+                    cust_accounts.columns.available_bal >= withdrawAmt)
+    
+    def withdrawValues(self,cust_accounts,withdrawAmt) -> dict:
+        loan_amt = case([(or_(cust_accounts.columns.acct_type == 'Loan',
+                              cust_accounts.columns.acct_type == 'Credit'),withdrawAmt)],
+                        else_=0)
+        return {'available_bal': cust_accounts.columns.available_bal - withdrawAmt,
+                'remaining_bal': cust_accounts.columns.remaining_bal + loan_amt}
+    
+    def payValues(self,cust_accounts,paymentAmt) -> dict:
+        return {'available_bal': cust_accounts.columns.available_bal + paymentAmt,
+                'remaining_bal': cust_accounts.columns.remaining_bal - paymentAmt}
+    
+    def transferValues(self,cust_accounts,amount) -> dict:
+        # Credit leg of a transfer: a deposit into Checking / Savings,
+        # a payment into Loan / Credit
+        pay_amt = case([(cust_accounts.columns.acct_type.in_(self.payTypes),amount)],else_=0)
+        return {'available_bal': cust_accounts.columns.available_bal + amount,
+                'remaining_bal': cust_accounts.columns.remaining_bal - pay_amt}
+    
+    def transferLegs(self,cust_accounts,u_id,src,dst,amount) -> list:
+        # (acct_no, txn_type, guard, values) of both legs, in acct_no order:
+        # every transfer writes the lower account first, so two transfers
+        # over the same pair never wait on each other's second row
+        debit = self.withdrawGuard(cust_accounts,
+                                   self.accountGuard(cust_accounts,self.accountFilter(cust_accounts,u_id,src)),
+                                   amount)
+        credit = self.accountGuard(cust_accounts,self.accountFilter(cust_accounts,u_id,dst))
+        legs = [(src,'transfer_out',debit,self.withdrawValues(cust_accounts,amount)),
+                (dst,'transfer_in',credit,self.transferValues(cust_accounts,amount))]
+        return sorted(legs,key=lambda leg: leg[0])
+    
+    def checkTransfer(self,src,dst,amount):
+        if len(str(src)) <= 0 or src == 0 or len(str(dst)) <= 0 or dst == 0:
+            raise ValidationError("Error: Account no cannot be blank or zero")
+        if src == dst:
+            raise ValidationError("Error: Source and destination accounts must be different")
+        if not isinstance(amount,int) or amount <= 0:
+            raise ValidationError("Error: Transaction amount cannot be negative/zero")
+    
+    def transferRejection(self,row,u_id,acctno,src) -> str:
+        # Reason the leg of acctno matched no row
+        reason = self.accountRejection(row,u_id,acctno)
+        if reason is None and acctno == src:
+            reason = self.withdrawRejection(row,row.user_id,acctno)
+        return reason
+    
+    def withdrawRejection(self,rslt_amt,u_id,acctno) -> str:
+        # Reason a guarded withdrawal matched no row, given the account row
+        reason = self.accountRejection(rslt_amt,u_id,acctno,owner_only = True)
+        if reason is not None:
+            return reason
+        
+        curr_amt = int(rslt_amt.available_bal)
+        
+        if curr_amt <= 0:
+            return """
+                    Current balance is zero/negative. 
+                    Funds cannot be withdrawn
+                  """
+        return """
+                Withdrawal amount is greater 
+                than current balance ${curramt}
+              """.format(curramt = curr_amt)
+    
+    def depositMessage(self,acctno,depositAmt,new_amt) -> str:
+        return """
+                         Amount ${amt} successfully deposited 
+                         into the account {acct}, 
+                         New Balance is ${newamt}
+                    """.format(amt = depositAmt,acct = acctno,newamt = new_amt)
+    
+    def withdrawMessage(self,acctno,withdrawAmt,account_type,avail_new_amt,remain_new_amt) -> str:
+        if account_type in ('Checking','Savings'):
+            return """
+                     Amount ${amt} successfully withdrawn 
+                     from the {acct} account {acctnum}, 
+                     New available balance is ${newamt}.
+                 """.format(amt = withdrawAmt,acct = account_type,
+                        acctnum = acctno,newamt = avail_new_amt)
+        return """
+                     Amount ${amt} successfully withdrawn 
+                     from the {acct} account {acctnum}, 
+                     New available balance is ${newamt},
+                     New payment balance is ${pymt}.
+                 """.format(amt = withdrawAmt,acct = account_type,
+                        acctnum = acctno,newamt = avail_new_amt,
+                            pymt = remain_new_amt)
+    
+    def balanceMessage(self,acctno,account_type,curr_amt,remain_bal) -> str:
+        if account_type in ('Checking','Savings'):
+            return """
+                     Available balance in {acct} account {acctnum}, 
+                     is ${curramt}.
+                 """.format(acct = account_type,
+                            acctnum = acctno,curramt = curr_amt)
+        return """
+                     Available balance in {acct} account {acctnum}, 
+                     is ${curramt} and payment balance is ${pymtamt}.
+                 """.format(acct = account_type,
+                            acctnum = acctno,
+                            curramt = curr_amt,
+                            pymtamt = remain_bal
+                           )
+    
+    def transferMessage(self,src,dst,amount,src_row,dst_row) -> str:
+        return """
+                     Amount ${amt} successfully transferred
+                     from the {srctype} account {src} to the {dsttype} account {dst},
+                     New available balance of account {src} is ${srcbal},
+                     New available balance of account {dst} is ${dstbal}.
+              """.format(amt = amount,src = src,dst = dst,
+                         srctype = src_row.acct_type,dsttype = dst_row.acct_type,
+                         srcbal = int(src_row.available_bal),dstbal = int(dst_row.available_bal))
+    
+    def paymentMessage(self,acctno,paymentAmt,account_type,avail_new_amt,remain_new_amt) -> str:
+        return """
+                     Payment amount ${amt} successfully posted
+                     to the {acct} account {acctnum}, 
+                     New available balance is ${newamt},
+                     New payment balance is ${pymt}.
+              """.format(amt = paymentAmt,acct = account_type,
+                        acctnum = acctno,newamt = avail_new_amt,
+                            pymt = remain_new_amt)
+    
+    @bankMetrics.timed
+    @validateTransaction
+    def depositAmt(self,u_id : int,acctno : int,depositAmt :  int) -> bool:
+        """
+        Deposit the amount to the customer account
+        Parameters
+        ----------
+        u_id : int
+            user id
+        acctno: int
+            account number
+        depositAmt : int
+            Deposit amount to the account
+        Returns
+        -------
+        bool
+            True if successful, False otherwise
+        """
+        
+        self.log.logTransaction("Open depositAmt")   
+
+        try:
+            row_cnt = 0
+        
+            # Customers deposit into Checking / Savings, employees into any account
+            acct_types = self.depositTypes if u_id is not None else None
+        
+            with self.db.db_connect(dbUrl) as db_engine:
+                cust_accounts = bankSchema.table('cust_accounts', db_engine)
+                ledger = bankSchema.table('transactions', db_engine)
+
+                rslt_amt = self.db.updateReturning(db_engine,cust_accounts,
+                                                   *self.postingStatement(cust_accounts,'deposit',u_id is not None),
+                                                   self.balanceColumns(cust_accounts),
+                                                   self.ledgerEntry(ledger,acctno,'deposit',depositAmt),
+                                                   {'acct': acctno,'user': u_id,'amt': depositAmt},
+                                                   ('deposit',u_id is not None))
+                
+                if rslt_amt is None:
+                    # Find out why the guarded update was rejected
+                    row = db_engine.execute(self.balanceQuery(cust_accounts,acctno)).first()
+                    reason = self.accountRejection(row,u_id,acctno,acct_types)
+                    raise ValidationError(reason or "Error: Deposit transaction failed.")
+                
+                self.cache.invalidate(acctno)
+                row_cnt = 1
+                new_amt = int(rslt_amt.available_bal)
+            
+            if row_cnt != 0:
+                self.log.logTransaction("Close depositAmt")                  
+                self.notify(self.depositMessage(acctno,depositAmt,new_amt))
+                return True
+            else:
+                raise ValidationError("Error: Deposit transaction failed.")
+        except ValidationError as e:
+            self.log.logTransaction("Exception: depositAmt")              
+            self.notify(e.message)
+            return False           
+     
+    @bankMetrics.timed
+    @validateTransaction
+    def withdrawAmt(self,u_id,acctno,withdrawAmt) -> bool:   
+
+        """
+        Withdraw amount from the customer account
+        Parameters
+        ----------
+        u_id : int
+            user id
+        acctno: int
+            account number
+        withdrawAmt : int
+            withdrawal amount from the account
+        Returns
+        -------
+        bool
+            True if successful, False otherwise
+        """        
+        
+        self.log.logTransaction("Open withdrawAmt")        
+        
+        try:
+            row_cnt = 0
+        
+            with self.db.db_connect(dbUrl) as db_engine:
+                cust_accounts = bankSchema.table('cust_accounts', db_engine)
+                ledger = bankSchema.table('transactions', db_engine)
+                
+                rslt_amt = self.db.updateReturning(db_engine,cust_accounts,
+                                                   *self.postingStatement(cust_accounts,'withdraw',True),
+                                                   self.balanceColumns(cust_accounts),
+                                                   self.ledgerEntry(ledger,acctno,'withdraw',withdrawAmt),
+                                                   {'acct': acctno,'user': u_id,'amt': withdrawAmt},
+                                                   ('withdraw',True))
+                
+                if rslt_amt is None:
+                    # Find out why the guarded update was rejected
+                    row = db_engine.execute(self.balanceQuery(cust_accounts,acctno)).first()
+                    raise ValidationError(self.withdrawRejection(row,u_id,acctno))
+                
+                self.cache.invalidate(acctno)
+                row_cnt = 1
+                avail_new_amt = int(rslt_amt.available_bal)
+                account_type = rslt_amt.acct_type
+                remain_new_amt = int(rslt_amt.remaining_bal)
+            
+            if row_cnt != 0:
+                self.notify(self.withdrawMessage(acctno,withdrawAmt,account_type,
+                                                 avail_new_amt,remain_new_amt))
+                self.log.logTransaction("Close withdrawAmt")                  
+                return True
+            else:
+                raise ValidationError("Error: Withdrawal transaction failed.")
+        except ValidationError as e:
+            self.log.logTransaction("Exception: withdrawAmt")              
+            self.notify(e.message)
+            return False 
+    
+    @bankMetrics.timed
+    def getBalance(self,u_id,acctno) -> dict:
+        """
+        Returns the balances of a customer account, from the balance
+        cache when the account was read recently
+        Parameters
+        ----------
+        u_id : int
+            user id, None to look the account up by number only
+        acctno: int
+            account number
+        Returns
+        -------
+        dict
+            acct_no, acct_type, available_bal and remaining_bal,
+            None if the account is not found or not active
+        """
+        return self.balanceRow(u_id,acctno,self.readBalance(acctno))
+    
+    def readBalance(self,acctno) -> accountRow:
+        # Account row from the balance cache, read and cached on a miss
+        row = self.cache.get(acctno)
+        
+        if row is None:
+            generation = self.cache.generation(acctno)
+            with self.db.db_connect(dbUrl) as db_engine:
+                cust_accounts = bankSchema.table('cust_accounts', db_engine)
+                rslt_amt = db_engine.execute(self.balanceStatement(cust_accounts),{'acct': acctno}).first()
+            row = self.cacheBalance(acctno,rslt_amt,generation)
+        return row
+    
+    def balanceRow(self,u_id,acctno,row) -> dict:
+        if self.accountRejection(row,u_id,acctno) is not None:
+            return None
+        return {'acct_no': acctno,
+                'acct_type': row.acct_type,
+                'available_bal': row.available_bal,
+                'remaining_bal': row.remaining_bal}
+    
+    @bankMetrics.timed
+    @validateTransaction
+    def showBalance(self,u_id,acctno,amt = None) -> bool:              
+        """
+        Show balance amount in the customer account
+        Parameters
+        ----------
+        u_id : int
+            user id
+        acctno: int
+            account number
+        amt : int 
+            defaulted to None
+        Returns
+        -------
+        bool
+            True if successful, False otherwise
+        """  
+        self.log.logTransaction("Open showBalance")    
+
+        try:
+            row = self.readBalance(acctno)
+            reason = self.accountRejection(row,u_id,acctno)
+            
+            if reason is None:
+                self.notify(self.balanceMessage(acctno,row.acct_type,
+                                                row.available_bal,row.remaining_bal))
+
+                self.log.logTransaction("Close showBalance")                    
+                return True
+            else:
+                raise ValidationError(reason)
+        except ValidationError as e:
+            self.log.logTransaction("Exception: showBalance")             
+            self.notify(e.message)
+            return False 
+ 
+    @bankMetrics.timed
+    @validateTransaction
+    def payBalance(self,u_id,acctno,paymentAmt) -> bool:              
+        """
+        Pay balance amount in the credit / loan account
+        Parameters
+        ----------
+        u_id : int
+            user id
+        acctno: int
+            account number
+        paymentAmt : int 
+            payment amount
+        Returns
+        -------
+        bool
+            True if successful, False otherwise
+        """  
+        
+        self.log.logTransaction("Open: payBalance") 
+
+        try:
+            row_cnt = 0
+        
+            with self.db.db_connect(dbUrl) as db_engine:
+                cust_accounts = bankSchema.table('cust_accounts', db_engine)
+                ledger = bankSchema.table('transactions', db_engine)
+                
+                rslt_amt = self.db.updateReturning(db_engine,cust_accounts,
+                                                   *self.postingStatement(cust_accounts,'pay',True),
+                                                   self.balanceColumns(cust_accounts),
+                                                   self.ledgerEntry(ledger,acctno,'pay',paymentAmt),
+                                                   {'acct': acctno,'user': u_id,'amt': paymentAmt},
+                                                   ('pay',True))
+                
+                if rslt_amt is None:
+                    # Find out why the guarded update was rejected
+                    row = db_engine.execute(self.balanceQuery(cust_accounts,acctno)).first()
+                    reason = self.accountRejection(row,u_id,acctno,self.payTypes,owner_only = True)
+                    raise ValidationError(reason or "Error: payment transaction failed.")
+                
+                self.cache.invalidate(acctno)
+                row_cnt = 1
+                avail_new_amt = int(rslt_amt.available_bal)
+                account_type = rslt_amt.acct_type
+                remain_new_amt = int(rslt_amt.remaining_bal)
+            
+            if row_cnt != 0:
+                self.notify(self.paymentMessage(acctno,paymentAmt,account_type,
+                                                avail_new_amt,remain_new_amt))
+                self.log.logTransaction("Close: payBalance")                 
+                return True
+            else:
+                raise ValidationError("Error: payment transaction failed.")
+        except ValidationError as e:
+            self.log.logTransaction("Exception: payBalance")              
+            self.notify(e.message)
+            return False
+
+    @bankMetrics.timed
+    def transfer(self,src,dst,amount,u_id = None) -> bool:
+        """
+        Move an amount between two accounts in one database transaction:
+        a withdrawal from src and a deposit (Checking / Savings) or
+        payment (Loan / Credit) into dst. Either both legs and their
+        ledger entries are committed or neither is.
+        Parameters
+        ----------
+        src : int
+            account number debited
+        dst : int
+            account number credited
+        amount : int
+            transfer amount
+        u_id : int
+            user id owning both accounts, None for employee transfers
+            between any two accounts
+        Returns
+        -------
+        bool
+            True if successful, False otherwise
+        """
+        
+        self.log.logTransaction("Open transfer")
+        
+        try:
+            self.checkTransfer(src,dst,amount)
+            rows = {}
+            
+            with self.db.db_connect(dbUrl) as db_engine:
+                cust_accounts = bankSchema.table('cust_accounts', db_engine)
+                ledger = bankSchema.table('transactions', db_engine)
+                rejected = None
+                
+                try:
+                    with db_engine.begin():
+                        for acctno,txn_type,guard,values in self.transferLegs(cust_accounts,u_id,src,dst,amount):
+                            row = self.db.returningRow(db_engine,cust_accounts,guard,values,
+                                                       self.balanceColumns(cust_accounts))
+                            if row is None:
+                                # Roll back the leg already applied
+                                rejected = acctno
+                                raise ValidationError("Error: Transfer transaction failed.")
+                            db_engine.execute(*self.ledgerEntry(ledger,acctno,txn_type,amount)(row))
+                            rows[acctno] = row
+                except ValidationError:
+                    # Find out why the guarded update was rejected
+                    row = db_engine.execute(self.balanceQuery(cust_accounts,rejected)).first()
+                    reason = self.transferRejection(row,u_id,rejected,src)
+                    raise ValidationError(reason or "Error: Transfer transaction failed.")
+            
+            self.cache.invalidate(src)
+            self.cache.invalidate(dst)
+            self.notify(self.transferMessage(src,dst,amount,rows[src],rows[dst]))
+            self.log.logTransaction("Close transfer")
+            return True
+        except ValidationError as e:
+            self.log.logTransaction("Exception: transfer")
+            self.notify(e.message)
+            return False
+
+    @bankMetrics.timed
+    def getHistory(self,u_id,acctno,limit = None,cursor = None) -> dict:
+        """
+        Returns one page of the ledger of an account, newest first.
+        Pages are read by keyset on (txn_ts, txn_id) through the
+        ix_transactions_acct_ts index, so every page costs the same
+        however old it is.
+        Parameters
+        ----------
+        u_id : int
+            user id, None to look the account up by number only
+        acctno: int
+            account number
+        limit : int
+            entries per page, historyPageSize by default
+        cursor : string
+            next value of the previous page, None for the newest entries
+        Returns
+        -------
+        dict
+            acct_no, entries (txn_id, txn_type, amount, available_bal,
+            remaining_bal, txn_ts) and next - cursor of the following
+            page, None on the last page. None if the account is not found
+        """
+        limit = self.pageSize(limit)
+        position = self.parseCursor(cursor)
+        
+        row = self.readBalance(acctno)
+        if row is None or (u_id is not None and row.user_id != u_id):
+            return None
+        
+        with self.db.db_connect(dbUrl) as db_engine:
+            ledger = bankSchema.table('transactions', db_engine)
+            rows = db_engine.execute(self.historyQuery(ledger,acctno,limit,position)).fetchall()
+        
+        return self.historyPage(acctno,rows,limit)
+    
+    def pageSize(self,limit) -> int:
+        if limit is None:
+            return self.historyPageSize
+        if limit <= 0:
+            raise ValidationError("Error: History page size must be positive")
+        return min(limit,1000)
+    
+    def parseCursor(self,cursor) -> tuple:
+        if cursor is None:
+            return None
+        txn_ts,_,txn_id = str(cursor).rpartition('|')
+        try:
+            return txn_ts,int(txn_id)
+        except ValueError:
+            raise ValidationError("Error: Invalid history cursor")
+    
+    def historyQuery(self,ledger,acctno,limit,position):
+        columns = ledger.columns
+        stmt = select([columns.txn_id,columns.txn_type,columns.amount,
+                       columns.available_bal,columns.remaining_bal,columns.txn_ts])
+        stmt = stmt.where(columns.acct_no==acctno)
+        
+        if position is not None:
+            txn_ts,txn_id = position
+            # The txn_ts bound is an index range, txn_id breaks ties
+            # between entries of the same second
+            stmt = stmt.where(and_(columns.txn_ts <= txn_ts,
+                                   or_(columns.txn_ts < txn_ts,columns.txn_id < txn_id)))
+        
+        # One extra row tells whether there is a next page
+        return stmt.order_by(columns.txn_ts.desc(),columns.txn_id.desc()).limit(limit + 1)
+    
+    def historyPage(self,acctno,rows,limit) -> dict:
+        entries = [{'txn_id': row.txn_id,
+                    'txn_type': row.txn_type,
+                    'amount': row.amount,
+                    'available_bal': row.available_bal,
+                    'remaining_bal': row.remaining_bal,
+                    'txn_ts': row.txn_ts} for row in rows[:limit]]
+        
+        cursor = None
+        if len(rows) > limit:
+            cursor = '{ts}|{txn}'.format(ts = entries[-1]['txn_ts'],txn = entries[-1]['txn_id'])
+        return {'acct_no': acctno,'entries': entries,'next': cursor}
+
+    def _batchStatements(self,cust_accounts) -> dict:
+        # One parameterised statement per operation, reused for every record
+        acct_filter = self.accountGuard(cust_accounts,cust_accounts.columns.acct_no==bindparam('acct'))
+        loan_amt = case([(or_(cust_accounts.columns.acct_type == 'Loan',
+                              cust_accounts.columns.acct_type == 'Credit'),bindparam('amt'))],
+                        else_=0)
+        
+        deposit = update(cust_accounts).where(acct_filter)
+        deposit = deposit.values(available_bal = cust_accounts.columns.available_bal + bindparam('amt'))
+        
+        withdraw = update(cust_accounts).where(and_(acct_filter,
+                                                    cust_accounts.columns.available_bal > 0,
+                                                    cust_accounts.columns.available_bal >= bindparam('amt')))
+        withdraw = withdraw.values(available_bal = cust_accounts.columns.available_bal - bindparam('amt'),
+                                   remaining_bal = cust_accounts.columns.remaining_bal + loan_amt)
+        
+        pay = update(cust_accounts).where(and_(acct_filter,
+                                               or_(*[cust_accounts.columns.acct_type == acct_type
+                                                     for acct_type in self.payTypes])))
+        pay = pay.values(available_bal = cust_accounts.columns.available_bal + bindparam('amt'),
+                         remaining_bal = cust_accounts.columns.remaining_bal - bindparam('amt'))
+        
+        return {'deposit': deposit, 'withdraw': withdraw, 'pay': pay}
+    
+    def _batchLedger(self,cust_accounts,ledger):
+        # Ledger entry of a posted record, balances copied from the
+        # account row the update just changed
+        columns = cust_accounts.columns
+        entry = select([columns.acct_no,bindparam('op'),bindparam('amt'),
+                        columns.available_bal,columns.remaining_bal,bindparam('ts')])
+        entry = entry.where(columns.acct_no==bindparam('acct'))
+        return insert(ledger).from_select(['acct_no','txn_type','amount','available_bal',
+                                           'remaining_bal','txn_ts'],entry)
+    
+    def _batchAccounts(self,cust_accounts):
+        # Rows of the accounts a chunk posts to, read in one statement
+        columns = cust_accounts.columns
+        stmt = select([columns.acct_no,columns.acct_type,columns.acct_sts,
+                       columns.available_bal,columns.remaining_bal])
+        return stmt.where(columns.acct_no.in_(bindparam('accts',expanding=True)))
+    
+    def _readAccounts(self,db_engine,accounts_stmt,acct_nos) -> dict:
+        # Pieces of 500 stay below SQLite's bound parameter limit
+        acct_nos = sorted(acct_nos)
+        accounts = {}
+        for start in range(0,len(acct_nos),500):
+            for row in db_engine.execute(accounts_stmt,accts = acct_nos[start:start + 500]):
+                accounts[row.acct_no] = row
+        return accounts
+    
+    def _batchRejection(self,op) -> str:
+        if op == 'withdraw':
+            return "Error: Insufficient balance or account not found / not active"
+        if op == 'pay':
+            return "Error: Loan or Credit account not found / not active"
+        return "Error: Account not found / not active"
+    
+    def _batchCheck(self,line,acctno,op,amt) -> postingResult:
+        if op not in self.batchOps:
+            return postingResult(line,acctno,op,amt,False,"Error: Invalid operation")
+        if not isinstance(amt,int) or amt <= 0:
+            return postingResult(line,acctno,op,amt,False,"Error: Transaction amount cannot be negative/zero")
+        return None
+    
+    def _postRows(self,db_engine,statements,ledger_entry,chunk):
+        # One update and one ledger insert per record, the rowcount of
+        # each update tells whether its record was posted
+        chunk_results = []
+        changed = set()
+        for line,(acctno,op,amt) in chunk:
+            rejected = self._batchCheck(line,acctno,op,amt)
+            if rejected is not None:
+                chunk_results.append(rejected)
+                continue
+            
+            row_cnt = db_engine.execute(statements[op],acct = acctno,amt = amt).rowcount
+            
+            if row_cnt != 0:
+                db_engine.execute(ledger_entry,acct = acctno,op = op,amt = amt,
+                                  ts = datetime.now().strftime('%Y-%m-%d %H:%M:%S'))
+                chunk_results.append(postingResult(line,acctno,op,amt,True,"Posted"))
+                changed.add(acctno)
+            else:
+                chunk_results.append(postingResult(line,acctno,op,amt,False,self._batchRejection(op)))
+        return chunk_results,changed
+    
+    def _postGrouped(self,db_engine,statements,accounts_stmt,ledger,chunk):
+        # Plans the chunk on the account rows read up front, the way the
+        # guarded updates would decide record by record, then runs one
+        # executemany per statement and one for the ledger. Returns None
+        # when the rows moved under the plan (an account changed by
+        # another connection before the chunk took its write lock).
+        def add(bal,amt):
+            # NULL balances stay NULL, as in SQL
+            return None if bal is None else bal + amt
+        
+        accounts = self._readAccounts(db_engine,accounts_stmt,{acctno for line,(acctno,op,amt) in chunk})
+        balances = {acctno: [row.available_bal,row.remaining_bal] for acctno,row in accounts.items()}
+        chunk_results = []
+        params = {op: [] for op in self.batchOps}
+        entries = []
+        txn_ts = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        
+        for line,(acctno,op,amt) in chunk:
+            rejected = self._batchCheck(line,acctno,op,amt)
+            if rejected is not None:
+                chunk_results.append(rejected)
+                continue
+            
+            row = accounts.get(acctno)
+            posted = row is not None and row.acct_sts == 'ACTIVE'
+            if posted:
+                bal = balances[acctno]
+                if op == 'deposit':
+                    bal[0] = add(bal[0],amt)
+                elif op == 'withdraw':
+                    posted = bal[0] is not None and bal[0] > 0 and bal[0] >= amt
+                    if posted:
+                        bal[0] -= amt
+                        if row.acct_type in ('Loan','Credit'):
+                            bal[1] = add(bal[1],amt)
+                else:
+                    posted = row.acct_type in self.payTypes
+                    if posted:
+                        bal[0],bal[1] = add(bal[0],amt),add(bal[1],-amt)
+            
+            if posted:
+                params[op].append({'acct': acctno,'amt': amt})
+                entries.append({'acct_no': acctno,'txn_type': op,'amount': amt,'available_bal': bal[0],
+                                'remaining_bal': bal[1],'txn_ts': txn_ts})
+                chunk_results.append(postingResult(line,acctno,op,amt,True,"Posted"))
+            else:
+                chunk_results.append(postingResult(line,acctno,op,amt,False,self._batchRejection(op)))
+        
+        # Deposits and payments only raise available_bal, so withdrawals
+        # run after them still pass the guard they passed in the plan
+        for op in ('deposit','pay','withdraw'):
+            if params[op] and db_engine.execute(statements[op],params[op]).rowcount != len(params[op]):
+                return None
+        
+        changed = {entry['acct_no'] for entry in entries}
+        for acctno,row in self._readAccounts(db_engine,accounts_stmt,changed).items():
+            if [row.available_bal,row.remaining_bal] != balances[acctno]:
+                return None
+        
+        if entries:
+            db_engine.execute(insert(ledger),entries)
+        return chunk_results,changed
+    
+    @bankMetrics.timed
+    def postBatch(self,records,chunk_size = 1000) -> dict:
+        """
+        Post a batch of deposits, withdrawals and payments. Records are
+        grouped into chunks and each chunk is posted in one transaction;
+        if a chunk fails at the database level it is rolled back and all
+        of its records are reported as failed.
+        A chunk reads its accounts in one statement and decides every
+        record on those rows, in input order, as the guarded updates
+        would; the postings then run as one executemany per statement
+        and one for the ledger. The rowcounts and the balances read back
+        check the plan, and a chunk whose accounts were changed by
+        another connection meanwhile is rolled back and posted again
+        record by record, where the rowcount of each update tells
+        whether its record was posted. Chunks with account numbers that
+        are not integers, and databases whose driver does not report
+        executemany rowcounts, are always posted record by record.
+        Parameters
+        ----------
+        records : iterable
+            (acct_no, op, amount) tuples, op is deposit/withdraw/pay
+        chunk_size : int
+            number of records posted per transaction
+        Returns
+        -------
+        dict
+            results - list of postingResult, one per record in input order
+            posted, failed - record counts
+            elapsed - seconds spent posting
+            postings_per_sec - throughput of the batch
+        """
+        
+        self.log.logTransaction("Open postBatch")
+        
+        if chunk_size <= 0:
+            raise ValueError("chunk_size must be positive")
+        
+        results = []
+        posted = 0
+        start = time.perf_counter()
+        records = enumerate(records,1)
+        
+        with self.db.db_connect(dbUrl) as db_engine:
+            cust_accounts = bankSchema.table('cust_accounts', db_engine)
+            ledger = bankSchema.table('transactions', db_engine)
+            statements = self._batchStatements(cust_accounts)
+            ledger_entry = self._batchLedger(cust_accounts,ledger)
+            accounts_stmt = self._batchAccounts(cust_accounts)
+            grouped = db_engine.dialect.supports_sane_multi_rowcount
+            # Compile each statement once for the whole batch
+            db_engine = db_engine.execution_options(compiled_cache={})
+            
+            while True:
+                chunk = list(islice(records,chunk_size))
+                if not chunk:
+                    break
+                
+                try:
+                    planned = None
+                    if grouped and all(type(acctno) is int for line,(acctno,op,amt) in chunk):
+                        with db_engine.begin() as txn:
+                            planned = self._postGrouped(db_engine,statements,accounts_stmt,ledger,chunk)
+                            if planned is None:
+                                txn.rollback()
+                    if planned is None:
+                        with db_engine.begin():
+                            planned = self._postRows(db_engine,statements,ledger_entry,chunk)
+                    chunk_results,changed = planned
+                except SQLAlchemyError as e:
+                    self.log.logTransaction("Exception: postBatch chunk rolled back - " + str(e))
+                    chunk_results = [postingResult(line,acctno,op,amt,False,"Error: Chunk rolled back")
+                                     for line,(acctno,op,amt) in chunk]
+                    changed = set()
+                
+                for acctno in changed:
+                    self.cache.invalidate(acctno)
+                
+                posted += sum(1 for rslt in chunk_results if rslt.success)
+                results.extend(chunk_results)
+        
+        elapsed = time.perf_counter() - start
+        summary = {'results': results,
+                   'posted': posted,
+                   'failed': len(results) - posted,
+                   'elapsed': elapsed,
+                   'postings_per_sec': len(results) / elapsed if elapsed > 0 else 0.0}
+        
+        self.log.logTransaction("Close postBatch: {cnt} records, {rate:.0f} postings/sec".format(
+                                cnt = len(results),rate = summary['postings_per_sec']))
+        return summary
@@ -0,0 +1,199 @@
+from sqlalchemy import select,insert,update,and_,func
+from datetime import datetime
+import time
+
+from .database import bankDatabase,bankSchema,dbUrl
+from .errors import ValidationError
+from .ids import bankIdAllocator
+from .logs import bankTransactionLog
+from .metrics import bankMetrics
+from .sessions import bankSession
+
+class bankUser:
+    def __init__(self,id_allocator = None,notify = print):
+        self.db =  bankDatabase()
+        self.log = bankTransactionLog()
+        # Receives the messages meant for the user, print for the menu
+        self.notify = notify
+        self.idAllocator = id_allocator or bankIdAllocator.forName('user')
+    
+    def checkNewUser(self,f_name,l_name,u_type,dsgnation):
+        if len(f_name) <= 0:
+            raise ValidationError("Validation Error: First name is empty")
+        elif len(l_name) <= 0:
+            raise ValidationError("Validation Error: Last name is empty")
+        elif u_type not in ('E','C'):
+            raise ValidationError("Validation Error: Invalid user type")
+        elif u_type == 'E' and (len(str(dsgnation)) <= 0 or dsgnation is None):
+            raise ValidationError("Validation Error: For User Employee designation is required")
+    
+    def newUserStmt(self,user,u_id,f_name,l_name,u_type,dsgnation):
+        formatted_date = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        
+        if u_type != 'E':
+            dsgnation = None
+        return insert(user).values(user_id = u_id,user_type = u_type,user_create_dt = formatted_date,
+                                   first_name=f_name,last_name=l_name,designation=dsgnation,status='ACTIVE')
+    
+    def checkLogin(self,u_id,f_name):
+        if len(str(u_id)) <= 0:
+            raise ValidationError("Validation Error: User ID is required.")
+        if len(str(f_name)) <= 0 or f_name is None:
+            raise ValidationError("Validation Error:First name is required.")
+    
+    def authQuery(self,user,u_id,u_type,f_name):
+        stmt = select([user])
+        return stmt.where( and_(user.columns.user_id == u_id, 
+                                func.lower(user.columns.first_name) == f_name.lower(),
+                                user.columns.user_type == u_type,
+                                user.columns.status == 'ACTIVE') 
+                         )
+    
+    def sessionAccountsQuery(self,cust_accounts,u_id):
+        stmt = select([cust_accounts.columns.acct_no,cust_accounts.columns.acct_type])
+        return stmt.where( and_(cust_accounts.columns.user_id == u_id,
+                                cust_accounts.columns.acct_sts == 'ACTIVE')
+                         )
+    
+    def issueSession(self,u_id,u_type,accounts) -> str:
+        return bankSession.issue(int(u_id),u_type,{row.acct_no: row.acct_type for row in accounts})
+        
+    @bankMetrics.timed
+    def createUser(self,f_name,l_name,u_type,dsgnation = None)->int:
+        """
+        Creates a unique user id for employee or customer
+        Parameters
+        ----------
+        f_name : string
+            First name.
+        lastname : string
+            Last name
+        u_type : string
+            user type - E for employee and C for customer
+        dsgnation : string
+            designation - expected only for employee
+        Returns
+        -------
+        int
+            user id if successful, -1 otherwise
+        """
+        
+        self.log.logTransaction("Open createUser")
+
+        try:    
+            # Validate input arguments
+            self.checkNewUser(f_name,l_name,u_type,dsgnation)
+            
+            with self.db.db_connect(dbUrl) as db_engine:
+                user = bankSchema.table('user', db_engine)
+                
+                # Insert the user under a unique user id
+                def insert_user(u_id):
+                    stmt = self.newUserStmt(user,u_id,f_name,l_name,u_type,dsgnation)
+                    return db_engine.execute(stmt).rowcount
+                u_id,row_cnt = self.idAllocator.insertWithId(insert_user)
+                
+            # If insert into user id is successful 
+            if row_cnt == 1:
+                self.log.logTransaction('Close createUser')                
+                return u_id
+            else:
+                raise ValidationError("Account creation Failed")
+            
+        except ValidationError as e:
+            self.log.logTransaction('Exception: CreateUser')
+            self.notify(e.message)
+            return -1
+        
+    @bankMetrics.timed
+    def authenticateUser(self,u_id,u_type,f_name):
+        """
+        Authenticates a user id based on user id and first name values
+        and issues a session token for the following operations
+        Parameters
+        ----------
+        u_id : int
+            user id
+        u_type : string
+            user type - E for employee and C for customer
+        f_name : string
+            first name
+        Returns
+        -------
+        string
+            signed session token (see bankSession) if successful, False otherwise
+        """
+
+        self.log.logTransaction("Open authenticateUser")    
+
+        try:
+            self.checkLogin(u_id,f_name)
+                
+            user_cnt = -1
+        
+            with self.db.db_connect(dbUrl) as db_engine:
+            
+                # Check if the user id doesn't exist
+                user = bankSchema.table('user', db_engine)
+            
+                result = db_engine.execute(self.authQuery(user,u_id,u_type,f_name)).fetchall()
+                
+                user_cnt = len(result)
+                
+                if user_cnt == 1:
+                    # Accounts the session may use without another lookup
+                    cust_accounts = bankSchema.table('cust_accounts', db_engine)
+                    accounts = db_engine.execute(self.sessionAccountsQuery(cust_accounts,u_id)).fetchall()
+                    
+                    self.log.logTransaction("Close authenticateUser")                     
+                    return self.issueSession(u_id,u_type,accounts)
+                else:
+                    raise ValidationError("Authentication Error: User ID is not valid")
+            
+        except ValidationError as e:
+            self.log.logTransaction("Exception: authenticateUser")  
+            self.notify(e.message)
+            return False
+    
+    @bankMetrics.timed
+    def setStatus(self,u_id,status) -> bool:
+        """
+        Changes the status of a user (ACTIVE, INACTIVE, ...) and revokes
+        the session tokens issued to the user, in every process
+        Parameters
+        ----------
+        u_id : int
+            user id
+        status : string
+            new status
+        Returns
+        -------
+        bool
+            True if successful, False otherwise
+        """
+        
+        self.log.logTransaction("Open setStatus")
+        
+        try:
+            with self.db.db_connect(dbUrl) as db_engine:
+                user = bankSchema.table('user', db_engine)
+                revocations = bankSchema.table('session_revocations', db_engine)
+                stmt = update(user).where(user.columns.user_id == u_id).values(status = status)
+                revoked_at = time.time()
+                with db_engine.begin():
+                    row_cnt = db_engine.execute(stmt).rowcount
+                    if row_cnt == 1:
+                        for revoke in bankSession.revokeStatements(revocations,int(u_id),revoked_at):
+                            db_engine.execute(revoke)
+            
+            if row_cnt == 1:
+                bankSession.revoke(u_id,revoked_at)
+                self.log.logTransaction("Close setStatus")
+                return True
+            else:
+                raise ValidationError("Error: User ID not found")
+        
+        except ValidationError as e:
+            self.log.logTransaction("Exception: setStatus")
+            self.notify(e.message)
+            return False
@@ -0,0 +1,279 @@
+from sqlalchemy.exc import SQLAlchemyError
+from concurrent.futures import Future
+import hashlib
+import itertools
+import multiprocessing
+import os
+import queue
+import threading
+import time
+
+from .backends import bankMemoryBackend
+from .database import bankDatabase
+from .logs import bankTransactionLog
+from .transactions import bankTransactions,postingResult
+
+def _work(index,db_url,profile,shards,chunk_size,inbox,outbox):
+    # Entry point of a worker process: posts the records of its inbox in
+    # arrival order and sends (worker, seconds busy, [(seq, result)])
+    # back after each chunk. Each process writes its own log file, the
+    # rotation of a shared file is not safe across processes.
+    root,ext = os.path.splitext(bankTransactionLog.logFile)
+    bankTransactionLog.logFile = '{root}.worker-{n}{ext}'.format(root = root,n = index,ext = ext)
+    bankDatabase.configureBackend(db_url)
+    bankDatabase.configureProfile(profile)
+    bankDatabase.configurePool(pool_size=1,max_overflow=0)
+
+    trans = bankTransactions(notify=lambda message: None)
+    router = None
+    if shards:
+        from .shards import bankShardRouter
+        router = bankShardRouter(shards,notify=lambda message: None)
+
+    def post(batch):
+        # Records of one shard keep their order, so do those of an account
+        groups = {}
+        for seq,record in batch:
+            shard = router.shardOf(record[0]) if router else None
+            groups.setdefault(shard,[]).append((seq,record))
+
+        results = []
+        for shard,group in groups.items():
+            records = [record for seq,record in group]
+            try:
+                with bankDatabase.route(shard):
+                    posted = trans.postBatch(records,chunk_size)['results']
+            except SQLAlchemyError as e:
+                trans.log.logTransaction("Exception: worker {n} chunk failed - {e}".format(n = index,e = e))
+                posted = [postingResult(line,acctno,op,amt,False,"Error: Chunk rolled back")
+                          for line,(acctno,op,amt) in enumerate(records,1)]
+            results += [(seq,result._replace(line = seq)) for (seq,record),result in zip(group,posted)]
+        return results
+
+    running = True
+    while running:
+        batch = [inbox.get()]
+        while len(batch) < chunk_size:
+            try:
+                batch.append(inbox.get_nowait())
+            except queue.Empty:
+                break
+        if None in batch:
+            running = False
+            batch = batch[:batch.index(None)]
+        if batch:
+            start = time.perf_counter()
+            results = post(batch)
+            outbox.put((index,time.perf_counter() - start,results))
+
+    if router is not None:
+        router.close()
+    bankDatabase.disposeEngine()
+    bankTransactionLog.shutdown()
+
+class bankWorkerPool:
+
+    def __init__(self,processes = None,db_url = None,shards = None,chunk_size = 100,
+                 queue_size = 10000):
+        """
+        Posts deposits, withdrawals and payments on worker processes, so
+        the validation, formatting and logging of postings run on every
+        core. Operations are partitioned by acct_no: all operations on an
+        account go to the same worker and are posted in the order they
+        were submitted. Each worker runs bankTransactions.postBatch over
+        what has queued up, at most chunk_size records per transaction,
+        with one pooled connection (one per shard with shards).
+        Parameters
+        ----------
+        processes : int
+            worker processes, one per CPU by default
+        db_url : string
+            database URL the workers open, the URL of the configured
+            backend by default; an in-memory database cannot be shared
+        shards : list
+            shard URLs or SQLite file paths to post through, see
+            bankShardRouter
+        chunk_size : int
+            records posted per transaction by a worker
+        queue_size : int
+            records waiting per worker before submit blocks
+        """
+        if db_url is None:
+            backend = bankDatabase.homeBackend()
+            if isinstance(backend,bankMemoryBackend):
+                raise ValueError("Worker processes cannot open an in-memory database")
+            db_url = backend.url
+        if chunk_size <= 0:
+            raise ValueError("chunk_size must be positive")
+
+        self.processes = processes or os.cpu_count() or 1
+        context = multiprocessing.get_context('spawn')
+        self._outbox = context.Queue()
+        self._sequence = itertools.count(1)
+        self._closed = False
+        self._closeLock = threading.Lock()
+        self._workers = []
+        for index in range(self.processes):
+            inbox = context.Queue(maxsize=queue_size)
+            process = context.Process(target=_work,name='bank-worker-{n}'.format(n = index),daemon=True,
+                                      args=(index,db_url,bankDatabase.profile,list(shards or ()),
+                                            chunk_size,inbox,self._outbox))
+            process.start()
+            self._workers.append({'process': process,'inbox': inbox,'lock': threading.Lock(),
+                                  'pending': {},'completed': 0,'posted': 0,'busy': 0.0})
+
+        self._started = time.perf_counter()
+        self._collector = threading.Thread(target=self._collect,name='bankWorkerPool-collector',
+                                           daemon=True)
+        self._collector.start()
+
+    def workerOf(self,acctno) -> int:
+        """
+        Returns the index of the worker posting the operations of acctno;
+        values that are not account numbers go to the first worker, where
+        postBatch rejects them
+        """
+        try:
+            key = int(acctno).to_bytes(8,'big',signed=True)
+        except (TypeError,ValueError,OverflowError):
+            return 0
+        return int.from_bytes(hashlib.blake2b(key,digest_size=8).digest(),'big') % self.processes
+
+    def submit(self,acctno,op,amount) -> Future:
+        """
+        Queue one operation on the worker of acctno; blocks while that
+        worker has queue_size records waiting
+        Parameters
+        ----------
+        acctno : int
+            account number
+        op : string
+            deposit, withdraw or pay
+        amount : int
+            amount posted
+        Returns
+        -------
+        Future
+            resolves to the postingResult of the operation, its line is
+            the sequence number the pool assigned
+        """
+        worker = self._workers[self.workerOf(acctno)]
+        future = Future()
+        # Held across the put so operations on one account enter the
+        # worker's queue in the order their sequence numbers were taken
+        with worker['lock']:
+            if self._closed:
+                raise RuntimeError("bankWorkerPool is closed")
+            seq = next(self._sequence)
+            worker['pending'][seq] = future
+            worker['inbox'].put((seq,(acctno,op,amount)))
+        return future
+
+    def postBatch(self,records) -> dict:
+        """
+        Post a batch of deposits, withdrawals and payments across the
+        workers, see bankTransactions.postBatch
+        Parameters
+        ----------
+        records : iterable
+            (acct_no, op, amount) tuples, op is deposit/withdraw/pay
+        Returns
+        -------
+        dict
+            results - list of postingResult, one per record in input order
+            posted, failed - record counts
+            elapsed - seconds spent posting
+            postings_per_sec - throughput of the batch
+        """
+        start = time.perf_counter()
+        futures = [self.submit(*record) for record in records]
+        results = [future.result()._replace(line = line) for line,future in enumerate(futures,1)]
+
+        elapsed = time.perf_counter() - start
+        posted = sum(1 for rslt in results if rslt.success)
+        return {'results': results,
+                'posted': posted,
+                'failed': len(results) - posted,
+                'elapsed': elapsed,
+                'postings_per_sec': len(results) / elapsed if elapsed > 0 else 0.0}
+
+    def _collect(self):
+        # Resolves the futures of the results the workers send back
+        while True:
+            try:
+                message = self._outbox.get(timeout=0.5)
+            except queue.Empty:
+                self._failExited()
+                continue
+            if message is None:
+                self._failExited()
+                return
+
+            index,busy,results = message
+            worker = self._workers[index]
+            with worker['lock']:
+                futures = [worker['pending'].pop(seq) for seq,result in results]
+                worker['completed'] += len(results)
+                worker['posted'] += sum(1 for seq,result in results if result.success)
+                worker['busy'] += busy
+            for future,(seq,result) in zip(futures,results):
+                future.set_result(result)
+
+    def _failExited(self):
+        # Operations queued on a worker that died are never posted
+        for index,worker in enumerate(self._workers):
+            if worker['process'].is_alive():
+                continue
+            with worker['lock']:
+                pending,worker['pending'] = worker['pending'],{}
+            for future in pending.values():
+                future.set_exception(RuntimeError("Worker {n} exited with code {code}".format(
+                                     n = index,code = worker['process'].exitcode)))
+
+    def stats(self) -> list:
+        """
+        Returns a dict per worker
+            worker, pid, alive
+            queued - operations submitted and not yet posted
+            completed, posted, failed - operations done
+            busy - seconds spent posting
+            postings_per_sec - operations done per second since the pool started
+        """
+        elapsed = time.perf_counter() - self._started
+        stats = []
+        for index,worker in enumerate(self._workers):
+            with worker['lock']:
+                stats.append({'worker': index,
+                              'pid': worker['process'].pid,
+                              'alive': worker['process'].is_alive(),
+                              'queued': len(worker['pending']),
+                              'completed': worker['completed'],
+                              'posted': worker['posted'],
+                              'failed': worker['completed'] - worker['posted'],
+                              'busy': worker['busy'],
+                              'postings_per_sec': worker['completed'] / elapsed if elapsed > 0 else 0.0})
+        return stats
+
+    def close(self):
+        """
+        Post what is queued, then stop the workers
+        """
+        with self._closeLock:
+            if self._closed:
+                return
+            for worker in self._workers:
+                # A submit holding the lock finishes its put first, later
+                # ones see the pool closed
+                with worker['lock']:
+                    self._closed = True
+                    worker['inbox'].put(None)
+        for worker in self._workers:
+            worker['process'].join()
+        self._outbox.put(None)
+        self._collector.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self,*exc):
+        self.close()
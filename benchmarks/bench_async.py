@@ -0,0 +1,127 @@
+"""
+Compares concurrent throughput of the sync classes driven from threads
+against the asyncio classes driven from tasks on one event loop, with a
+mix of balance reads and deposits on a temporary copy of
+BankingSystem-DB.db. Needs SQLAlchemy 1.4+ and aiosqlite.
+
+    python benchmarks/bench_async.py [--concurrency 16] [--duration 5] [--write-ratio 0.2]
+"""
+import argparse
+import asyncio
+import os
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0,ROOT)
+
+
+def load_bank(db_path):
+    import bankingsystem
+    import bankingsystem.database
+
+    bankingsystem.database.dbUrl = 'sqlite:///' + db_path
+    return bankingsystem
+
+
+def quiet(message):
+    pass
+
+
+def report(label,latencies,elapsed):
+    latencies.sort()
+    print("{label:>6}: {n:>7} ops  {r:>8.0f} ops/sec  p50 {p50:.2f} ms  p99 {p99:.2f} ms  mean {mean:.2f} ms".format(
+          label = label,n = len(latencies),r = len(latencies) / elapsed,
+          p50 = latencies[len(latencies) // 2] * 1000,
+          p99 = latencies[int(len(latencies) * 0.99)] * 1000,
+          mean = statistics.mean(latencies) * 1000))
+
+
+def run_sync(bank,accounts,args):
+    trans = bank.bankTransactions(notify=quiet)
+    latencies = []
+    deadline = time.perf_counter() + args.duration
+
+    def worker():
+        while time.perf_counter() < deadline:
+            u_id,acct_no = random.choice(accounts)
+            start = time.perf_counter()
+            if random.random() < args.write_ratio:
+                trans.depositAmt(u_id,acct_no,1)
+            else:
+                trans.getBalance(u_id,acct_no)
+            latencies.append(time.perf_counter() - start)
+
+    threads = [threading.Thread(target=worker) for _ in range(args.concurrency)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return latencies,time.perf_counter() - start
+
+
+async def run_async(bank,accounts,args):
+    trans = bank.bankAsyncTransactions(notify=quiet)
+    latencies = []
+    deadline = time.perf_counter() + args.duration
+
+    async def worker():
+        while time.perf_counter() < deadline:
+            u_id,acct_no = random.choice(accounts)
+            start = time.perf_counter()
+            if random.random() < args.write_ratio:
+                await trans.depositAmt(u_id,acct_no,1)
+            else:
+                await trans.getBalance(u_id,acct_no)
+            latencies.append(time.perf_counter() - start)
+
+    try:
+        # Warm the pool and the schema cache outside the timed window
+        await trans.getBalance(*accounts[0])
+        start = time.perf_counter()
+        await asyncio.gather(*[worker() for _ in range(args.concurrency)])
+        return latencies,time.perf_counter() - start
+    finally:
+        await bank.bankAsyncDatabase.disposeEngine()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--concurrency',type=int,default=16,help='threads / tasks')
+    parser.add_argument('--duration',type=float,default=5.0,help='seconds per run')
+    parser.add_argument('--accounts',type=int,default=50)
+    parser.add_argument('--write-ratio',type=float,default=0.2)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp()
+    cwd = os.getcwd()
+    os.chdir(workdir)
+    try:
+        db_path = os.path.join(workdir,'bench.db')
+        shutil.copy(os.path.join(ROOT,'BankingSystem-DB.db'),db_path)
+        bank = load_bank(db_path)
+        bank.bankDatabase.configurePool(pool_size=args.concurrency)
+
+        users = bank.bankUser(notify=quiet)
+        accts = bank.bankAccounts(notify=quiet)
+        accounts = []
+        for i in range(args.accounts):
+            u_id = users.createUser('bench',str(i),'C')
+            accounts.append((u_id,accts.addAccount(u_id,'bench','Checking',100)))
+
+        print("concurrency: {c}, write ratio: {w}".format(c = args.concurrency,w = args.write_ratio))
+        report('sync',*run_sync(bank,accounts,args))
+        report('async',*asyncio.run(run_async(bank,accounts,args)))
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(workdir,ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
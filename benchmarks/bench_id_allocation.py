@@ -0,0 +1,98 @@
+"""
+Compares user id allocation latency as the id range fills up: the
+original randint + SELECT probe loop against bankIdAllocator.
+
+    python benchmarks/bench_id_allocation.py [--size 20000] [--fill 0.9]
+"""
+import argparse
+import os
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+from sqlalchemy import select,insert
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0,ROOT)
+
+
+def load_bank(db_path):
+    import bankingsystem
+    import bankingsystem.database
+    
+    bankingsystem.database.dbUrl = 'sqlite:///' + db_path
+    return bankingsystem
+
+
+def fresh_db(workdir):
+    db_path = os.path.join(workdir,'bench.db')
+    shutil.copy(os.path.join(ROOT,'BankingSystem-DB.db'),db_path)
+    return db_path
+
+
+def run(bank,size,fill,allocate):
+    db = bank.bankDatabase()
+    buckets = [[] for _ in range(10)]
+    probes = [[] for _ in range(10)]
+    
+    with db.db_connect(None) as conn:
+        user = bank.bankSchema.table('user',conn)
+        conn.execute(user.delete())
+        
+        for i in range(int(size * fill)):
+            start = time.perf_counter()
+            u_id,n_probes = allocate(conn,user)
+            conn.execute(insert(user).values(user_id = u_id,user_type = 'C',first_name = 'b',
+                                             last_name = 'b',status = 'ACTIVE'))
+            bucket = i * 10 // size
+            buckets[bucket].append(time.perf_counter() - start)
+            probes[bucket].append(n_probes)
+    return buckets,probes
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--size',type=int,default=20000,help='size of the id range')
+    parser.add_argument('--fill',type=float,default=0.9,help='final table occupancy')
+    args = parser.parse_args()
+    
+    workdir = tempfile.mkdtemp()
+    os.chdir(workdir)
+    try:
+        bank = load_bank(fresh_db(workdir))
+        
+        def legacy(conn,user):
+            n_probes = 0
+            while True:
+                n_probes += 1
+                u_id = random.randint(1,args.size)
+                if not conn.execute(select([user.columns.user_id]).where(user.columns.user_id == u_id)).fetchall():
+                    return u_id,n_probes
+        
+        allocator = bank.bankIdAllocator('bench_user',1,args.size)
+        
+        def feistel(conn,user):
+            return allocator.allocate(),0
+        
+        legacy_lat,legacy_probes = run(bank,args.size,args.fill,legacy)
+        alloc_lat,_ = run(bank,args.size,args.fill,feistel)
+        
+        print("{:>10} {:>14} {:>14} {:>16}".format('occupancy','randint us','probes/id','allocator us'))
+        for bucket in range(10):
+            if not legacy_lat[bucket]:
+                continue
+            print("{:>10} {:>14.1f} {:>14.2f} {:>16.1f}".format(
+                  '{}-{}%'.format(bucket * 10,bucket * 10 + 10),
+                  statistics.mean(legacy_lat[bucket]) * 1e6,
+                  statistics.mean(legacy_probes[bucket]),
+                  statistics.mean(alloc_lat[bucket]) * 1e6))
+    finally:
+        os.chdir(ROOT)
+        shutil.rmtree(workdir,ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
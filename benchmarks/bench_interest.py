@@ -0,0 +1,70 @@
+"""
+Times the interest and fee job over a large number of generated accounts
+on a temporary copy of BankingSystem-DB.db. Needs NumPy.
+
+    python benchmarks/bench_interest.py [--accounts 1000000] [--chunk-size 10000]
+"""
+import argparse
+import os
+import random
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0,ROOT)
+
+
+def load_bank(db_path):
+    import bankingsystem
+    import bankingsystem.database
+
+    bankingsystem.database.dbUrl = 'sqlite:///' + db_path
+    return bankingsystem
+
+
+def generate(db_path,count):
+    # Rows are inserted directly, addAccount would dominate the run
+    types = ('Checking','Savings','Loan','Credit')
+    with sqlite3.connect(db_path) as conn:
+        conn.executemany("INSERT INTO cust_accounts (user_id, acct_type, available_bal, remaining_bal, acct_no, acct_sts) "
+                         "VALUES (?, ?, ?, ?, ?, 'ACTIVE')",
+                         ((i,types[i % 4],random.randint(0,20000),random.randint(0,20000),10 ** 10 + i)
+                          for i in range(count)))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--accounts',type=int,default=1000000)
+    parser.add_argument('--chunk-size',type=int,default=10000)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp()
+    cwd = os.getcwd()
+    os.chdir(workdir)
+    try:
+        db_path = os.path.join(workdir,'bench.db')
+        shutil.copy(os.path.join(ROOT,'BankingSystem-DB.db'),db_path)
+        bank = load_bank(db_path)
+        # Apply the migrations before the accounts are generated
+        with bank.bankDatabase().db_connect(bank.database.dbUrl) as db_engine:
+            bank.bankSchema.table('cust_accounts',db_engine)
+
+        start = time.perf_counter()
+        generate(db_path,args.accounts)
+        print("generated {n} accounts in {s:.1f}s".format(n = args.accounts,s = time.perf_counter() - start))
+
+        interest = bank.bankInterest()
+        for run_date in ('2026-01-30','2026-01-31'):
+            summary = interest.runAccrual(run_date,args.chunk_size)
+            print("{date}: {accounts} accounts, {interest} interest, {fees} fees, {chunks} chunks "
+                  "in {elapsed:.2f}s ({accounts_per_sec:.0f} accounts/sec)".format(date = run_date,**summary))
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(workdir,ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,119 @@
+"""
+Compares the SQLite tuning profiles of bankDatabase on a mixed load of
+balance reads, deposits and transfers from threads, each profile on a
+fresh temporary copy of BankingSystem-DB.db. Reads bypass the balance
+cache so every operation reaches the database.
+
+    python benchmarks/bench_profiles.py [--profiles driver safe wal tuned] [--concurrency 8] [--duration 5]
+"""
+import argparse
+import os
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+from sqlalchemy.exc import OperationalError
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0,ROOT)
+
+
+def load_bank(db_path):
+    import bankingsystem
+    import bankingsystem.database
+
+    bankingsystem.database.dbUrl = 'sqlite:///' + db_path
+    return bankingsystem
+
+
+def quiet(message):
+    pass
+
+
+def report(label,latencies,errors,elapsed):
+    latencies.sort()
+    print("{label:>7}: {n:>7} ops  {r:>8.0f} ops/sec  p50 {p50:.2f} ms  p99 {p99:.2f} ms  "
+          "mean {mean:.2f} ms  {e} lock errors".format(
+          label = label,n = len(latencies),r = len(latencies) / elapsed,
+          p50 = latencies[len(latencies) // 2] * 1000,
+          p99 = latencies[int(len(latencies) * 0.99)] * 1000,
+          mean = statistics.mean(latencies) * 1000,e = errors))
+
+
+def run_profile(bank,accounts,args):
+    trans = bank.bankTransactions(notify=quiet,balance_cache=bank.bankBalanceCache(ttl=0))
+    latencies = []
+    errors = []
+    deadline = time.perf_counter() + args.duration
+
+    def worker():
+        while time.perf_counter() < deadline:
+            u_id,acct_no = random.choice(accounts)
+            op = random.random()
+            start = time.perf_counter()
+            try:
+                if op < args.transfer_ratio:
+                    trans.transfer(acct_no,random.choice(accounts)[1],1)
+                elif op < args.transfer_ratio + args.write_ratio:
+                    trans.depositAmt(u_id,acct_no,1)
+                else:
+                    trans.getBalance(u_id,acct_no)
+            except OperationalError:
+                # "database is locked": the busy timeout ran out or was never set
+                errors.append(op)
+                continue
+            latencies.append(time.perf_counter() - start)
+
+    threads = [threading.Thread(target=worker) for _ in range(args.concurrency)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return latencies,len(errors),time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--profiles',nargs='+',default=['driver','safe','wal','tuned'])
+    parser.add_argument('--concurrency',type=int,default=8,help='threads')
+    parser.add_argument('--duration',type=float,default=5.0,help='seconds per profile')
+    parser.add_argument('--accounts',type=int,default=50)
+    parser.add_argument('--write-ratio',type=float,default=0.2,help='share of deposits')
+    parser.add_argument('--transfer-ratio',type=float,default=0.1,help='share of transfers')
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp()
+    cwd = os.getcwd()
+    os.chdir(workdir)
+    try:
+        print("concurrency: {c}, deposits: {w}, transfers: {t}".format(
+              c = args.concurrency,w = args.write_ratio,t = args.transfer_ratio))
+        for name in args.profiles:
+            db_path = os.path.join(workdir,name + '.db')
+            shutil.copy(os.path.join(ROOT,'BankingSystem-DB.db'),db_path)
+            bank = load_bank(db_path)
+            bank.bankDatabase.configureProfile(name)
+            bank.bankDatabase.configurePool(pool_size=args.concurrency)
+            bank.bankSchema.invalidate()
+
+            users = bank.bankUser(notify=quiet)
+            accts = bank.bankAccounts(notify=quiet)
+            accounts = []
+            for i in range(args.accounts):
+                u_id = users.createUser('bench',str(i),'C')
+                accounts.append((u_id,accts.addAccount(u_id,'bench','Checking',100)))
+
+            report(name,*run_profile(bank,accounts,args))
+        bank.bankDatabase.disposeEngine()
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(workdir,ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
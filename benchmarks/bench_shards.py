@@ -0,0 +1,116 @@
+"""
+Measures deposit throughput through bankShardRouter as the number of
+shard files grows. For each shard count a fresh temporary copy of
+BankingSystem-DB.db is the home database, accounts are opened across
+new shard files, and worker processes post deposits to random accounts
+for a fixed time. Each process has its own engines, so writers contend
+only for the SQLite file of the account's shard.
+
+    python benchmarks/bench_shards.py [--shards 1 2 4] [--processes 4] [--duration 5]
+"""
+import argparse
+import multiprocessing
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+from sqlalchemy.exc import OperationalError
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0,ROOT)
+
+
+def load_bank(db_path):
+    import bankingsystem
+    import bankingsystem.database
+
+    bankingsystem.database.dbUrl = 'sqlite:///' + db_path
+    return bankingsystem
+
+
+def quiet(message):
+    pass
+
+
+def worker(db_path,shards,accounts,duration,start_at,results):
+    bank = load_bank(db_path)
+    router = bank.bankShardRouter(shards,notify=quiet)
+    # Open the engines of every shard before the clock starts
+    for u_id,acct_no in accounts:
+        router.getBalance(u_id,acct_no)
+
+    while time.time() < start_at:
+        time.sleep(0.001)
+    ops = errors = 0
+    deadline = time.perf_counter() + duration
+    while time.perf_counter() < deadline:
+        u_id,acct_no = random.choice(accounts)
+        try:
+            if router.depositAmt(u_id,acct_no,1):
+                ops += 1
+        except OperationalError:
+            # "database is locked": the busy timeout ran out
+            errors += 1
+    router.close()
+    results.put((ops,errors))
+
+
+def run(workdir,count,args):
+    db_path = os.path.join(workdir,'home-{n}.db'.format(n = count))
+    shutil.copy(os.path.join(ROOT,'BankingSystem-DB.db'),db_path)
+    shards = [os.path.join(workdir,'shard-{n}-{i}.db'.format(n = count,i = i)) for i in range(count)]
+
+    bank = load_bank(db_path)
+    bank.bankSchema.invalidate()
+    router = bank.bankShardRouter(shards,notify=quiet)
+    u_id = bank.bankUser(notify=quiet).createUser('bench','shards','C')
+    accounts = [(u_id,router.addAccount(u_id,'bench','Checking',100)) for _ in range(args.accounts)]
+    router.close()
+
+    context = multiprocessing.get_context('spawn')
+    results = context.Queue()
+    start_at = time.time() + args.warmup
+    processes = [context.Process(target=worker,args=(db_path,shards,accounts,args.duration,
+                                                     start_at,results))
+                 for _ in range(args.processes)]
+    for process in processes:
+        process.start()
+    outcomes = [results.get() for _ in processes]
+    for process in processes:
+        process.join()
+
+    ops = sum(outcome[0] for outcome in outcomes)
+    errors = sum(outcome[1] for outcome in outcomes)
+    return ops / args.duration,errors
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--shards',type=int,nargs='+',default=[1,2,4])
+    parser.add_argument('--processes',type=int,default=4)
+    parser.add_argument('--duration',type=float,default=5.0,help='seconds per shard count')
+    parser.add_argument('--warmup',type=float,default=3.0,help='seconds allowed for the workers to start')
+    parser.add_argument('--accounts',type=int,default=200)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp()
+    cwd = os.getcwd()
+    os.chdir(workdir)
+    try:
+        print("processes: {p}, cpus: {c}".format(p = args.processes,c = os.cpu_count()))
+        baseline = None
+        for count in args.shards:
+            rate,errors = run(workdir,count,args)
+            baseline = baseline or rate
+            print("{n:>2} shards: {r:>8.0f} deposits/sec  x{s:.2f}  {e} lock errors".format(
+                  n = count,r = rate,s = rate / baseline,e = errors))
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(workdir,ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,88 @@
+"""
+Posts the same generated batch of deposits and withdrawals through
+bankTransactions.postBatch in this process and through bankWorkerPool
+with a growing number of worker processes, each run on a fresh
+temporary copy of BankingSystem-DB.db.
+
+    python benchmarks/bench_workers.py [--workers 1 2 4] [--records 20000] [--accounts 200]
+"""
+import argparse
+import os
+import random
+import shutil
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0,ROOT)
+
+
+def load_bank(db_path):
+    import bankingsystem
+    import bankingsystem.database
+
+    bankingsystem.database.dbUrl = 'sqlite:///' + db_path
+    return bankingsystem
+
+
+def quiet(message):
+    pass
+
+
+def prepare(workdir,name,args):
+    db_path = os.path.join(workdir,name + '.db')
+    shutil.copy(os.path.join(ROOT,'BankingSystem-DB.db'),db_path)
+    bank = load_bank(db_path)
+    bank.bankDatabase.disposeEngine()
+    bank.bankSchema.invalidate()
+
+    u_id = bank.bankUser(notify=quiet).createUser('bench','workers','C')
+    accts = bank.bankAccounts(notify=quiet)
+    accounts = [accts.addAccount(u_id,'bench','Checking',1000) for _ in range(args.accounts)]
+    rng = random.Random(args.seed)
+    records = [(rng.choice(accounts),'deposit' if rng.random() < 0.7 else 'withdraw',rng.randint(1,100))
+               for _ in range(args.records)]
+    return bank,records
+
+
+def report(label,summary):
+    print("{label:>10}: {n:>7} records  {r:>8.0f} postings/sec  {f} failed".format(
+          label = label,n = len(summary['results']),r = summary['postings_per_sec'],
+          f = summary['failed']))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--workers',type=int,nargs='+',default=[1,2,4])
+    parser.add_argument('--records',type=int,default=20000)
+    parser.add_argument('--accounts',type=int,default=200)
+    parser.add_argument('--chunk-size',type=int,default=100,help='records per worker transaction')
+    parser.add_argument('--seed',type=int,default=1)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp()
+    cwd = os.getcwd()
+    os.chdir(workdir)
+    try:
+        print("cpus: {c}".format(c = os.cpu_count()))
+        bank,records = prepare(workdir,'inline',args)
+        report('inline',bank.bankTransactions(notify=quiet).postBatch(records,args.chunk_size))
+
+        for count in args.workers:
+            bank,records = prepare(workdir,'workers-{n}'.format(n = count),args)
+            bank.bankDatabase.disposeEngine()
+            with bank.bankWorkerPool(processes=count,chunk_size=args.chunk_size) as pool:
+                # Let the workers start before the clock does
+                pool.postBatch(records[:count])
+                report('{n} workers'.format(n = count),pool.postBatch(records[count:]))
+                for stats in pool.stats():
+                    print("            worker {worker}: {completed} done, {queued} queued, "
+                          "{postings_per_sec:.0f} postings/sec, {busy:.2f}s busy".format(**stats))
+        bank.bankDatabase.disposeEngine()
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(workdir,ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,119 @@
+"""
+Load test for the HTTP/JSON service: starts bankService in-process on a
+temporary copy of BankingSystem-DB.db and drives it from concurrent
+keep-alive clients with a mix of balance reads and deposits.
+
+    python benchmarks/load_test_service.py [--clients 16] [--duration 10] [--write-ratio 0.2]
+"""
+import argparse
+import http.client
+import json
+import os
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0,ROOT)
+
+
+def load_bank(db_path):
+    import bankingsystem
+    import bankingsystem.database
+    
+    bankingsystem.database.dbUrl = 'sqlite:///' + db_path
+    return bankingsystem
+
+
+def call(conn,method,path,body = None,token = None):
+    data = json.dumps(body).encode() if body is not None else None
+    headers = {'Content-Type': 'application/json'} if data else {}
+    if token is not None:
+        headers['Authorization'] = 'Bearer ' + token
+    conn.request(method,path,body=data,headers=headers)
+    response = conn.getresponse()
+    return response.status,json.loads(response.read())
+
+
+def client(address,accounts,write_ratio,deadline,latencies,errors):
+    conn = http.client.HTTPConnection(*address)
+    while time.perf_counter() < deadline:
+        token,acct_no = random.choice(accounts)
+        start = time.perf_counter()
+        if random.random() < write_ratio:
+            status,_ = call(conn,'POST','/deposit',{'acct_no': acct_no,'amount': 1},token)
+        else:
+            status,_ = call(conn,'GET','/balance?acct_no={a}'.format(a = acct_no),token=token)
+        latencies.append(time.perf_counter() - start)
+        if status != 200:
+            errors.append(status)
+    conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--clients',type=int,default=16)
+    parser.add_argument('--duration',type=float,default=10.0,help='seconds')
+    parser.add_argument('--accounts',type=int,default=50)
+    parser.add_argument('--write-ratio',type=float,default=0.2)
+    args = parser.parse_args()
+    
+    workdir = tempfile.mkdtemp()
+    cwd = os.getcwd()
+    os.chdir(workdir)
+    try:
+        db_path = os.path.join(workdir,'load.db')
+        shutil.copy(os.path.join(ROOT,'BankingSystem-DB.db'),db_path)
+        bank = load_bank(db_path)
+        bank.bankDatabase.configurePool(pool_size=args.clients)
+        
+        service = bank.bankService(port=0)
+        service.start()
+        
+        conn = http.client.HTTPConnection(*service.address)
+        accounts = []
+        for i in range(args.accounts):
+            _,user = call(conn,'POST','/users',{'first_name': 'load','last_name': str(i),'user_type': 'C'})
+            login = {'user_id': user['user_id'],'user_type': 'C','first_name': 'load'}
+            _,session = call(conn,'POST','/login',login)
+            _,acct = call(conn,'POST','/accounts',{'first_name': 'load','acct_type': 'Checking',
+                                                   'amount': 100},session['token'])
+            # Log in again so the token carries the new account
+            _,session = call(conn,'POST','/login',login)
+            accounts.append((session['token'],acct['acct_no']))
+        conn.close()
+        
+        latencies = []
+        errors = []
+        deadline = time.perf_counter() + args.duration
+        threads = [threading.Thread(target=client,args=(service.address,accounts,args.write_ratio,
+                                                        deadline,latencies,errors))
+                   for _ in range(args.clients)]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+        service.shutdown()
+        
+        latencies.sort()
+        print("clients: {c}, requests: {n}, errors: {e}".format(c = args.clients,n = len(latencies),
+                                                                 e = len(errors)))
+        print("throughput: {r:.0f} requests/sec".format(r = len(latencies) / elapsed))
+        print("latency ms: p50 {p50:.2f}  p95 {p95:.2f}  p99 {p99:.2f}  mean {mean:.2f}".format(
+              p50 = latencies[len(latencies) // 2] * 1000,
+              p95 = latencies[int(len(latencies) * 0.95)] * 1000,
+              p99 = latencies[int(len(latencies) * 0.99)] * 1000,
+              mean = statistics.mean(latencies) * 1000))
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(workdir,ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
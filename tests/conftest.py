@@ -0,0 +1,47 @@
+import os
+import shutil
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0,ROOT)
+
+
+def quiet(message):
+    pass
+
+
+@pytest.fixture
+def bank(tmp_path,monkeypatch):
+    """
+    The bankingsystem package on a fresh copy of BankingSystem-DB.db
+    """
+    import bankingsystem
+    import bankingsystem.database
+
+    db_path = str(tmp_path / 'bank.db')
+    shutil.copy(os.path.join(ROOT,'BankingSystem-DB.db'),db_path)
+    monkeypatch.chdir(tmp_path)
+    bankingsystem.bankDatabase.disposeEngine()
+    monkeypatch.setattr(bankingsystem.database,'dbUrl','sqlite:///' + db_path)
+    bankingsystem.bankSchema.invalidate()
+    bankingsystem.bankBalanceCache.shared().clear()
+    monkeypatch.setattr(bankingsystem.bankSession,'_revoked',{})
+    monkeypatch.setattr(bankingsystem.bankSession,'_revokedUntil',0.0)
+    yield bankingsystem
+    bankingsystem.bankDatabase.disposeEngine()
+    bankingsystem.bankSchema.invalidate()
+    bankingsystem.bankBalanceCache.shared().clear()
+
+
+@pytest.fixture
+def customer(bank):
+    """
+    A customer named test with a Checking and a Credit account
+    """
+    u_id = bank.bankUser(notify=quiet).createUser('test','customer','C')
+    accounts = bank.bankAccounts(notify=quiet)
+    checking = accounts.addAccount(u_id,'test','Checking',100)
+    credit = accounts.addAccount(u_id,'test','Credit',500)
+    return u_id,checking,credit
@@ -0,0 +1,76 @@
+import asyncio
+import sqlite3
+
+import pytest
+
+from conftest import quiet
+
+pytest.importorskip('sqlalchemy.ext.asyncio')
+pytest.importorskip('aiosqlite')
+
+
+def run(bank,coro):
+    # One event loop per test; the async engine is bound to it
+    async def main():
+        try:
+            return await coro
+        finally:
+            await bank.bankAsyncDatabase.disposeEngine()
+    return asyncio.run(main())
+
+
+def history(tmp_path,acct_no):
+    with sqlite3.connect(str(tmp_path / 'bank.db')) as conn:
+        return conn.execute("SELECT txn_type,amount,available_bal,remaining_bal FROM transactions "
+                            "WHERE acct_no = ? AND txn_type != 'open' ORDER BY txn_id",(acct_no,)).fetchall()
+
+
+def test_async_transactions_match_the_sync_ones(bank,tmp_path,customer):
+    u_id,checking,credit = customer
+    accounts = bank.bankAccounts(notify=quiet)
+    sync_checking = accounts.addAccount(u_id,'test','Checking',100)
+    sync_credit = accounts.addAccount(u_id,'test','Credit',500)
+    messages = []
+    sync_messages = []
+
+    def operations(trans,checking,credit):
+        return [trans.depositAmt(None,checking,50),
+                trans.withdrawAmt(u_id,checking,200),
+                trans.withdrawAmt(u_id,checking,30),
+                trans.withdrawAmt(u_id,credit,100),
+                trans.payBalance(u_id,credit,40),
+                trans.payBalance(u_id,checking,10),
+                trans.transfer(checking,credit,20,u_id)]
+
+    async def gather(trans):
+        return [await operation for operation in operations(trans,checking,credit)]
+
+    results = run(bank,gather(bank.bankAsyncTransactions(notify=messages.append)))
+    expected = operations(bank.bankTransactions(notify=sync_messages.append),sync_checking,sync_credit)
+
+    assert results == expected == [True,False,True,True,True,False,True]
+    assert [m.replace(str(checking),'checking').replace(str(credit),'credit') for m in messages] == \
+           [m.replace(str(sync_checking),'checking').replace(str(sync_credit),'credit') for m in sync_messages]
+    assert history(tmp_path,checking) == history(tmp_path,sync_checking)
+    assert history(tmp_path,credit) == history(tmp_path,sync_credit)
+
+
+def test_async_users_and_sessions(bank,customer):
+    u_id,checking,credit = customer
+    users = bank.bankAsyncUser(notify=quiet)
+    accounts = bank.bankAsyncAccounts(notify=quiet)
+
+    async def operations():
+        new_id = await users.createUser('async','customer','C')
+        acct_no = await accounts.addAccount(new_id,'async','Savings',10)
+        token = await users.authenticateUser(new_id,'C','async')
+        valid = [await accounts.validateSession(token,acct_no,2),
+                 await accounts.validateSession(token,checking,2)]
+        assert await users.setStatus(new_id,'INACTIVE')
+        valid.append(await accounts.validateSession(token,acct_no,2))
+        return new_id,acct_no,valid
+
+    new_id,acct_no,valid = run(bank,operations())
+
+    assert valid == [True,False,False]
+    assert bank.bankTransactions(notify=quiet).readBalance(acct_no).available_bal == 10
@@ -0,0 +1,72 @@
+from conftest import quiet
+from bankingsystem.cache import bankBalanceCache
+
+
+def test_rows_are_served_until_invalidated():
+    cache = bankBalanceCache(max_size=10,ttl=60)
+    assert cache.put(1,'row',cache.generation(1))
+
+    assert cache.get(1) == 'row'
+    cache.invalidate(1)
+    assert cache.get(1) is None
+
+
+def test_a_row_read_before_an_invalidation_is_not_cached():
+    cache = bankBalanceCache(max_size=10,ttl=60)
+    generation = cache.generation(1)
+    cache.invalidate(1)
+
+    assert not cache.put(1,'stale',generation)
+    assert cache.get(1) is None
+    assert cache.put(1,'fresh',cache.generation(1))
+
+
+def test_other_accounts_keep_their_generation():
+    cache = bankBalanceCache(max_size=10,ttl=60)
+    generation = cache.generation(1)
+    cache.invalidate(2)
+
+    assert cache.put(1,'row',generation)
+
+
+def test_clear_and_a_new_epoch_void_every_generation():
+    cache = bankBalanceCache(max_size=1,ttl=60)
+    generation = cache.generation(1)
+    cache.clear()
+    assert not cache.put(1,'row',generation)
+
+    # More counters than 2 * max_size start a new epoch
+    generation = cache.generation(1)
+    for acctno in (2,3,4):
+        cache.invalidate(acctno)
+    assert not cache.put(1,'row',generation)
+
+
+def test_expired_and_least_recently_used_rows_are_dropped():
+    cache = bankBalanceCache(max_size=2,ttl=0)
+    cache.put(1,'row',cache.generation(1))
+    assert cache.get(1) is None
+
+    cache = bankBalanceCache(max_size=2,ttl=60)
+    for acctno in (1,2):
+        cache.put(acctno,acctno,cache.generation(acctno))
+    cache.get(1)
+    cache.put(3,3,cache.generation(3))
+
+    assert (cache.get(1),cache.get(2),cache.get(3)) == (1,None,3)
+    assert cache.getStats()['evictions'] == 1
+
+
+def test_a_read_racing_a_deposit_does_not_cache_the_old_balance(bank,customer,monkeypatch):
+    u_id,checking,credit = customer
+    reader = bank.bankTransactions(notify=quiet)
+    cache_balance = reader.cacheBalance
+
+    def deposit_then_cache(acctno,rslt_amt,generation):
+        # The deposit commits after the reader's query and before its put
+        bank.bankTransactions(notify=quiet).depositAmt(u_id,checking,50)
+        return cache_balance(acctno,rslt_amt,generation)
+    monkeypatch.setattr(reader,'cacheBalance',deposit_then_cache)
+
+    assert reader.readBalance(checking).available_bal == 100
+    assert bank.bankTransactions(notify=quiet).readBalance(checking).available_bal == 150
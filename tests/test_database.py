@@ -0,0 +1,156 @@
+import shutil
+import sqlite3
+import threading
+import time
+
+import pytest
+from sqlalchemy.exc import TimeoutError
+
+from conftest import quiet
+
+
+@pytest.fixture
+def pool_config(bank,monkeypatch):
+    # configurePool updates poolConfig in place, restore the defaults
+    monkeypatch.setattr(bank.bankDatabase,'poolConfig',dict(bank.bankDatabase.poolConfig))
+    bank.bankDatabase.resetPoolStats()
+    yield bank.bankDatabase.poolConfig
+    bank.bankDatabase.disposeEngine()
+
+
+def test_every_instance_shares_one_engine_and_pool(bank,pool_config):
+    first,second = bank.bankDatabase(),bank.bankDatabase()
+
+    for db in (first,second,first):
+        with db.db_connect(bank.database.dbUrl) as db_engine:
+            assert db_engine.engine is bank.bankDatabase.getEngine()
+
+    stats = bank.bankDatabase.getPoolStats()
+    assert (stats['checkouts'],stats['misses'],stats['hits']) == (3,1,2)
+    assert (stats['checkedout'],stats['pooled']) == (0,1)
+    assert (stats['waits'],stats['timeouts']) == (0,0)
+
+
+def test_exhausted_pool_counts_waits_and_timeouts(bank,pool_config):
+    bank.bankDatabase.configurePool(pool_size=1,max_overflow=0,pool_timeout=0.1)
+    db = bank.bankDatabase()
+
+    with db.db_connect(bank.database.dbUrl):
+        stats = bank.bankDatabase.getPoolStats()
+        assert (stats['waits'],stats['checkedout'],stats['pooled']) == (1,1,0)
+        with pytest.raises(TimeoutError):
+            with db.db_connect(bank.database.dbUrl):
+                pass
+
+    stats = bank.bankDatabase.getPoolStats()
+    assert (stats['checkouts'],stats['waits'],stats['timeouts']) == (1,1,1)
+    assert stats['wait_time'] >= 0.1
+    assert stats['checkedout'] == 0
+
+
+def test_tables_are_reflected_once_per_engine(bank,tmp_path,monkeypatch):
+    loads = []
+    load = bank.bankSchema.load.__func__
+    monkeypatch.setattr(bank.bankSchema,'load',classmethod(lambda cls,db_engine: loads.append(db_engine.engine)
+                                                            or load(cls,db_engine)))
+    db = bank.bankDatabase()
+
+    with db.db_connect(bank.database.dbUrl) as db_engine:
+        user = bank.bankSchema.table('user',db_engine)
+        assert bank.bankSchema.table('cust_accounts',db_engine) is bank.bankSchema.table('cust_accounts',db_engine)
+    with db.db_connect(bank.database.dbUrl) as db_engine:
+        assert bank.bankSchema.table('user',db_engine) is user
+    assert len(loads) == 1
+
+    # A new engine on the same database
+    bank.bankDatabase.disposeEngine()
+    with db.db_connect(bank.database.dbUrl) as db_engine:
+        assert bank.bankSchema.table('user',db_engine) is not user
+    assert len(loads) == 2
+
+    # Another database, reached by a new URL
+    other = str(tmp_path / 'other.db')
+    shutil.copy(str(tmp_path / 'bank.db'),other)
+    monkeypatch.setattr(bank.database,'dbUrl','sqlite:///' + other)
+    bank.bankDatabase.disposeEngine()
+    with db.db_connect(bank.database.dbUrl) as db_engine:
+        assert str(db_engine.engine.url) == 'sqlite:///' + other
+        bank.bankSchema.table('user',db_engine)
+        bank.bankSchema.table('user',db_engine)
+    assert len(loads) == 3
+    assert loads[2] is not loads[1]
+
+
+def pragmas(db_engine,*names):
+    return tuple(db_engine.execute('PRAGMA ' + name).scalar() for name in names)
+
+
+@pytest.fixture
+def profile(bank,monkeypatch):
+    # configureProfile sets the class attribute, restore the default
+    monkeypatch.setattr(bank.bankDatabase,'profile',bank.bankDatabase.profile)
+    yield bank.bankDatabase.configureProfile
+    bank.bankDatabase.disposeEngine()
+
+
+def test_tuning_profiles_are_applied_to_new_connections(bank,profile):
+    db = bank.bankDatabase()
+    names = ('journal_mode','synchronous','busy_timeout','cache_size','mmap_size','temp_store')
+
+    profile('tuned')
+    with db.db_connect(bank.database.dbUrl) as db_engine:
+        assert pragmas(db_engine,*names) == ('wal',1,5000,-65536,268435456,2)
+    engine = bank.bankDatabase.getEngine()
+
+    # A new profile drops the engine, so no connection keeps the old one
+    profile('safe')
+    assert bank.bankDatabase.getEngine() is not engine
+    with db.db_connect(bank.database.dbUrl) as db_engine:
+        assert pragmas(db_engine,*names[:3]) == ('delete',2,5000)
+
+    profile('wal')
+    with db.db_connect(bank.database.dbUrl) as db_engine:
+        assert pragmas(db_engine,*names[:4]) == ('wal',1,5000,-2000)
+
+    with pytest.raises(ValueError,match='Unknown tuning profile: fast'):
+        profile('fast')
+    assert bank.bankDatabase.profile == 'wal'
+
+
+def test_writers_wait_for_the_lock_under_the_busy_timeout(bank,tmp_path,profile,customer):
+    u_id,checking,credit = customer
+    profile('tuned')
+    locker = sqlite3.connect(str(tmp_path / 'bank.db'),isolation_level=None,check_same_thread=False)
+    locker.execute('BEGIN IMMEDIATE')
+    release = threading.Timer(0.3,locker.execute,('COMMIT',))
+    release.start()
+    try:
+        start = time.perf_counter()
+        assert bank.bankTransactions(notify=quiet).depositAmt(u_id,checking,10)
+        assert time.perf_counter() - start >= 0.25
+    finally:
+        release.join()
+        locker.close()
+
+
+def test_fixed_statements_are_compiled_once(bank,customer,monkeypatch):
+    u_id,checking,credit = customer
+    monkeypatch.setattr(bank.bankTransactions,'_statements',{})
+    first,second = bank.bankTransactions(notify=quiet),bank.bankTransactions(notify=quiet)
+
+    assert first.depositAmt(u_id,checking,10)
+    statements = dict(bank.bankTransactions._statements)
+    assert second.depositAmt(u_id,checking,10)
+    assert second.withdrawAmt(u_id,checking,10)
+
+    assert all(bank.bankTransactions._statements[key] is stmt for key,stmt in statements.items())
+    assert {name for name,_ in bank.bankTransactions._statements} == {'ledger',('deposit',True),('withdraw',True)}
+
+    with first.db.db_connect(bank.database.dbUrl) as db_engine:
+        cust_accounts = bank.bankSchema.table('cust_accounts',db_engine)
+        statement = first.postingStatement(cust_accounts,'deposit',True)
+        assert statement is second.postingStatement(cust_accounts,'deposit',True)
+        compiled = bank.bankDatabase.compileReturning(db_engine,cust_accounts,*statement,
+                                                      first.balanceColumns(cust_accounts),('deposit',True))
+        assert compiled is bank.bankDatabase.compileReturning(db_engine,cust_accounts,*statement,
+                                                              first.balanceColumns(cust_accounts),('deposit',True))
@@ -0,0 +1,53 @@
+import sqlite3
+
+from conftest import quiet
+from test_ids import import_rows
+
+
+def account(acct_no,user_id = 42,available_bal = 10):
+    return {'user_id': user_id,'acct_type': 'Checking','available_bal': available_bal,
+            'remaining_bal': 0,'acct_no': acct_no,'acct_sts': 'ACTIVE'}
+
+
+def test_rows_whose_key_is_taken_are_skipped_and_reported(bank,tmp_path,customer):
+    u_id,checking,credit = customer
+
+    summary = import_rows(bank,tmp_path,'cust_accounts',[account(700001),
+                                                         account(checking,available_bal = 1),
+                                                         account(700002),
+                                                         account(700001,user_id = 43),
+                                                         account(700003)])
+
+    assert summary == {'rows': 5,'imported': 3,'skipped': [2,4]}
+    trans = bank.bankTransactions(notify=quiet)
+    assert trans.readBalance(checking).available_bal == 100
+    assert trans.readBalance(700001).user_id == 42
+
+    # A replay imports nothing and reports every line
+    summary = import_rows(bank,tmp_path,'cust_accounts',[account(700001),account(700002)])
+    assert summary == {'rows': 2,'imported': 0,'skipped': [1,2]}
+
+
+def shard_accounts(path):
+    with sqlite3.connect(path) as conn:
+        accounts = {row[0] for row in conn.execute("SELECT acct_no FROM cust_accounts")}
+        opened = {row[0] for row in conn.execute("SELECT acct_no FROM transactions WHERE txn_type = 'open'")}
+    return accounts,opened
+
+
+def test_import_puts_accounts_in_their_shard(bank,tmp_path):
+    shards = [str(tmp_path / 'shard-0.db'),str(tmp_path / 'shard-1.db')]
+    acct_nos = list(range(800001,800021))
+    with bank.bankShardRouter(shards,notify=quiet) as router:
+        summary = import_rows(bank,tmp_path,'cust_accounts',[account(acct_no) for acct_no in acct_nos],router)
+        expected = [{acct_no for acct_no in acct_nos if router.shardOf(acct_no) is shard}
+                    for shard in router.shards]
+        # Replaying against the shards skips every row again
+        replay = import_rows(bank,tmp_path,'cust_accounts',[account(acct_no) for acct_no in acct_nos[:3]],router)
+
+    assert summary == {'rows': 20,'imported': 20,'skipped': []}
+    assert replay == {'rows': 3,'imported': 0,'skipped': [1,2,3]}
+    assert all(expected)
+    for path,accounts in zip(shards,expected):
+        assert shard_accounts(path) == (accounts,accounts)
+    assert not shard_accounts(str(tmp_path / 'bank.db'))[0] & set(acct_nos)
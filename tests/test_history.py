@@ -0,0 +1,82 @@
+import sqlite3
+
+import pytest
+
+from conftest import quiet
+
+
+def set_timestamps(tmp_path,acct_no,*txn_ts):
+    # Entries of the account take the given timestamps in txn_id order
+    with sqlite3.connect(str(tmp_path / 'bank.db')) as conn:
+        txn_ids = [row[0] for row in conn.execute("SELECT txn_id FROM transactions WHERE acct_no = ? "
+                                                  "ORDER BY txn_id",(acct_no,))]
+        conn.executemany("UPDATE transactions SET txn_ts = ? WHERE txn_id = ?",zip(txn_ts,txn_ids))
+        return txn_ids
+
+
+def pages(trans,u_id,acct_no,limit):
+    page = trans.getHistory(u_id,acct_no,limit)
+    yield page
+    while page['next'] is not None:
+        page = trans.getHistory(u_id,acct_no,limit,page['next'])
+        yield page
+
+
+def test_the_ledger_records_every_posting_with_its_balances(bank,customer):
+    u_id,checking,credit = customer
+    trans = bank.bankTransactions(notify=quiet)
+
+    assert trans.depositAmt(u_id,checking,40)
+    assert trans.withdrawAmt(u_id,checking,90)
+    assert not trans.withdrawAmt(u_id,checking,90)
+    assert trans.withdrawAmt(u_id,credit,200)
+    assert trans.payBalance(u_id,credit,50)
+
+    entries = [(entry['txn_type'],entry['amount'],entry['available_bal'],entry['remaining_bal'])
+               for entry in trans.getHistory(u_id,checking)['entries']]
+    assert entries == [('withdraw',90,50,0),('deposit',40,140,0),('open',100,100,0)]
+    entries = [(entry['txn_type'],entry['amount'],entry['available_bal'],entry['remaining_bal'])
+               for entry in trans.getHistory(None,credit)['entries']]
+    assert entries == [('pay',50,350,150),('withdraw',200,300,200),('open',500,500,0)]
+
+
+def test_keyset_pages_cover_the_ledger_newest_first(bank,tmp_path,customer):
+    u_id,checking,credit = customer
+    trans = bank.bankTransactions(notify=quiet)
+    for amount in range(1,8):
+        assert trans.depositAmt(u_id,checking,amount)
+    # Entries of the same second are ordered by txn_id
+    txn_ids = set_timestamps(tmp_path,checking,*['2024-01-01 00:00:00'] * 3 + ['2024-01-02 00:00:00'] * 5)
+
+    history = list(pages(trans,u_id,checking,3))
+
+    assert [len(page['entries']) for page in history] == [3,3,2]
+    assert [entry['txn_id'] for page in history for entry in page['entries']] == txn_ids[::-1]
+    assert history[-1]['next'] is None
+    assert history[0]['next'] == '2024-01-02 00:00:00|{txn}'.format(txn = txn_ids[5])
+    # A page of the size of the ledger has no next page
+    assert trans.getHistory(u_id,checking,8)['next'] is None
+
+
+def test_history_is_only_read_by_the_owner(bank,customer):
+    u_id,checking,credit = customer
+    other = bank.bankUser(notify=quiet).createUser('other','customer','C')
+    trans = bank.bankTransactions(notify=quiet)
+
+    assert trans.getHistory(other,checking) is None
+    assert trans.getHistory(u_id,999) is None
+    assert trans.getHistory(None,checking)['acct_no'] == checking
+
+
+@pytest.mark.parametrize('limit,cursor,message',[
+    (0,None,"Error: History page size must be positive"),
+    (-5,None,"Error: History page size must be positive"),
+    (10,'2024-01-01 00:00:00|last',"Error: Invalid history cursor"),
+    (10,'no cursor',"Error: Invalid history cursor"),
+])
+def test_invalid_pages_are_rejected(bank,customer,limit,cursor,message):
+    u_id,checking,credit = customer
+
+    with pytest.raises(bank.ValidationError) as error:
+        bank.bankTransactions(notify=quiet).getHistory(u_id,checking,limit,cursor)
+    assert error.value.message == message
@@ -0,0 +1,138 @@
+import csv
+import sqlite3
+import threading
+
+import pytest
+
+from conftest import quiet
+
+
+def test_permute_is_a_bijection_of_the_range(bank):
+    allocator = bank.bankIdAllocator('test',500,1499)
+    allocator._key = b'k' * 16
+
+    ids = [allocator.permute(counter) for counter in range(1000)]
+
+    assert sorted(ids) == list(range(500,1500))
+
+
+def test_ids_are_unique_across_blocks_and_threads(bank):
+    allocator = bank.bankIdAllocator('test',1000,999999,block_size=7)
+    ids = []
+
+    def allocate():
+        ids.extend(allocator.allocate() for _ in range(200))
+
+    threads = [threading.Thread(target=allocate) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(ids) == 800
+    assert len(set(ids)) == 800
+    assert all(1000 <= new_id <= 999999 for new_id in ids)
+
+
+def test_a_new_allocator_continues_the_sequence(bank):
+    first = [bank.bankIdAllocator('test',1000,999999,block_size=5).allocate() for _ in range(3)]
+    second = [bank.bankIdAllocator('test',1000,999999,block_size=5).allocate() for _ in range(3)]
+
+    assert not set(first) & set(second)
+
+
+def next_id(allocator):
+    # The ID the allocator hands out next
+    allocator.allocate()
+    return allocator.permute(allocator._next)
+
+
+def import_rows(bank,tmp_path,table_name,rows,router = None):
+    path = str(tmp_path / (table_name + '.csv'))
+    with open(path,'w',newline='') as f:
+        writer = csv.DictWriter(f,fieldnames=list(rows[0]))
+        writer.writeheader()
+        writer.writerows(rows)
+    return bank.bankDataTransfer().importTable(table_name,path,router=router)
+
+
+def test_create_user_skips_ids_taken_by_imported_rows(bank,tmp_path):
+    allocator = bank.bankIdAllocator.forName('user')
+    taken = next_id(allocator)
+    import_rows(bank,tmp_path,'user',[{'user_id': taken,'user_type': 'C','first_name': 'imported',
+                                       'last_name': 'user','status': 'ACTIVE'}])
+
+    u_id = bank.bankUser(notify=quiet).createUser('new','user','C')
+
+    assert u_id not in (-1,taken)
+    assert bank.bankUser(notify=quiet).authenticateUser(taken,'C','imported')
+    assert bank.bankUser(notify=quiet).authenticateUser(u_id,'C','new')
+
+
+def test_add_account_skips_numbers_taken_by_imported_rows(bank,tmp_path,customer):
+    u_id,checking,credit = customer
+    allocator = bank.bankIdAllocator.forName('acct_no')
+    taken = next_id(allocator)
+    import_rows(bank,tmp_path,'cust_accounts',[{'user_id': 42,'acct_type': 'Savings','available_bal': 7,
+                                                'remaining_bal': 0,'acct_no': taken,'acct_sts': 'ACTIVE'}])
+
+    acct_no = bank.bankAccounts(notify=quiet).addAccount(u_id,'test','Checking',100)
+
+    assert acct_no not in (-1,taken)
+    trans = bank.bankTransactions(notify=quiet)
+    assert trans.readBalance(taken).available_bal == 7
+    assert trans.readBalance(acct_no).available_bal == 100
+
+
+def test_allocation_gives_up_when_every_id_is_taken(bank,monkeypatch):
+    allocator = bank.bankIdAllocator.forName('user')
+    u_id = bank.bankUser(notify=quiet).createUser('first','user','C')
+    monkeypatch.setattr(allocator,'allocate',lambda: u_id)
+    messages = []
+
+    assert bank.bankUser(notify=messages.append).createUser('second','user','C') == -1
+    assert messages == ["Error: No free ID found for user"]
+
+
+def integrity_error(orig):
+    from sqlalchemy.exc import IntegrityError
+    return IntegrityError('INSERT ...',{},orig)
+
+
+class serverError(Exception):
+    # Driver error carrying a SQLSTATE, as psycopg2 errors do
+    def __init__(self,message,pgcode):
+        super().__init__(message)
+        self.pgcode = pgcode
+
+
+def test_only_unique_violations_of_the_id_column_are_collisions(bank):
+    users = bank.bankIdAllocator.forName('user')
+    accounts = bank.bankIdAllocator.forName('acct_no')
+
+    assert users.isCollision(integrity_error(sqlite3.IntegrityError("UNIQUE constraint failed: user.user_id")))
+    assert accounts.isCollision(integrity_error(sqlite3.IntegrityError(
+        "UNIQUE constraint failed: cust_accounts.user_id, cust_accounts.acct_no")))
+    assert not users.isCollision(integrity_error(sqlite3.IntegrityError("UNIQUE constraint failed: user.login")))
+    assert not users.isCollision(integrity_error(sqlite3.IntegrityError("NOT NULL constraint failed: user.user_id")))
+    assert accounts.isCollision(integrity_error(serverError(
+        'duplicate key value violates unique constraint "ix_cust_accounts_acct_no"\n'
+        'DETAIL:  Key (acct_no)=(1234567890) already exists.','23505')))
+    assert not accounts.isCollision(integrity_error(serverError(
+        'insert or update on table "cust_accounts" violates foreign key constraint\n'
+        'DETAIL:  Key (acct_no)=(1234567890) is not present.','23503')))
+
+
+def test_other_integrity_errors_are_raised_without_retrying(bank):
+    from sqlalchemy.exc import IntegrityError
+
+    allocator = bank.bankIdAllocator('test',1000,999999,column='test_id')
+    attempts = []
+
+    def insert_row(new_id):
+        attempts.append(new_id)
+        raise integrity_error(sqlite3.IntegrityError("CHECK constraint failed: amount > 0"))
+
+    with pytest.raises(IntegrityError):
+        allocator.insertWithId(insert_row)
+    assert len(attempts) == 1
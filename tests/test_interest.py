@@ -0,0 +1,56 @@
+import sqlite3
+
+import pytest
+
+pytest.importorskip('numpy')
+
+
+def accrue_from(tmp_path,acct_no,accrued_on):
+    with sqlite3.connect(str(tmp_path / 'bank.db')) as conn:
+        conn.execute("UPDATE cust_accounts SET accrued_on = ? WHERE acct_no = ?",(accrued_on,acct_no))
+
+
+def fees(tmp_path,acct_no):
+    with sqlite3.connect(str(tmp_path / 'bank.db')) as conn:
+        return [row[0] for row in conn.execute("SELECT amount FROM transactions "
+                                               "WHERE acct_no = ? AND txn_type = 'fee'",(acct_no,))]
+
+
+def test_one_fee_for_every_month_end_crossed(bank,tmp_path,customer):
+    u_id,checking,credit = customer
+    bank.bankTransactions(notify=lambda message: None).withdrawAmt(u_id,checking,40)
+    accrue_from(tmp_path,checking,'2024-01-15')
+    interest = bank.bankInterest()
+
+    interest.runAccrual('2024-04-30')
+
+    assert fees(tmp_path,checking) == [4 * interest.maintenanceFee]
+    assert bank.bankTransactions().readBalance(checking).available_bal == 60 - 4 * interest.maintenanceFee
+
+
+def test_fees_stop_at_the_balance_and_are_charged_once_per_date(bank,tmp_path,customer):
+    u_id,checking,credit = customer
+    bank.bankTransactions(notify=lambda message: None).withdrawAmt(u_id,checking,88)
+    accrue_from(tmp_path,checking,'2023-12-31')
+    interest = bank.bankInterest()
+
+    assert interest.runAccrual('2024-03-31')['fees'] == 12
+    assert interest.runAccrual('2024-03-31')['accounts'] == 0
+    assert interest.runAccrual('2024-04-15')['fees'] == 0
+    assert fees(tmp_path,checking) == [12]
+    assert bank.bankTransactions().readBalance(checking).available_bal == 0
+
+
+def test_accrual_statements_bind_named_parameters_for_server_drivers(bank):
+    from sqlalchemy.dialects import postgresql
+
+    class connection:
+        dialect = postgresql.dialect()
+    tables = bank.bankSchema.tableDefinitions().tables
+    interest = bank.bankInterest()
+    stmt,entry = [interest.compileMany(connection,sql)
+                  for sql in interest.accrualStatements(tables['cust_accounts'],tables['transactions'])]
+
+    assert '%(acct)s' in stmt[0] and not stmt[2]
+    assert interest.bindRows(entry,{'acct': [7,8],'amt': [1,2],'op': ['fee','fee'],'ts': ['t','t']}) == [
+        {'acct': 7,'amt': 1,'op': 'fee','ts': 't'},{'acct': 8,'amt': 2,'op': 'fee','ts': 't'}]
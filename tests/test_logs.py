@@ -0,0 +1,57 @@
+import threading
+
+import pytest
+
+from bankingsystem.logs import bankTransactionLog
+
+
+@pytest.fixture
+def stalled_log(tmp_path,monkeypatch):
+    """
+    A log writer that takes nothing off its queue until released
+    """
+    bankTransactionLog.shutdown()
+    release = threading.Event()
+    write_loop = bankTransactionLog._writeLoop
+
+    def stalled(log_queue,fileHandler):
+        release.wait()
+        write_loop(log_queue,fileHandler)
+
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(bankTransactionLog,'_writeLoop',staticmethod(stalled))
+    monkeypatch.setattr(bankTransactionLog,'_stats',{'written': 0,'dropped': 0,'batches': 0})
+    monkeypatch.setattr(bankTransactionLog,'queueSize',3)
+    monkeypatch.setattr(bankTransactionLog,'overflowPolicy','drop-info')
+    yield release
+    release.set()
+    bankTransactionLog.shutdown()
+
+
+def test_drop_info_drops_info_records_and_waits_for_warnings(stalled_log,tmp_path):
+    log = bankTransactionLog()
+    for n in range(5):
+        log.logTransaction("routine {n}".format(n = n))
+
+    assert bankTransactionLog.getStats()['dropped'] == 2
+
+    warning = threading.Thread(target=log.logger.warning,args=("kept",))
+    warning.start()
+    warning.join(0.2)
+    assert warning.is_alive()
+
+    stalled_log.set()
+    warning.join()
+    bankTransactionLog.shutdown()
+
+    stats = bankTransactionLog.getStats()
+    assert (stats['written'],stats['dropped']) == (4,2)
+    lines = (tmp_path / bankTransactionLog.logFile).read_text().splitlines()
+    assert [line.rsplit(': ',1)[1] for line in lines] == ["routine 0","routine 1","routine 2","kept"]
+
+
+def test_unknown_overflow_policies_are_rejected(stalled_log,monkeypatch):
+    monkeypatch.setattr(bankTransactionLog,'overflowPolicy','drop-debug')
+
+    with pytest.raises(ValueError,match='Unknown log overflow policy'):
+        bankTransactionLog.startWriter()
@@ -0,0 +1,87 @@
+import re
+import urllib.error
+import urllib.request
+
+import pytest
+
+from conftest import quiet
+
+
+@pytest.fixture
+def metrics(bank,monkeypatch):
+    monkeypatch.setattr(bank.bankMetrics,'_histograms',{})
+    return bank.bankMetrics
+
+
+def test_histograms_estimate_percentiles_within_their_bucket(metrics):
+    for ms in range(1,101):
+        metrics.observe('operation','sample',ms / 1000)
+
+    stats = metrics.summary()[('operation','sample')]
+
+    assert stats['count'] == 100
+    assert stats['sum'] == pytest.approx(5.05)
+    # 50 ms and 95 ms fall in the (0.025, 0.05] and (0.05, 0.1] buckets
+    assert 0.025 < stats['p50'] <= 0.05
+    assert 0.05 < stats['p95'] <= stats['p99'] <= 0.1
+
+
+def test_operations_and_their_statements_are_timed(bank,metrics,customer):
+    u_id,checking,credit = customer
+
+    assert bank.bankTransactions(notify=quiet).depositAmt(u_id,checking,10)
+
+    summary = metrics.summary()
+    assert summary[('operation','bankTransactions.depositAmt')]['count'] == 1
+    assert summary[('operation','bankDatabase.db_connect')]['count'] >= 1
+    statements = [name for kind,name in summary if kind == 'sql']
+    assert any(re.match(r'UPDATE cust_accounts [0-9a-f]{8}$',name) for name in statements)
+    assert any(re.match(r'INSERT transactions [0-9a-f]{8}$',name) for name in statements)
+
+
+def parse(text):
+    samples = {}
+    for line in text.splitlines():
+        if line and not line.startswith('#'):
+            name,value = line.rsplit(' ',1)
+            samples[name] = float(value)
+    return samples
+
+
+def test_prometheus_dump_has_cumulative_buckets_and_quantiles(metrics):
+    for seconds in (0.0002,0.003,0.003,2.0,30.0):
+        metrics.observe('operation','bankUser.createUser',seconds)
+    metrics.observe('sql','SELECT "user" 1234abcd',0.001)
+
+    text = metrics.prometheusText()
+    samples = parse(text)
+
+    assert '# TYPE bank_operation_seconds histogram' in text
+    assert '# TYPE bank_sql_seconds histogram' in text
+    buckets = [value for name,value in samples.items()
+               if name.startswith('bank_operation_seconds_bucket{operation="bankUser.createUser"')]
+    assert len(buckets) == len(metrics.buckets) + 1
+    assert buckets == sorted(buckets)
+    assert samples['bank_operation_seconds_bucket{operation="bankUser.createUser",le="0.005"}'] == 3
+    assert samples['bank_operation_seconds_bucket{operation="bankUser.createUser",le="+Inf"}'] == 5
+    assert samples['bank_operation_seconds_count{operation="bankUser.createUser"}'] == 5
+    assert samples['bank_operation_seconds_sum{operation="bankUser.createUser"}'] == pytest.approx(32.0062)
+    assert samples['bank_sql_seconds_count{statement="SELECT \\"user\\" 1234abcd"}'] == 1
+    for q in ('0.5','0.95','0.99'):
+        assert 'bank_operation_seconds_quantile{operation="bankUser.createUser",quantile="' + q + '"}' in samples
+
+
+def test_metrics_are_served_over_http(metrics):
+    metrics.observe('operation','served',0.01)
+    server = metrics.serve(port=0)
+    try:
+        url = 'http://{h}:{p}'.format(h = server.server_address[0],p = server.server_address[1])
+        with urllib.request.urlopen(url + '/metrics') as response:
+            assert response.headers['Content-Type'].startswith('text/plain')
+            assert parse(response.read().decode())['bank_operation_seconds_count{operation="served"}'] == 1
+        with pytest.raises(urllib.error.HTTPError) as error:
+            urllib.request.urlopen(url + '/other')
+        assert error.value.code == 404
+    finally:
+        server.shutdown()
+        server.server_close()
@@ -0,0 +1,74 @@
+import importlib.util
+import os
+import re
+
+import pytest
+
+from conftest import ROOT
+
+# Index each lookup path must search: (table, column looked up) -> index
+# named in the SQLite plan
+LOOKUP_INDEXES = {
+    ('user','user_id'): 'INTEGER PRIMARY KEY',
+    ('cust_accounts','acct_no'): 'ix_cust_accounts_acct_no',
+    ('cust_accounts','user_id'): 'sqlite_autoindex_cust_accounts_1',
+    ('transactions','acct_no'): 'ix_transactions_acct_ts',
+    ('id_sequence','name'): 'sqlite_autoindex_id_sequence_1',
+    ('session_revocations','user_id'): 'INTEGER PRIMARY KEY',
+    ('session_revocations','revoked_at'): 'ix_session_revocations_at',
+    ('snapshot_runs','run_id'): 'INTEGER PRIMARY KEY',
+    ('snapshot_runs','snap_ts'): 'ix_snapshot_runs_ts',
+    ('balance_snapshots','acct_no'): 'PRIMARY KEY',
+}
+
+# The most selective column of a WHERE clause comes first
+KEY_COLUMNS = ('acct_no','user_id','name','run_id','snap_ts','revoked_at')
+
+
+def lookup(statement):
+    # (table, column) a statement looks its rows up by, None for
+    # statements without a WHERE clause on a table of the bank
+    statement = ' '.join(statement.split())
+    match = re.match(r'(?:SELECT .*? FROM|UPDATE|DELETE FROM) (\w+)\b.*? WHERE (.*)',statement)
+    if match is None:
+        return None
+    table,where = match.groups()
+    where = re.split(r' (?:ORDER BY|GROUP BY|LIMIT|RETURNING) ',where)[0]
+    for column in KEY_COLUMNS:
+        if re.search(r'\b{t}\.{c}\b'.format(t = table,c = column),where):
+            return table,column
+    return None
+
+
+@pytest.fixture
+def plans(bank):
+    spec = importlib.util.spec_from_file_location('check_query_plans',
+                                                  os.path.join(ROOT,'tools','check_query_plans.py'))
+    tool = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(tool)
+
+    bank.bankDatabase.enablePlanCheck()
+    try:
+        tool.exercise(bank)
+        yield bank.bankDatabase.planLog
+    finally:
+        bank.bankDatabase.enablePlanCheck(False)
+
+
+def test_no_hot_path_statement_scans_a_table(bank,plans):
+    assert len(plans) > 50
+    assert bank.bankDatabase.planScans() == []
+
+
+def test_every_lookup_path_searches_its_index(plans):
+    seen = set()
+    for statement,plan in plans:
+        path = lookup(statement)
+        if path not in LOOKUP_INDEXES:
+            continue
+        seen.add(path)
+        table,column = path
+        assert any(detail.startswith('SEARCH ' + table + ' ') and LOOKUP_INDEXES[path] in detail
+                   for detail in plan), (statement,plan)
+
+    assert seen == set(LOOKUP_INDEXES)
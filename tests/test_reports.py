@@ -0,0 +1,124 @@
+import csv
+import os
+import sqlite3
+from datetime import datetime,timedelta
+
+import pytest
+from sqlalchemy.exc import OperationalError
+
+from conftest import quiet
+
+
+def test_reports_on_a_server_backend_ask_for_a_database_file(bank):
+    bank.bankDatabase.configureBackend('postgresql://bank@localhost/bank')
+    try:
+        with pytest.raises(bank.ValidationError,match='configured one is postgresql'):
+            bank.bankReports()
+    finally:
+        bank.bankDatabase.configureBackend(None)
+
+
+def read_csv(path):
+    with open(path,newline='') as f:
+        return list(csv.reader(f))
+
+
+@pytest.fixture
+def reports(bank,tmp_path,customer):
+    u_id,checking,credit = customer
+    trans = bank.bankTransactions(notify=quiet)
+    assert trans.withdrawAmt(u_id,credit,200)
+    assert trans.depositAmt(u_id,checking,900)
+    with bank.bankReports() as reports:
+        yield reports
+
+
+def test_reports_read_a_read_only_snapshot_copy(bank,tmp_path,customer,reports):
+    u_id,checking,credit = customer
+    source = reports.source
+    assert os.path.exists(source) and source != str(tmp_path / 'bank.db')
+
+    # Postings made after the copy are not in the report
+    assert bank.bankTransactions(notify=quiet).depositAmt(u_id,checking,5000)
+    totals = {(row['acct_type'],row['acct_sts']): row for row in reports.totals()}
+    assert totals[('Checking','ACTIVE')]['accounts'] == 2
+    assert totals[('Checking','ACTIVE')]['available_bal'] < 5000
+
+    with reports.engine.connect() as db_engine:
+        with pytest.raises(OperationalError,match='readonly'):
+            db_engine.execute("UPDATE cust_accounts SET available_bal = 0")
+
+    reports.close()
+    assert not os.path.exists(source)
+
+
+def test_totals_and_distribution_add_up(bank,tmp_path,customer,reports):
+    with sqlite3.connect(str(tmp_path / 'bank.db')) as conn:
+        expected = conn.execute("SELECT acct_type,acct_sts,count(*),sum(available_bal),sum(remaining_bal) "
+                                "FROM cust_accounts GROUP BY acct_type,acct_sts "
+                                "ORDER BY acct_type,acct_sts").fetchall()
+
+    totals = list(reports.totals())
+    assert [(row['acct_type'],row['acct_sts'],row['accounts'],row['available_bal'],row['remaining_bal'])
+            for row in totals] == expected
+    assert sum(row['available_share'] for row in totals) == pytest.approx(1.0)
+
+    distribution = list(reports.distribution())
+    assert {(row['acct_type'],row['bucket']) for row in distribution} >= {('Checking','1000-9999'),
+                                                                           ('Credit','100-999')}
+    for acct_type,_,accounts,_,_ in expected:
+        rows = [row for row in distribution if row['acct_type'] == acct_type]
+        assert rows[-1]['cumulative_accounts'] == sum(row['accounts'] for row in rows) == accounts
+        assert rows[-1]['cumulative_pct'] == pytest.approx(100.0)
+
+
+def test_dormant_accounts_and_exposure(bank,customer,reports):
+    u_id,checking,credit = customer
+    today = datetime.now()
+
+    assert [row['acct_no'] for row in reports.dormant() if row['last_activity'] is not None] == []
+    dormant = {row['acct_no']: row for row in reports.dormant(as_of=(today + timedelta(days=400)).strftime('%Y-%m-%d'))}
+    assert dormant[checking]['days_inactive'] == dormant[credit]['days_inactive'] == 400
+    assert [row['acct_no'] for row in reports.dormant(as_of=(today + timedelta(days=400)).strftime('%Y-%m-%d'),
+                                                      days=401) if row['last_activity'] is not None] == []
+    with pytest.raises(bank.ValidationError,match='Invalid date'):
+        list(reports.dormant(as_of='2024-13-01'))
+
+    exposure = [row for row in reports.exposure() if row['user_id'] == u_id]
+    assert [(row['first_name'],row['accounts'],row['outstanding'],row['unused_credit'])
+            for row in exposure] == [('test',1,200,300)]
+    assert exposure[0]['utilization'] == pytest.approx(0.4)
+
+
+def test_reports_are_written_as_csv(bank,tmp_path,reports):
+    for name,columns in reports.reportColumns.items():
+        path = str(tmp_path / (name + '.csv'))
+        count = reports.writeReport(name,path)
+        rows = read_csv(path)
+        assert rows[0] == [column for column,_ in columns]
+        assert len(rows) == count + 1
+        assert rows[1:] == [[str('' if row[column] is None else row[column]) for column,_ in columns]
+                            for row in getattr(reports,name)()]
+
+    with pytest.raises(bank.ValidationError,match='Unknown report'):
+        reports.writeReport('balances',str(tmp_path / 'balances.csv'))
+
+
+def test_reports_are_written_as_parquet_row_groups(bank,tmp_path,reports):
+    pq = pytest.importorskip('pyarrow.parquet')
+    path = str(tmp_path / 'totals.parquet')
+
+    count = reports.writeReport('totals',path,'parquet',chunk_size=1)
+
+    parquet = pq.ParquetFile(path)
+    assert parquet.metadata.num_row_groups == parquet.metadata.num_rows == count
+    assert parquet.schema_arrow.names == [column for column,_ in reports.reportColumns['totals']]
+
+
+def test_report_command_line_reads_a_database_file(bank,tmp_path,customer,capsys):
+    path = str(tmp_path / 'exposure.csv')
+
+    assert bank.bankReports.main(['exposure',path,'--source',str(tmp_path / 'bank.db')]) == 0
+    assert capsys.readouterr().out.startswith('1 rows written')
+    assert bank.bankReports.main(['exposure',path,'--source',str(tmp_path / 'missing.db')]) == 1
+    assert 'not found' in capsys.readouterr().out
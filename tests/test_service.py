@@ -0,0 +1,197 @@
+import http.client
+import json
+
+import pytest
+
+from conftest import quiet
+
+
+@pytest.fixture
+def service(bank):
+    service = bank.bankService(port=0)
+    service.start()
+    yield service
+    service.shutdown()
+
+
+def call(service,method,path,body = None,token = None):
+    conn = http.client.HTTPConnection(*service.address)
+    headers = {'Content-Type': 'application/json'}
+    if token is not None:
+        headers['Authorization'] = 'Bearer ' + token
+    conn.request(method,path,body=None if body is None else json.dumps(body).encode(),headers=headers)
+    response = conn.getresponse()
+    status,body = response.status,json.loads(response.read())
+    conn.close()
+    return status,body
+
+
+def login(service,u_id,u_type = 'C',first_name = 'test'):
+    status,body = call(service,'POST','/login',{'user_id': u_id,'user_type': u_type,'first_name': first_name})
+    assert status == 200
+    return body['token']
+
+
+def balance(bank,acct_no):
+    return bank.bankTransactions(notify=quiet).readBalance(acct_no).available_bal
+
+
+@pytest.mark.parametrize('method,path,body',[
+    ('POST','/deposit',{'acct_no': None,'amount': 1}),
+    ('POST','/withdraw',{'user_id': None,'acct_no': None,'amount': 1}),
+    ('POST','/pay',{'user_id': None,'acct_no': None,'amount': 1}),
+    ('POST','/transfer',{'user_id': None,'src': None,'dst': None,'amount': 1}),
+    ('POST','/accounts',{'user_id': None,'first_name': 'test','acct_type': 'Checking','amount': 1}),
+    ('GET','/balance?acct_no={acct}&user_id={user}',None),
+    ('GET','/history?acct_no={acct}&user_id={user}',None),
+])
+def test_requests_without_token_are_rejected(bank,service,customer,method,path,body):
+    u_id,checking,credit = customer
+    if body is not None:
+        body = {key: {'user_id': u_id,'acct_no': checking,'src': checking,'dst': credit}.get(key,value)
+                for key,value in body.items()}
+
+    status,result = call(service,method,path.format(acct = checking,user = u_id),body)
+
+    assert status == 401
+    assert not result['ok']
+    assert balance(bank,checking) == 100
+
+
+def test_invalid_token_is_rejected(bank,service,customer):
+    u_id,checking,credit = customer
+    status,_ = call(service,'POST','/withdraw',{'acct_no': checking,'amount': 1},token='forged.token')
+    assert status == 401
+    assert balance(bank,checking) == 100
+
+
+def test_customer_acts_as_the_user_of_the_token(bank,service,customer):
+    u_id,checking,credit = customer
+    other = bank.bankUser(notify=quiet).createUser('other','customer','C')
+    token = login(service,other,first_name='other')
+
+    # user_id in the request does not override the token's user
+    status,result = call(service,'POST','/withdraw',{'user_id': u_id,'acct_no': checking,'amount': 1},token)
+    assert status == 400 and not result['ok']
+    status,_ = call(service,'GET','/balance?acct_no={a}'.format(a = checking),token=token)
+    assert status == 400
+    assert balance(bank,checking) == 100
+
+    token = login(service,u_id)
+    status,result = call(service,'POST','/withdraw',{'acct_no': checking,'amount': 1},token)
+    assert status == 200 and result['ok']
+    status,result = call(service,'GET','/balance?acct_no={a}'.format(a = checking),token=token)
+    assert status == 200 and result['available_bal'] == 99
+
+
+def test_employee_acts_on_any_account(bank,service,customer):
+    u_id,checking,credit = customer
+    emp_id = bank.bankUser(notify=quiet).createUser('staff','member','E','teller')
+    token = login(service,emp_id,'E','staff')
+
+    status,_ = call(service,'POST','/deposit',{'acct_no': checking,'amount': 5},token)
+    assert status == 200
+    status,_ = call(service,'POST','/withdraw',{'user_id': u_id,'acct_no': checking,'amount': 3},token)
+    assert status == 200
+    assert balance(bank,checking) == 102
+
+
+def test_each_request_verifies_its_token_once(bank,service,customer,monkeypatch):
+    u_id,checking,credit = customer
+    token = login(service,u_id)
+    verified = []
+    verify = bank.bankSession.verify
+    monkeypatch.setattr(bank.bankSession,'verify',
+                        classmethod(lambda cls,token: verified.append(token) or verify(token)))
+
+    status,_ = call(service,'POST','/withdraw',{'acct_no': checking,'amount': 1},token)
+    assert status == 200
+    status,_ = call(service,'GET','/balance?acct_no={a}'.format(a = checking),token=token)
+    assert status == 200
+
+    assert verified == [token,token]
+
+
+def test_only_employees_create_employee_users(bank,service,customer):
+    u_id,checking,credit = customer
+    employee = {'first_name': 'new','last_name': 'staff','user_type': 'E','designation': 'teller'}
+
+    status,result = call(service,'POST','/users',employee)
+    assert status == 401 and not result['ok']
+    status,result = call(service,'POST','/users',employee,login(service,u_id))
+    assert result['messages'] == ["Authentication Error: Only employees can create employee users"]
+
+    status,result = call(service,'POST','/users',{'first_name': 'new','last_name': 'customer','user_type': 'C'})
+    assert status == 200 and result['ok']
+    emp_id = bank.bankUser(notify=quiet).createUser('staff','member','E','teller')
+    status,result = call(service,'POST','/users',employee,login(service,emp_id,'E','staff'))
+    assert status == 200 and result['ok']
+    assert bank.bankUser(notify=quiet).authenticateUser(result['user_id'],'E','new')
+
+
+@pytest.mark.parametrize('amount,message',[
+    (12.9,'Error: amount must be a whole number'),
+    (12.0,'Error: amount must be a whole number'),
+    ('12.9','Error: amount must be a whole number'),
+    (True,'Error: amount must be a whole number'),
+    (10 ** 30,'Error: amount is out of range'),
+])
+def test_amounts_must_be_integers(bank,service,customer,amount,message):
+    u_id,checking,credit = customer
+    token = login(service,u_id)
+
+    status,result = call(service,'POST','/deposit',{'acct_no': checking,'amount': amount},token)
+
+    assert status == 400
+    assert result['messages'] == [message]
+    assert balance(bank,checking) == 100
+
+
+@pytest.mark.parametrize('amount',[-50,0,'-50'])
+@pytest.mark.parametrize('path,body',[
+    ('/deposit',{'acct_no': None}),
+    ('/withdraw',{'acct_no': None}),
+    ('/pay',{'acct_no': 'credit'}),
+    ('/transfer',{'src': None,'dst': 'credit'}),
+    ('/accounts',{'first_name': 'test','acct_type': 'Checking'}),
+])
+def test_amounts_must_be_positive(bank,service,customer,amount,path,body):
+    u_id,checking,credit = customer
+    token = login(service,u_id)
+    body = {key: credit if value == 'credit' else checking if value is None else value
+            for key,value in body.items()}
+
+    status,result = call(service,'POST',path,dict(body,amount=amount),token)
+
+    assert status == 400
+    assert result['messages'] == ["Error: amount must be positive"]
+    assert (balance(bank,checking),balance(bank,credit)) == (100,500)
+
+
+def test_bad_requests_report_the_problem(bank,service,customer):
+    u_id,checking,credit = customer
+    token = login(service,u_id)
+
+    conn = http.client.HTTPConnection(*service.address)
+    conn.request('POST','/deposit',body=b'{"acct_no": ',headers={'Authorization': 'Bearer ' + token})
+    response = conn.getresponse()
+    assert response.status == 400
+    assert json.loads(response.read())['messages'] == ["Error: Request body is not valid JSON"]
+    conn.close()
+
+    status,result = call(service,'GET','/history?acct_no={a}&limit=ten'.format(a = checking),token=token)
+    assert status == 400
+    assert result['messages'] == ["Error: limit must be a whole number"]
+
+
+def test_unexpected_errors_return_500(bank,service,customer,monkeypatch):
+    u_id,checking,credit = customer
+    token = login(service,u_id)
+
+    def broken(self,*args):
+        raise RuntimeError("boom")
+    monkeypatch.setattr(bank.bankTransactions,'depositAmt',broken)
+
+    status,result = call(service,'POST','/deposit',{'acct_no': checking,'amount': 1},token)
+    assert status == 500
+    assert result == {'ok': False,'messages': ["Error: Internal server error"]}
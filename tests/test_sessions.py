@@ -0,0 +1,91 @@
+import subprocess
+import sys
+
+import pytest
+
+from conftest import ROOT,quiet
+
+SET_STATUS = """
+import sys
+sys.path.insert(0,{root!r})
+import bankingsystem,bankingsystem.database
+bankingsystem.database.dbUrl = {url!r}
+assert bankingsystem.bankUser(notify=print).setStatus({u_id},{status!r})
+"""
+
+
+def set_status_elsewhere(bank,u_id,status):
+    # setStatus run by another process on the same database
+    code = SET_STATUS.format(root = ROOT,url = bank.database.dbUrl,u_id = u_id,status = status)
+    subprocess.run([sys.executable,'-c',code],check=True)
+
+
+def test_tokens_are_checked_for_signature_and_expiry(bank,customer,monkeypatch):
+    u_id,checking,credit = customer
+    token = bank.bankUser(notify=quiet).authenticateUser(u_id,'C','test')
+
+    claims = bank.bankSession.verify(token)
+
+    assert claims['uid'] == u_id
+    assert set(claims['acc']) == {str(checking),str(credit)}
+    with pytest.raises(bank.AuthenticationError):
+        bank.bankSession.verify(token[:-2] + 'xx')
+    monkeypatch.setattr(bank.bankSession,'ttl',-1)
+    expired = bank.bankUser(notify=quiet).authenticateUser(u_id,'C','test')
+    with pytest.raises(bank.AuthenticationError,match='invalid or expired'):
+        bank.bankSession.verify(expired)
+
+
+def test_set_status_in_another_process_revokes_tokens(bank,customer):
+    u_id,checking,credit = customer
+    users = bank.bankUser(notify=quiet)
+    token = users.authenticateUser(u_id,'C','test')
+
+    set_status_elsewhere(bank,u_id,'INACTIVE')
+
+    with pytest.raises(bank.AuthenticationError,match='revoked'):
+        bank.bankSession.verify(token)
+    assert not bank.bankAccounts(notify=quiet).validateSession(token,checking,1)
+    assert users.authenticateUser(u_id,'C','test') is False
+
+    set_status_elsewhere(bank,u_id,'ACTIVE')
+    renewed = users.authenticateUser(u_id,'C','test')
+
+    assert bank.bankSession.verify(renewed)['uid'] == u_id
+    with pytest.raises(bank.AuthenticationError,match='revoked'):
+        bank.bankSession.verify(token)
+
+
+def test_revocations_are_read_once_per_refresh_interval(bank,customer,monkeypatch):
+    u_id,checking,credit = customer
+    users = bank.bankUser(notify=quiet)
+    token = users.authenticateUser(u_id,'C','test')
+    reads = []
+    query = bank.bankSession.revocationsQuery
+    monkeypatch.setattr(bank.bankSession,'revocationsQuery',
+                        staticmethod(lambda *args: reads.append(args) or query(*args)))
+
+    for _ in range(5):
+        assert bank.bankSession.verify(token)['uid'] == u_id
+        assert bank.bankAccounts(notify=quiet).validateSession(token,checking,1)
+    assert len(reads) == 1
+
+    # A change made by another process is seen once the interval is over
+    set_status_elsewhere(bank,u_id,'INACTIVE')
+    assert bank.bankSession.verify(token)['uid'] == u_id
+    monkeypatch.setattr(bank.bankSession,'_revokedUntil',0.0)
+    with pytest.raises(bank.AuthenticationError,match='revoked'):
+        bank.bankSession.verify(token)
+    assert len(reads) == 2
+
+
+def test_set_status_in_this_process_revokes_tokens_at_once(bank,customer):
+    u_id,checking,credit = customer
+    users = bank.bankUser(notify=quiet)
+    token = users.authenticateUser(u_id,'C','test')
+    assert bank.bankSession.verify(token)
+
+    assert users.setStatus(u_id,'INACTIVE')
+
+    with pytest.raises(bank.AuthenticationError,match='revoked'):
+        bank.bankSession.verify(token)
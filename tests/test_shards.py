@@ -0,0 +1,102 @@
+import sqlite3
+
+import pytest
+
+from conftest import quiet
+from test_datatransfer import shard_accounts
+
+
+@pytest.fixture
+def shards(tmp_path):
+    return [str(tmp_path / 'shard-{n}.db'.format(n = n)) for n in range(3)]
+
+
+def balance(path,acct_no):
+    with sqlite3.connect(path) as conn:
+        return conn.execute("SELECT available_bal FROM cust_accounts WHERE acct_no = ?",(acct_no,)).fetchone()
+
+
+def test_accounts_are_created_and_posted_in_their_shard(bank,tmp_path,shards):
+    u_id = bank.bankUser(notify=quiet).createUser('test','customer','C')
+
+    with bank.bankShardRouter(shards,notify=quiet) as router:
+        acct_nos = [router.addAccount(u_id,'test','Checking',100) for _ in range(6)]
+        for acct_no in acct_nos:
+            assert router.depositAmt(u_id,acct_no,10)
+            assert router.withdrawAmt(u_id,acct_no,30)
+        placed = {acct_no: shards[router.shards.index(router.shardOf(acct_no))] for acct_no in acct_nos}
+        accounts = router.customerAccounts(u_id)
+
+        assert [row.acct_no for row in accounts] == sorted(acct_nos)
+        assert all(row.available_bal == 80 for row in accounts)
+        assert router.getHistory(u_id,acct_nos[0])['entries'][0]['txn_type'] == 'withdraw'
+        assert [stats['accounts'] for stats in router.shardStats()] == \
+               [list(placed.values()).count(path) for path in shards]
+
+    for acct_no,path in placed.items():
+        assert acct_no in shard_accounts(path)[1]
+        assert balance(path,acct_no) == (80,)
+    # Users stay in the home database, the accounts do not
+    assert not shard_accounts(str(tmp_path / 'bank.db'))[0] & set(acct_nos)
+
+
+def test_shard_placement_is_stable(bank,tmp_path,shards):
+    acct_nos = range(10**10,10**10 + 3000)
+    with bank.bankShardRouter(shards,notify=quiet) as router, \
+         bank.bankShardRouter(shards[::-1],notify=quiet) as reordered, \
+         bank.bankShardRouter(shards + [str(tmp_path / 'shard-3.db')],notify=quiet) as grown:
+        before = [router.shardOf(acct_no).name for acct_no in acct_nos]
+        after = [grown.shardOf(acct_no).name for acct_no in acct_nos]
+
+        # The same names place every account alike, in any order
+        assert before == [reordered.shardOf(acct_no).name for acct_no in acct_nos]
+        assert {name: before.count(name) for name in set(before)} == \
+               pytest.approx({'shard-0.db': 1000,'shard-1.db': 1000,'shard-2.db': 1000},rel=0.1)
+        # A new shard only takes accounts, about a quarter of them
+        moved = [(old,new) for old,new in zip(before,after) if old != new]
+        assert {new for _,new in moved} == {'shard-3.db'}
+        assert len(moved) == pytest.approx(750,rel=0.15)
+        assert router.shardOf('x') is router.shards[0]
+
+
+def test_transfers_across_shards_are_refused(bank,shards):
+    u_id = bank.bankUser(notify=quiet).createUser('test','customer','C')
+    messages = []
+
+    with bank.bankShardRouter(shards,notify=messages.append) as router:
+        acct_nos = [router.addAccount(u_id,'test','Checking',100) for _ in range(8)]
+        src = acct_nos[0]
+        dst = next(acct_no for acct_no in acct_nos if router.shardOf(acct_no) is not router.shardOf(src))
+
+        assert not router.transfer(src,dst,10,u_id)
+        assert [row.available_bal for row in router.customerAccounts(u_id)] == [100] * 8
+
+    assert messages == ["Validation Error: Accounts {src} and {dst} are in different shards".format(
+                        src = src,dst = dst)]
+
+
+def test_rebalance_moves_accounts_into_their_shards(bank,tmp_path,shards,customer):
+    u_id,checking,credit = customer
+    home = str(tmp_path / 'bank.db')
+    assert bank.bankTransactions(notify=quiet).depositAmt(u_id,checking,25)
+    accounts,_ = shard_accounts(home)
+
+    with bank.bankShardRouter(shards[:2],notify=quiet) as router:
+        summary = router.rebalance([home],chunk_size=1)
+        assert summary['accounts'] == len(accounts)
+        assert router.getBalance(u_id,checking)['available_bal'] == 125
+        assert router.rebalance([home])['accounts'] == 0
+    assert shard_accounts(home)[0] == set()
+    assert shard_accounts(shards[0])[0] | shard_accounts(shards[1])[0] == accounts
+
+    with bank.bankShardRouter(shards,notify=quiet) as router:
+        wins = {acct_no for acct_no in accounts if router.shardOf(acct_no) is router.shards[2]}
+        summary = router.rebalance()
+        assert summary['accounts'] == len(wins)
+        assert [row.acct_no for row in router.customerAccounts(u_id)] == sorted((checking,credit))
+        assert router.getHistory(u_id,checking)['entries'][0]['amount'] == 25
+        placed = {acct_no: shards[router.shards.index(router.shardOf(acct_no))] for acct_no in (checking,credit)}
+    assert shard_accounts(shards[2])[0] == wins
+    # Ledger entries moved with their accounts
+    for acct_no,path in placed.items():
+        assert acct_no in shard_accounts(path)[1]
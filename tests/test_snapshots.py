@@ -0,0 +1,75 @@
+import sqlite3
+
+from conftest import quiet
+from test_ids import import_rows
+
+
+def backdate(tmp_path,acct_no,dates):
+    # Moves the ledger entries of acct_no, oldest first, to the given dates
+    with sqlite3.connect(str(tmp_path / 'bank.db')) as conn:
+        txn_ids = [row[0] for row in conn.execute(
+                   "SELECT txn_id FROM transactions WHERE acct_no = ? ORDER BY txn_id",(acct_no,))]
+        assert len(txn_ids) == len(dates)
+        conn.executemany("UPDATE transactions SET txn_ts = ? WHERE txn_id = ?",zip(dates,txn_ids))
+
+
+def balance(snapshots,acct_no,as_of):
+    row = snapshots.balanceAsOf(acct_no,as_of)
+    return row and row['available_bal']
+
+
+def test_balance_as_of_is_the_last_entry_at_or_before_the_date(bank,tmp_path,customer):
+    u_id,checking,credit = customer
+    trans = bank.bankTransactions(notify=quiet)
+    assert trans.depositAmt(u_id,checking,50)
+    assert trans.withdrawAmt(u_id,checking,30)
+    backdate(tmp_path,checking,['2024-01-10 09:00:00','2024-02-10 09:00:00','2024-03-10 09:00:00'])
+    snapshots = bank.bankSnapshots()
+
+    assert balance(snapshots,checking,'2023-12') is None
+    assert balance(snapshots,checking,'2024-01') == 100
+    assert balance(snapshots,checking,'2024-02-10') == 150
+    assert balance(snapshots,checking,'2024-03-10 08:59:59') == 150
+    assert balance(snapshots,checking,'2024-03') == 120
+
+
+def test_balances_as_of_agree_with_balance_as_of_across_snapshots(bank,customer):
+    u_id,checking,credit = customer
+    trans = bank.bankTransactions(notify=quiet)
+    snapshots = bank.bankSnapshots()
+    assert trans.depositAmt(u_id,checking,50)
+    snapshots.takeSnapshot()
+    assert trans.withdrawAmt(u_id,credit,200)
+    assert trans.withdrawAmt(u_id,checking,20)
+
+    rows = {row['acct_no']: row for row in snapshots.balancesAsOf('9999-12-31')}
+
+    assert rows[checking]['available_bal'] == 130
+    assert (rows[credit]['available_bal'],rows[credit]['remaining_bal']) == (300,200)
+    for acct_no,row in rows.items():
+        expected = snapshots.balanceAsOf(acct_no,'9999-12-31')
+        assert (row['available_bal'],row['remaining_bal']) == (expected['available_bal'],
+                                                               expected['remaining_bal'])
+
+
+def test_accounts_older_than_the_ledger_come_from_the_seed_snapshot(bank):
+    snapshots = bank.bankSnapshots()
+
+    assert balance(snapshots,683353,'9999-12-31') == 901
+    assert [row['acct_no'] for row in snapshots.balancesAsOf('9999-12-31')] == [683353]
+
+
+def test_imported_accounts_have_a_balance_as_of_the_import(bank,tmp_path):
+    import_rows(bank,tmp_path,'cust_accounts',[{'user_id': 42,'acct_type': 'Credit','available_bal': 70,
+                                                'remaining_bal': 30,'acct_no': 777777,'acct_sts': 'ACTIVE'}])
+    # Replaying the import adds no second opening entry
+    import_rows(bank,tmp_path,'cust_accounts',[{'user_id': 42,'acct_type': 'Credit','available_bal': 70,
+                                                'remaining_bal': 30,'acct_no': 777777,'acct_sts': 'ACTIVE'}])
+    snapshots = bank.bankSnapshots()
+
+    assert snapshots.balanceAsOf(777777,'9999-12-31')['remaining_bal'] == 30
+    assert balance(snapshots,777777,'2000-01') is None
+    assert snapshots.takeSnapshot()['accounts'] == 1
+    assert balance(snapshots,777777,'9999-12-31') == 70
+    rows = {row['acct_no']: row for row in snapshots.balancesAsOf('9999-12-31')}
+    assert rows[777777]['available_bal'] == 70
@@ -0,0 +1,233 @@
+import sqlite3
+import threading
+
+from conftest import quiet
+
+
+def ledger(tmp_path,acct_no):
+    with sqlite3.connect(str(tmp_path / 'bank.db')) as conn:
+        return conn.execute("SELECT txn_type,amount,available_bal,remaining_bal FROM transactions "
+                            "WHERE acct_no = ? AND txn_type != 'open' ORDER BY txn_id",(acct_no,)).fetchall()
+
+
+def outcomes(summary):
+    return [(rslt.line,rslt.success,rslt.message) for rslt in summary['results']]
+
+
+def test_negative_amounts_are_rejected_for_customers_and_employees(bank,tmp_path,customer):
+    u_id,checking,credit = customer
+    messages = []
+    trans = bank.bankTransactions(notify=messages.append)
+
+    assert not trans.withdrawAmt(u_id,checking,-50)
+    assert not trans.depositAmt(None,checking,-50)
+    assert not trans.payBalance(u_id,credit,0)
+
+    assert messages == ["Error: Transaction amount cannot be negative/zero"] * 3
+    assert balances(bank,checking,credit) == [(100,0),(500,0)]
+    assert ledger(tmp_path,checking) == ledger(tmp_path,credit) == []
+
+
+def test_concurrent_withdrawals_never_overdraw_the_account(bank,tmp_path,customer):
+    u_id,checking,credit = customer
+    messages = []
+    results = []
+    start = threading.Barrier(10)
+
+    def withdraw():
+        trans = bank.bankTransactions(notify=messages.append)
+        start.wait()
+        results.append(trans.withdrawAmt(u_id,checking,30))
+    workers = [threading.Thread(target=withdraw) for _ in range(10)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+
+    # 100 covers three withdrawals of 30, every other one is rejected
+    assert sorted(results) == [False] * 7 + [True] * 3
+    assert len([m for m in messages if "Withdrawal amount is greater" in m]) == 7
+    assert balances(bank,checking) == [(10,0)]
+    assert [row[2] for row in ledger(tmp_path,checking)] == [70,40,10]
+
+
+def test_post_batch_decides_records_in_input_order(bank,tmp_path,customer):
+    u_id,checking,credit = customer
+    trans = bank.bankTransactions(notify=quiet)
+
+    summary = trans.postBatch([(checking,'withdraw',150),
+                               (checking,'deposit',100),
+                               (checking,'withdraw',150),
+                               (checking,'pay',10),
+                               (credit,'withdraw',200),
+                               (credit,'pay',50),
+                               (999,'deposit',5),
+                               (checking,'refund',5),
+                               (checking,'deposit',0)],chunk_size=20)
+
+    assert outcomes(summary) == [
+        (1,False,"Error: Insufficient balance or account not found / not active"),
+        (2,True,"Posted"),
+        (3,True,"Posted"),
+        (4,False,"Error: Loan or Credit account not found / not active"),
+        (5,True,"Posted"),
+        (6,True,"Posted"),
+        (7,False,"Error: Account not found / not active"),
+        (8,False,"Error: Invalid operation"),
+        (9,False,"Error: Transaction amount cannot be negative/zero")]
+    assert (summary['posted'],summary['failed']) == (4,5)
+    assert ledger(tmp_path,checking) == [('deposit',100,200,0),('withdraw',150,50,0)]
+    assert ledger(tmp_path,credit) == [('withdraw',200,300,200),('pay',50,350,150)]
+    assert trans.readBalance(checking).available_bal == 50
+
+
+def test_post_batch_replans_a_chunk_whose_accounts_changed(bank,tmp_path,customer,monkeypatch):
+    u_id,checking,credit = customer
+    trans = bank.bankTransactions(notify=quiet)
+    read_accounts = trans._readAccounts
+    calls = []
+
+    def read_then_withdraw(db_engine,accounts_stmt,acct_nos):
+        # Another connection withdraws after the plan read the accounts
+        accounts = read_accounts(db_engine,accounts_stmt,acct_nos)
+        if not calls:
+            with sqlite3.connect(str(tmp_path / 'bank.db')) as conn:
+                conn.execute("UPDATE cust_accounts SET available_bal = 20 WHERE acct_no = ?",(checking,))
+        calls.append(acct_nos)
+        return accounts
+    monkeypatch.setattr(trans,'_readAccounts',read_then_withdraw)
+
+    summary = trans.postBatch([(checking,'deposit',10),(checking,'withdraw',50)])
+
+    assert [rslt.success for rslt in summary['results']] == [True,False]
+    assert ledger(tmp_path,checking) == [('deposit',10,30,0)]
+
+
+def set_status(tmp_path,acct_no,status):
+    with sqlite3.connect(str(tmp_path / 'bank.db')) as conn:
+        conn.execute("UPDATE cust_accounts SET acct_sts = ? WHERE acct_no = ?",(status,acct_no))
+
+
+def balances(bank,*acct_nos):
+    # Read from the database, not from rows cached before the transfer
+    bank.bankBalanceCache.shared().clear()
+    trans = bank.bankTransactions(notify=quiet)
+    return [(trans.readBalance(acct_no).available_bal,trans.readBalance(acct_no).remaining_bal)
+            for acct_no in acct_nos]
+
+
+def test_transfer_posts_both_legs_and_their_ledger_entries(bank,tmp_path,customer):
+    u_id,checking,credit = customer
+    savings = bank.bankAccounts(notify=quiet).addAccount(u_id,'test','Savings',10)
+    messages = []
+
+    assert bank.bankTransactions(notify=messages.append).transfer(checking,savings,30,u_id)
+    assert bank.bankTransactions(notify=quiet).transfer(savings,credit,15,u_id)
+
+    assert balances(bank,checking,savings,credit) == [(70,0),(25,0),(515,-15)]
+    assert ledger(tmp_path,checking) == [('transfer_out',30,70,0)]
+    assert ledger(tmp_path,savings) == [('transfer_in',30,40,0),('transfer_out',15,25,0)]
+    assert ledger(tmp_path,credit) == [('transfer_in',15,515,-15)]
+    assert len(messages) == 1
+
+
+def test_a_rejected_second_leg_rolls_back_the_first(bank,tmp_path,customer):
+    u_id,checking,credit = customer
+    low,high = sorted((checking,credit))
+    before = balances(bank,low,high)
+    messages = []
+    trans = bank.bankTransactions(notify=messages.append)
+
+    # Legs run in acct_no order: the credit of low is applied before the
+    # debit of high finds too little money
+    assert not trans.transfer(high,low,10**6,u_id)
+    # and the debit of low before the credit of high finds it inactive
+    set_status(tmp_path,high,'INACTIVE')
+    assert not trans.transfer(low,high,50,u_id)
+
+    assert "Withdrawal amount is greater" in messages[0]
+    assert messages[1] == "Validation Error: Account {acct} is not active".format(acct = high)
+    assert balances(bank,low,high) == before
+    assert ledger(tmp_path,low) == ledger(tmp_path,high) == []
+
+
+def test_transfers_are_rejected_before_touching_the_accounts(bank,tmp_path,customer):
+    u_id,checking,credit = customer
+    other = bank.bankUser(notify=quiet).createUser('other','customer','C')
+    messages = []
+    trans = bank.bankTransactions(notify=messages.append)
+
+    assert not trans.transfer(checking,checking,10,u_id)
+    assert not trans.transfer(checking,credit,0,u_id)
+    assert not trans.transfer(checking,0,10,u_id)
+    assert not trans.transfer(checking,credit,10,other)
+
+    assert messages == ["Error: Source and destination accounts must be different",
+                        "Error: Transaction amount cannot be negative/zero",
+                        "Error: Account no cannot be blank or zero",
+                        "Validation Error: Account not found"]
+    assert ledger(tmp_path,checking) == ledger(tmp_path,credit) == []
+    # Employees transfer between any two accounts
+    assert trans.transfer(checking,credit,10)
+
+
+def test_deposits_and_payments_only_post_to_their_account_types(bank,tmp_path,customer):
+    u_id,checking,credit = customer
+    messages = []
+    trans = bank.bankTransactions(notify=messages.append)
+
+    assert not trans.depositAmt(u_id,credit,10)
+    assert not trans.payBalance(u_id,checking,10)
+
+    assert messages == [
+        "Validation Error: Credit account {acct} does not accept this transaction, "
+        "only Checking or Savings accounts do".format(acct = credit),
+        "Validation Error: Checking account {acct} does not accept this transaction, "
+        "only Loan or Credit accounts do".format(acct = checking)]
+    assert balances(bank,checking,credit) == [(100,0),(500,0)]
+    assert ledger(tmp_path,checking) == ledger(tmp_path,credit) == []
+    # Employees deposit into any account
+    assert trans.depositAmt(None,credit,10)
+    assert balances(bank,credit) == [(510,0)]
+
+
+def test_inactive_and_foreign_accounts_are_rejected_by_the_statement(bank,tmp_path,customer):
+    u_id,checking,credit = customer
+    other = bank.bankUser(notify=quiet).createUser('other','customer','C')
+    messages = []
+    trans = bank.bankTransactions(notify=messages.append)
+
+    set_status(tmp_path,checking,'INACTIVE')
+    assert not trans.depositAmt(u_id,checking,10)
+    assert not trans.withdrawAmt(u_id,checking,10)
+    assert not trans.depositAmt(None,checking,10)
+    assert not trans.withdrawAmt(other,credit,10)
+    assert not trans.payBalance(other,credit,10)
+
+    inactive = "Validation Error: Account {acct} is not active".format(acct = checking)
+    assert messages == [inactive] * 3 + ["Validation Error: Account not found"] * 2
+    assert balances(bank,checking,credit) == [(100,0),(500,0)]
+    assert ledger(tmp_path,checking) == ledger(tmp_path,credit) == []
+
+
+def test_a_posting_reads_the_account_only_when_rejected(bank,customer,monkeypatch):
+    u_id,checking,credit = customer
+    monkeypatch.setattr(bank.bankMetrics,'_histograms',{})
+    trans = bank.bankTransactions(notify=quiet)
+
+    def statements():
+        counts = {}
+        for (kind,name),stats in bank.bankMetrics.summary().items():
+            if kind == 'sql':
+                verb,table = name.split()[:2]
+                counts[verb,table] = counts.get((verb,table),0) + stats['count']
+        bank.bankMetrics._histograms.clear()
+        return counts
+
+    assert trans.depositAmt(u_id,checking,10)
+    assert trans.withdrawAmt(u_id,checking,10)
+    assert trans.payBalance(u_id,credit,10)
+    assert statements() == {('UPDATE','cust_accounts'): 3,('INSERT','transactions'): 3}
+
+    assert not trans.depositAmt(u_id,credit,10)
+    assert statements() == {('UPDATE','cust_accounts'): 1,('SELECT','cust_accounts'): 1}
@@ -0,0 +1,49 @@
+import random
+import sqlite3
+
+from conftest import quiet
+
+# Outcome depends on order: each withdrawal of 1 finds the account empty
+SEQUENCE = [('withdraw',100,True),('withdraw',1,False),('deposit',7,True),
+            ('withdraw',7,True),('withdraw',1,False)]
+
+
+def test_pool_posts_the_operations_of_an_account_in_submission_order(bank,tmp_path,customer):
+    u_id,checking,credit = customer
+    accounts = bank.bankAccounts(notify=quiet)
+    acct_nos = [accounts.addAccount(u_id,'test','Checking',100) for _ in range(8)]
+    # Interleave the accounts, keeping each account's own sequence in order
+    pending = {acct_no: list(SEQUENCE) for acct_no in acct_nos}
+    records = []
+    rnd = random.Random(7)
+    while pending:
+        acct_no = rnd.choice(sorted(pending))
+        op,amount,success = pending[acct_no].pop(0)
+        records.append((acct_no,op,amount,success))
+        if not pending[acct_no]:
+            del pending[acct_no]
+
+    with bank.bankWorkerPool(processes=2,chunk_size=3) as pool:
+        summary = pool.postBatch([record[:3] for record in records])
+        stats = pool.stats()
+
+    assert [rslt.success for rslt in summary['results']] == [record[3] for record in records]
+    assert [rslt.line for rslt in summary['results']] == list(range(1,len(records) + 1))
+    assert (summary['posted'],summary['failed']) == (24,16)
+    assert sum(worker['completed'] for worker in stats) == len(records)
+    assert all(worker['queued'] == 0 for worker in stats)
+    with sqlite3.connect(str(tmp_path / 'bank.db')) as conn:
+        for acct_no in acct_nos:
+            entries = conn.execute("SELECT txn_type,amount FROM transactions WHERE acct_no = ? "
+                                   "AND txn_type != 'open' ORDER BY txn_id",(acct_no,)).fetchall()
+            assert entries == [('withdraw',100),('deposit',7),('withdraw',7)]
+            assert conn.execute("SELECT available_bal FROM cust_accounts WHERE acct_no = ?",
+                                (acct_no,)).fetchone() == (0,)
+
+
+def test_accounts_are_spread_over_the_workers(bank):
+    with bank.bankWorkerPool(processes=3) as pool:
+        workers = {pool.workerOf(acct_no) for acct_no in range(1000,1100)}
+
+        assert workers == {0,1,2}
+        assert pool.workerOf('not a number') == 0
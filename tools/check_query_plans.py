@@ -0,0 +1,119 @@
+"""
+Runs every hot-path operation against a temporary copy of
+BankingSystem-DB.db with bankDatabase.planCheck enabled and fails if
+any statement scans a table instead of using an index.
+
+    python tools/check_query_plans.py [--verbose]
+"""
+import argparse
+import contextlib
+import io
+import os
+import shutil
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0,ROOT)
+
+
+def load_bank(db_path):
+    import bankingsystem
+    import bankingsystem.database
+    
+    bankingsystem.database.dbUrl = 'sqlite:///' + db_path
+    return bankingsystem
+
+
+def exercise(bank):
+    users = bank.bankUser()
+    accounts = bank.bankAccounts()
+    trans = bank.bankTransactions()
+    
+    emp_id = users.createUser('plan','check','E','auditor')
+    users.authenticateUser(emp_id,'E','plan')
+    cust_id = users.createUser('plan','check','C')
+    
+    checking = accounts.addAccount(cust_id,'plan','Checking',100)
+    credit = accounts.addAccount(cust_id,'plan','Credit',100)
+    token = users.authenticateUser(cust_id,'C','plan')
+    accounts.validateSession(token,checking,1)
+    users.setStatus(cust_id,'ACTIVE')
+    
+    for choice in (1,2,3,4):
+        accounts.validateAccount(cust_id,checking,choice)
+    accounts.validateAccount(None,checking,None)
+    
+    trans.depositAmt(cust_id,checking,10)
+    trans.depositAmt(None,checking,10)
+    trans.withdrawAmt(cust_id,checking,5)
+    trans.withdrawAmt(cust_id,checking,10 ** 9)
+    trans.showBalance(cust_id,checking,None)
+    trans.showBalance(None,checking,None)
+    trans.withdrawAmt(cust_id,credit,5)
+    trans.payBalance(cust_id,credit,5)
+    trans.postBatch([(checking,'deposit',1),(checking,'withdraw',1),(credit,'pay',1)])
+    trans.transfer(checking,credit,1,cust_id)
+    trans.transfer(checking,credit,10 ** 9,cust_id)
+    page = trans.getHistory(cust_id,checking,limit = 2)
+    trans.getHistory(cust_id,checking,limit = 2,cursor = page['next'])
+    
+    with open('plans-accounts.csv','w') as f:
+        f.write('user_id,acct_type,available_bal,remaining_bal,acct_no,acct_sts\n')
+        f.write('{u},Checking,5,0,{a},ACTIVE\n{u},Checking,5,0,900001,ACTIVE\n'.format(u = cust_id,a = checking))
+    bank.bankDataTransfer().importTable('cust_accounts','plans-accounts.csv')
+    
+    # The month-end report reads every account by design and is not checked
+    snapshots = bank.bankSnapshots()
+    snapshots.takeSnapshot()
+    snapshots.balanceAsOf(checking,'2099-12')
+    snapshots.balanceAsOf(checking,'2000-01')
+    
+    # Shard status counts every account by design and is not checked
+    router = bank.bankShardRouter(['plans-shard-0.db','plans-shard-1.db'])
+    router.rebalance([bank.bankDatabase.homeBackend()],chunk_size = 2)
+    sharded = router.addAccount(cust_id,'plan','Savings',100)
+    router.depositAmt(cust_id,sharded,10)
+    router.getBalance(cust_id,sharded)
+    router.customerAccounts(cust_id)
+    router.authenticateUser(cust_id,'C','plan')
+    router.close()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--verbose',action='store_true',help='print every recorded plan')
+    args = parser.parse_args()
+    
+    workdir = tempfile.mkdtemp()
+    cwd = os.getcwd()
+    os.chdir(workdir)
+    try:
+        db_path = os.path.join(workdir,'plans.db')
+        shutil.copy(os.path.join(ROOT,'BankingSystem-DB.db'),db_path)
+        bank = load_bank(db_path)
+        bank.bankDatabase.enablePlanCheck()
+        
+        with contextlib.redirect_stdout(io.StringIO()):
+            exercise(bank)
+        
+        if args.verbose:
+            for statement,plan in bank.bankDatabase.planLog:
+                print(' '.join(statement.split()))
+                for detail in plan:
+                    print('    ' + detail)
+        
+        scans = bank.bankDatabase.planScans()
+        for statement,detail in scans:
+            print('FULL SCAN: ' + detail)
+            print('    ' + ' '.join(statement.split()))
+        print('{n} statements checked, {s} full scans'.format(n = len(bank.bankDatabase.planLog),
+                                                              s = len(scans)))
+        return 1 if scans else 0
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(workdir,ignore_errors=True)
+
+
+if __name__ == '__main__':
+    sys.exit(main())